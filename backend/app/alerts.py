@@ -0,0 +1,263 @@
+"""Server-side alert rules evaluated incrementally every tick.
+
+A rule is declarative:
+
+    {
+        "id": "road_congestion",
+        "title": "High congestion",
+        "level": "warning",          # info, warning or critical
+        "scope": "road",             # "global" (metrics) or "road" (per approach)
+        "metric": "density",         # see GLOBAL_METRICS / ROAD_METRICS
+        "op": ">",                   # ">" or "<"
+        "threshold": 80,             # raise when the condition holds ...
+        "for_ticks": 3,              # ... for this many consecutive ticks
+        "clear": 70,                 # hysteresis: clear only past this value
+        "cooldown": 30               # rate limit: ticks before it may raise again
+    }
+
+Each (rule, road) pair is a small state machine (consecutive-tick counter,
+active flag, last raise tick) updated in O(1) per tick, and only the road
+aggregates some rule refers to are computed. evaluate() returns just the
+transitions of the tick (raised / cleared events), so the stream pushed to
+clients is empty most of the time.
+"""
+import heapq
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from .models import Road, RoadDirection
+
+LEVELS = ("info", "warning", "critical")
+
+
+def _p95_wait(road: Road) -> float:
+    # The k-th largest wait instead of a full sort: O(n log k) per road and
+    # tick with k about n / 20, and n is bounded by the road's capacity
+    # (a few dozen vehicles)
+    count = len(road.vehicles)
+    if not count:
+        return 0.0
+    k = count - min(count - 1, int(0.95 * count))
+    return heapq.nlargest(k, (v.waiting_time for v in road.vehicles))[-1]
+
+
+def _emergency_wait(road: Road) -> float:
+    return max((v.waiting_time for v in road.vehicles if v.emergency), default=0.0)
+
+
+# Engine metrics rules may refer to (scope "global"), the keys of
+# TrafficSimulationEngine.metrics
+GLOBAL_METRICS = (
+    "total_vehicles_generated", "vehicles_processed", "total_wait_time", "avg_wait_time",
+    "max_wait_time", "emergency_vehicles", "signal_changes", "congestion_level", "co2_saved",
+    "fuel_saved", "throughput", "queue_size", "system_efficiency",
+)
+
+# Per-road aggregates rules may refer to (scope "road")
+ROAD_METRICS = {
+    "density": lambda road: road.traffic_density,
+    "vehicle_count": lambda road: len(road.vehicles),
+    "occupancy": lambda road: 100 * len(road.vehicles) / road.max_capacity,
+    "p95_wait": _p95_wait,
+    "emergency_wait": _emergency_wait,
+}
+
+DEFAULT_RULES = [
+    {"id": "congestion", "title": "High congestion", "level": "critical",
+     "metric": "congestion_level", "op": ">", "threshold": 80, "clear": 70,
+     "for_ticks": 3, "cooldown": 30},
+    {"id": "avg_wait", "title": "High average wait", "level": "warning",
+     "metric": "avg_wait_time", "op": ">", "threshold": 10, "clear": 8,
+     "for_ticks": 5, "cooldown": 30},
+    {"id": "road_congestion", "title": "Road congested", "level": "warning",
+     "scope": "road", "metric": "density", "op": ">", "threshold": 80, "clear": 60,
+     "for_ticks": 3, "cooldown": 30},
+    {"id": "wait_sla", "title": "Wait time SLA breached", "level": "warning",
+     "scope": "road", "metric": "p95_wait", "op": ">", "threshold": 15, "clear": 10,
+     "for_ticks": 2, "cooldown": 60},
+    {"id": "emergency_stuck", "title": "Emergency vehicle waiting", "level": "critical",
+     "scope": "road", "metric": "emergency_wait", "op": ">", "threshold": 2, "clear": 0.5,
+     "cooldown": 10},
+]
+
+
+class AlertRule:
+    """A validated rule (see module docstring)"""
+
+    def __init__(self, spec: Dict):
+        try:
+            self.id = str(spec["id"])
+            self.metric = str(spec["metric"])
+            self.threshold = float(spec["threshold"])
+            self.title = str(spec.get("title", self.id))
+            self.level = spec.get("level", "warning")
+            self.scope = spec.get("scope", "global")
+            self.op = spec.get("op", ">")
+            self.clear = float(spec.get("clear", self.threshold))
+            self.for_ticks = int(spec.get("for_ticks", 1))
+            self.cooldown = int(spec.get("cooldown", 0))
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Invalid alert rule {spec}: {e}")
+
+        if self.level not in LEVELS:
+            raise ValueError(f"Invalid level {self.level}; use one of {', '.join(LEVELS)}")
+        if self.scope not in ("global", "road"):
+            raise ValueError(f"Invalid scope {self.scope}; use global or road")
+        if self.scope == "global" and self.metric not in GLOBAL_METRICS:
+            raise ValueError(f"Unknown metric {self.metric}; use one of {', '.join(GLOBAL_METRICS)}")
+        if self.scope == "road" and self.metric not in ROAD_METRICS:
+            raise ValueError(f"Unknown road metric {self.metric}; use one of {', '.join(ROAD_METRICS)}")
+        if self.op not in (">", "<"):
+            raise ValueError(f"Invalid op {self.op}; use > or <")
+        # The clear level must sit on the safe side of the threshold
+        if (self.clear > self.threshold) if self.op == ">" else (self.clear < self.threshold):
+            raise ValueError(f"Rule {self.id}: clear level is past the threshold")
+        if self.for_ticks < 1 or self.cooldown < 0:
+            raise ValueError(f"Rule {self.id}: for_ticks must be >= 1 and cooldown >= 0")
+
+    def breached(self, value: float) -> bool:
+        return value > self.threshold if self.op == ">" else value < self.threshold
+
+    def recovered(self, value: float) -> bool:
+        return value <= self.clear if self.op == ">" else value >= self.clear
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "title": self.title,
+            "level": self.level,
+            "scope": self.scope,
+            "metric": self.metric,
+            "op": self.op,
+            "threshold": self.threshold,
+            "clear": self.clear,
+            "for_ticks": self.for_ticks,
+            "cooldown": self.cooldown,
+        }
+
+
+class _RuleState:
+    __slots__ = ("streak", "active", "raised_at", "value")
+
+    def __init__(self):
+        self.streak = 0
+        self.active = False
+        self.raised_at: Optional[int] = None
+        self.value = 0.0
+
+
+class AlertEngine:
+    """Evaluates alert rules against the engine's metrics and roads"""
+
+    def __init__(self, rules: Optional[List[Dict]] = None, max_recent: int = 200):
+        self.rules: List[AlertRule] = []
+        self.states: Dict[Tuple[str, Optional[int]], _RuleState] = {}
+        self.recent = deque(maxlen=max_recent)
+        self.last_events: List[Dict] = []
+        self.suppressed = 0
+        self._next_id = 1
+        self.set_rules(DEFAULT_RULES if rules is None else rules)
+
+    def set_rules(self, specs: List[Dict]):
+        """Replace the rules (all or nothing; ValueError if any is invalid)"""
+        rules = [AlertRule(spec) for spec in specs]
+        ids = [rule.id for rule in rules]
+        if len(set(ids)) != len(ids):
+            raise ValueError("Alert rule ids must be unique")
+        self.rules = rules
+        self.reset()
+
+    def reset(self):
+        # Fresh containers rather than clearing, so snapshots taken before
+        # (see commands._snapshot) keep the old ones
+        self.states = {}
+        self.recent = deque(maxlen=self.recent.maxlen)
+        self.last_events = []
+        self.suppressed = 0
+
+    def evaluate(self, tick: int, metrics: Dict, roads: Dict[RoadDirection, Road]) -> List[Dict]:
+        """Advance every rule by one tick; returns the raised/cleared events"""
+        events = []
+        aggregates: Dict[str, Dict[RoadDirection, float]] = {}
+        for rule in self.rules:
+            if rule.scope == "global":
+                if rule.metric in metrics:
+                    self._step(rule, None, float(metrics[rule.metric]), tick, events)
+                continue
+            if rule.metric not in aggregates:
+                compute = ROAD_METRICS[rule.metric]
+                aggregates[rule.metric] = {d: float(compute(road)) for d, road in roads.items()}
+            for direction, value in aggregates[rule.metric].items():
+                self._step(rule, direction, value, tick, events)
+
+        self.last_events = events
+        self.recent.extend(events)
+        return events
+
+    def _step(self, rule: AlertRule, direction: Optional[RoadDirection], value: float,
+              tick: int, events: List[Dict]):
+        key = (rule.id, direction.value if direction is not None else None)
+        state = self.states.get(key)
+        if state is None:
+            state = self.states[key] = _RuleState()
+        state.value = value
+
+        if state.active:
+            if rule.recovered(value):
+                state.active = False
+                state.streak = 0
+                events.append(self._event(rule, direction, "cleared", value, tick))
+            return
+
+        state.streak = state.streak + 1 if rule.breached(value) else 0
+        if state.streak < rule.for_ticks:
+            return
+        if state.raised_at is not None and tick - state.raised_at < rule.cooldown:
+            self.suppressed += 1
+            return
+        state.active = True
+        state.raised_at = tick
+        events.append(self._event(rule, direction, "raised", value, tick))
+
+    def _event(self, rule: AlertRule, direction: Optional[RoadDirection], status: str,
+               value: float, tick: int) -> Dict:
+        where = f" on {direction.name}" if direction is not None else ""
+        if status == "raised":
+            message = f"{rule.metric} {value:.1f} {rule.op} {rule.threshold:g}{where}"
+        else:
+            message = f"{rule.metric} back to {value:.1f}{where}"
+        event = {
+            "id": self._next_id,
+            "rule": rule.id,
+            "status": status,
+            "level": rule.level,
+            "title": rule.title,
+            "road": direction.value if direction is not None else None,
+            "message": message,
+            "value": value,
+            "tick": tick,
+        }
+        self._next_id += 1
+        return event
+
+    def active(self) -> List[Dict]:
+        by_id = {rule.id: rule for rule in self.rules}
+        return [
+            {
+                "rule": rule_id,
+                "level": by_id[rule_id].level,
+                "title": by_id[rule_id].title,
+                "road": road,
+                "value": state.value,
+                "since": state.raised_at,
+            }
+            for (rule_id, road), state in self.states.items() if state.active
+        ]
+
+    def describe(self) -> Dict:
+        return {
+            "rules": [rule.to_dict() for rule in self.rules],
+            "active": self.active(),
+            "recent": list(self.recent),
+            "suppressed": self.suppressed,
+        }
@@ -0,0 +1,266 @@
+"""Multi-worker deployment: one engine owner process, many stateless workers.
+
+The owner runs the only TrafficSimulationEngine and publishes every tick's
+state frame over a local socket. HTTP/WebSocket worker processes subscribe
+to those frames for reads and WebSocket fan-out, and forward control
+commands to the owner, which applies them between ticks.
+
+Messages on the socket are framed as a 1-byte kind and a 4-byte big-endian
+payload length followed by the payload.
+"""
+import asyncio
+import itertools
+import json
+import struct
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from .commands import CommandError, CommandQueue, execute
+from .simulation_engine import TrafficSimulationEngine
+from .tick_scheduler import TickScheduler
+
+DEFAULT_OWNER_ADDRESS = "127.0.0.1:8765"
+
+KIND_FRAME = 1   # owner -> worker: JSON state of the latest tick
+KIND_CALL = 2    # worker -> owner: {"id", "method", "args"}
+KIND_RESULT = 3  # owner -> worker: {"id", "result"} or {"id", "error", "status"}
+
+_PREFIX = struct.Struct(">BI")
+
+# Frames are dropped for subscribers whose socket buffer exceeds this
+MAX_SUBSCRIBER_BACKLOG = 1 << 20
+# Frames a worker holds for its WebSocket fan-out; when the fan-out falls
+# behind, the oldest waiting frame is replaced by the newest
+MAX_PENDING_FRAMES = 2
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+async def read_message(reader: asyncio.StreamReader) -> Tuple[int, bytes]:
+    kind, length = _PREFIX.unpack(await reader.readexactly(_PREFIX.size))
+    return kind, await reader.readexactly(length)
+
+
+def write_message(writer: asyncio.StreamWriter, kind: int, payload: bytes):
+    writer.write(_PREFIX.pack(kind, len(payload)) + payload)
+
+
+class EngineOwner:
+    """Owns the simulation, runs its tick loop and serves subscribers"""
+
+    def __init__(self, engine: TrafficSimulationEngine, address: str = DEFAULT_OWNER_ADDRESS):
+        self.engine = engine
+        self.host, self.port = parse_address(address)
+        self.subscribers: Set[asyncio.StreamWriter] = set()
+        self.frames_published = 0
+        self.frames_dropped = 0
+        self.commands = CommandQueue()
+        self.batch_tasks: Set[asyncio.Task] = set()
+
+    async def handle_subscriber(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.subscribers.add(writer)
+        try:
+            # Bring the new worker up to date straight away
+            write_message(writer, KIND_FRAME, self.encode_state())
+            while True:
+                kind, payload = await read_message(reader)
+                if kind == KIND_CALL:
+                    call = json.loads(payload)
+                    if call["method"] == "execute_batch":
+                        # Batches wait for the next tick boundary
+                        task = asyncio.create_task(self.handle_batch(writer, call))
+                        self.batch_tasks.add(task)
+                        task.add_done_callback(self.batch_tasks.discard)
+                        continue
+                    write_message(writer, KIND_RESULT, self.handle_call(call))
+                    await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.subscribers.discard(writer)
+            writer.close()
+
+    def handle_call(self, call: Dict) -> bytes:
+        """Apply a forwarded command (between ticks) and encode the reply"""
+        try:
+            result = {"id": call["id"], "result": execute(self.engine, call["method"], *call["args"])}
+        except CommandError as e:
+            result = {"id": call["id"], "error": e.detail, "status": e.status_code}
+        except Exception as e:
+            result = {"id": call["id"], "error": str(e), "status": 500}
+        return json.dumps(result).encode()
+
+    async def handle_batch(self, writer: asyncio.StreamWriter, call: Dict):
+        try:
+            result = {"id": call["id"], "result": await self.commands.submit(*call["args"])}
+        except CommandError as e:
+            result = {"id": call["id"], "error": e.detail, "status": e.status_code}
+        except Exception as e:
+            result = {"id": call["id"], "error": str(e), "status": 500}
+        try:
+            write_message(writer, KIND_RESULT, json.dumps(result).encode())
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    def encode_state(self) -> bytes:
+        return json.dumps(self.engine.get_state(), separators=(",", ":")).encode()
+
+    def publish(self, frame: bytes):
+        """Send a frame to every subscriber, skipping ones that are behind"""
+        self.frames_published += 1
+        for writer in list(self.subscribers):
+            if writer.transport.get_write_buffer_size() > MAX_SUBSCRIBER_BACKLOG:
+                self.frames_dropped += 1
+                continue
+            write_message(writer, KIND_FRAME, frame)
+
+    async def run(self):
+        server = await asyncio.start_server(self.handle_subscriber, self.host, self.port)
+        print(f"Engine owner publishing on {self.host}:{self.port}")
+        
+        async def step():
+            self.commands.apply(self.engine)
+            await self.engine.run_step()
+        
+        async def broadcast():
+            self.publish(self.encode_state())
+        
+        async with server:
+            self.engine.scheduler = TickScheduler(self.engine)
+            try:
+                await self.engine.scheduler.run(step, broadcast)
+            except asyncio.CancelledError:
+                pass
+            finally:
+                self.engine.scheduler = None
+
+
+class OwnerClient:
+    """Worker-side connection to the engine owner.
+
+    Keeps the latest published state, hands frames to `on_frame`, and
+    forwards commands with `call`. Reconnects if the owner goes away.
+    
+    The fan-out runs in its own task fed by a small queue, so a slow
+    WebSocket client never holds up the read loop and the command replies
+    behind it; frames the fan-out cannot keep up with are skipped.
+    """
+
+    def __init__(self, address: str,
+                 on_frame: Optional[Callable[[bytes, Dict], Awaitable[None]]] = None,
+                 reconnect_delay: float = 1.0):
+        self.host, self.port = parse_address(address)
+        self.on_frame = on_frame
+        self.reconnect_delay = reconnect_delay
+        self.latest_state: Optional[Dict] = None
+        self.latest_frame: Optional[bytes] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count()
+        self._connected = asyncio.Event()
+        self._frames: asyncio.Queue = asyncio.Queue(maxsize=MAX_PENDING_FRAMES)
+        self.frames_skipped = 0
+
+    @property
+    def connected(self) -> bool:
+        return self._connected.is_set()
+
+    async def run(self):
+        fan_out = asyncio.create_task(self._fan_out()) if self.on_frame else None
+        try:
+            await self._read_loop()
+        finally:
+            if fan_out:
+                fan_out.cancel()
+
+    async def _fan_out(self):
+        while True:
+            payload, state = await self._frames.get()
+            try:
+                await self.on_frame(payload, state)
+            except Exception as e:
+                print(f"Frame fan-out error: {e}")
+
+    def _queue_frame(self, payload: bytes, state: Dict):
+        if self._frames.full():
+            self._frames.get_nowait()
+            self.frames_skipped += 1
+        self._frames.put_nowait((payload, state))
+
+    async def _read_loop(self):
+        while True:
+            try:
+                reader, self._writer = await asyncio.open_connection(self.host, self.port)
+                self._connected.set()
+                while True:
+                    kind, payload = await read_message(reader)
+                    if kind == KIND_FRAME:
+                        self.latest_frame = payload
+                        self.latest_state = json.loads(payload)
+                        if self.on_frame:
+                            self._queue_frame(payload, self.latest_state)
+                    elif kind == KIND_RESULT:
+                        self._resolve(json.loads(payload))
+            except asyncio.CancelledError:
+                break
+            except (OSError, asyncio.IncompleteReadError) as e:
+                print(f"Engine owner connection lost: {e}")
+            finally:
+                self._connected.clear()
+                self._fail_pending()
+                if self._writer:
+                    self._writer.close()
+                    self._writer = None
+            await asyncio.sleep(self.reconnect_delay)
+
+    def _resolve(self, reply: Dict):
+        future = self._pending.pop(reply["id"], None)
+        if future is None or future.done():
+            return
+        if "error" in reply:
+            future.set_exception(CommandError(reply.get("status", 500), reply["error"]))
+        else:
+            future.set_result(reply["result"])
+
+    def _fail_pending(self):
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(CommandError(503, "Engine owner unavailable"))
+        self._pending.clear()
+
+    async def call(self, method: str, *args, timeout: float = 10.0) -> Dict:
+        """Run a command on the owner and wait for its result"""
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout)
+        except asyncio.TimeoutError:
+            raise CommandError(503, "Engine owner unavailable")
+
+        call_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[call_id] = future
+        payload = json.dumps({"id": call_id, "method": method, "args": list(args)}).encode()
+        write_message(self._writer, KIND_CALL, payload)
+        await self._writer.drain()
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self._pending.pop(call_id, None)
+            raise CommandError(504, f"Engine owner did not answer {method}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the simulation engine owner")
+    parser.add_argument("--address", default=DEFAULT_OWNER_ADDRESS)
+    args = parser.parse_args()
+
+    engine = TrafficSimulationEngine()
+    engine.start()
+    try:
+        asyncio.run(EngineOwner(engine, args.address).run())
+    except KeyboardInterrupt:
+        pass
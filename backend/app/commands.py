@@ -0,0 +1,486 @@
+import asyncio
+import copy
+import inspect
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from .models import RoadDirection
+from .simulation_engine import TrafficSimulationEngine
+
+
+class CommandError(Exception):
+    """A control command was rejected (maps to an HTTP error status)"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _get_road(engine: TrafficSimulationEngine, direction: int):
+    try:
+        road_dir = RoadDirection(direction)
+    except ValueError:
+        raise CommandError(400, f"Invalid direction: {direction}")
+
+    road = engine.intersection.roads.get(road_dir)
+    if not road:
+        raise CommandError(404, f"Road direction {direction} not found")
+    return road_dir, road
+
+
+def get_state(engine: TrafficSimulationEngine) -> Dict:
+    return engine.get_state()
+
+
+def add_emergency_vehicle(engine: TrafficSimulationEngine, direction: int) -> Dict:
+    """Add emergency vehicle to specific direction (0-315 in 45-degree increments)"""
+    success = engine.add_emergency_vehicle(direction)
+    return {
+        "success": success,
+        "direction": direction,
+        "message": "Emergency vehicle added successfully" if success else "Failed to add emergency vehicle"
+    }
+
+
+def update_config(engine: TrafficSimulationEngine, green_duration: Optional[int] = None,
+                  vehicle_rate: Optional[int] = None,
+                  emergency_prob: Optional[float] = None) -> Dict:
+    """Update simulation configuration"""
+    engine.update_config(green_duration, vehicle_rate, emergency_prob)
+
+    current_config = {
+        "green_duration": engine.green_signal_duration,
+        "vehicle_rate": engine.vehicle_generation_rate,
+        "emergency_probability": engine.emergency_probability * 100
+    }
+
+    return {
+        "success": True,
+        "message": "Configuration updated",
+        "config": current_config
+    }
+
+
+def control(engine: TrafficSimulationEngine, action: str) -> Dict:
+    """Control simulation actions: start, stop, reset, pause"""
+    action = action.lower()
+
+    if action == "start":
+        engine.start()
+        return {"success": True, "message": "Simulation started"}
+
+    elif action == "stop":
+        engine.stop()
+        return {"success": True, "message": "Simulation stopped"}
+
+    elif action == "reset":
+        engine.reset()
+        return {"success": True, "message": "Simulation reset"}
+
+    elif action == "pause":
+        engine.stop()
+        return {"success": True, "message": "Simulation paused"}
+
+    else:
+        raise CommandError(400, f"Unknown action: {action}")
+
+
+def set_speed(engine: TrafficSimulationEngine, multiplier: float) -> Dict:
+    """Set simulation speed (0.5 to 5.0)"""
+    new_speed = engine.set_speed(multiplier)
+    return {
+        "success": True,
+        "speed": new_speed,
+        "message": f"Simulation speed set to {new_speed}x"
+    }
+
+
+def get_history(engine: TrafficSimulationEngine, limit: int = 50) -> Dict:
+    """Get simulation history data"""
+    return {
+        "history": engine.history[-limit:] if limit > 0 else engine.history,
+        "count": len(engine.history)
+    }
+
+
+def load_trace(engine: TrafficSimulationEngine, path: str,
+               start_time: Optional[float] = None) -> Dict:
+    """Replay recorded arrivals from a CSV or binary trace file in the trace
+    directory"""
+    from .trace_replay import TraceArrivalSource, TraceReader, resolve_trace_path
+
+    try:
+        reader = TraceReader(resolve_trace_path(path))
+        source = TraceArrivalSource(reader, start_time=start_time)
+    except (OSError, ValueError, KeyError) as e:
+        raise CommandError(400, f"Invalid trace file: {e}")
+
+    engine.set_arrival_source(source)
+    return {
+        "success": True,
+        "message": f"Replaying arrivals from {path}",
+        "trace": source.describe()
+    }
+
+
+def load_demand(engine: TrafficSimulationEngine, profile: Union[str, Dict],
+                seed: Optional[int] = None) -> Dict:
+    """Drive arrivals from a demand profile (preset name or dict),
+    precomputing the whole run's arrival schedule"""
+    from .demand import compile_schedule, load_profile
+
+    try:
+        schedule = compile_schedule(load_profile(profile), seed)
+    except ValueError as e:
+        raise CommandError(400, f"Invalid demand profile: {e}")
+
+    engine.set_arrival_source(schedule)
+    return {
+        "success": True,
+        "message": f"Running demand profile {schedule.profile.name}",
+        "trace": schedule.describe()
+    }
+
+
+def get_trace(engine: TrafficSimulationEngine) -> Dict:
+    source = engine.arrival_source
+    return {"trace": source.describe() if source else None}
+
+
+def clear_trace(engine: TrafficSimulationEngine) -> Dict:
+    engine.set_arrival_source(None)
+    return {"success": True, "message": "Synthetic arrivals restored"}
+
+
+def start_recording(engine: TrafficSimulationEngine, name: str = "run") -> Dict:
+    """Record ticks and vehicle departures into the run catalog"""
+    try:
+        recorder = engine.start_recording(name)
+    except OSError as e:
+        raise CommandError(500, f"Cannot create run: {e}")
+    return {"success": True, "message": f"Recording run {recorder.run_id}", "run": recorder.describe()}
+
+
+def stop_recording(engine: TrafficSimulationEngine) -> Dict:
+    recorder = engine.stop_recording()
+    if recorder is None:
+        raise CommandError(409, "No run is being recorded")
+    return {"success": True, "message": f"Run {recorder.run_id} saved", "run": recorder.describe()}
+
+
+def get_recording(engine: TrafficSimulationEngine) -> Dict:
+    recorder = engine.recorder
+    return {"run": recorder.describe() if recorder else None}
+
+
+def get_alerts(engine: TrafficSimulationEngine) -> Dict:
+    """Alert rules, active alerts and recent alert events"""
+    return engine.alerts.describe()
+
+
+def set_alert_rules(engine: TrafficSimulationEngine, rules: Optional[List[Dict]] = None) -> Dict:
+    """Replace the alert rules (None restores the defaults)"""
+    from .alerts import DEFAULT_RULES
+
+    try:
+        engine.alerts.set_rules(DEFAULT_RULES if rules is None else rules)
+    except ValueError as e:
+        raise CommandError(422, str(e))
+    return {
+        "success": True,
+        "message": f"{len(engine.alerts.rules)} alert rules active",
+        "rules": [rule.to_dict() for rule in engine.alerts.rules]
+    }
+
+
+def get_scheduler(engine: TrafficSimulationEngine) -> Dict:
+    """Tick loop policy and overrun statistics"""
+    if engine.scheduler is None:
+        raise CommandError(409, "The simulation loop is not running")
+    return engine.scheduler.describe()
+
+
+def set_tick_policy(engine: TrafficSimulationEngine, policy: str,
+                    max_catch_up: Optional[int] = None) -> Dict:
+    """Choose how the tick loop catches up when it falls behind"""
+    scheduler = engine.scheduler
+    if scheduler is None:
+        raise CommandError(409, "The simulation loop is not running")
+    try:
+        scheduler.configure(policy, scheduler.max_catch_up if max_catch_up is None else max_catch_up)
+    except ValueError as e:
+        raise CommandError(400, str(e))
+    return {
+        "success": True,
+        "message": f"Tick policy set to {policy}",
+        "scheduler": scheduler.describe()
+    }
+
+
+def get_road(engine: TrafficSimulationEngine, direction: int) -> Dict:
+    """Get detailed state of a specific road"""
+    road_dir, road = _get_road(engine, direction)
+    return {
+        "direction": direction,
+        "name": road.name,
+        "vehicle_count": len(road.vehicles),
+        "density": road.traffic_density,
+        "capacity": road.max_capacity,
+        "capacity_used": f"{(len(road.vehicles) / road.max_capacity * 100):.1f}%",
+        "lanes": road.lane_count,
+        "lane_queues": [len(lane) for lane in road.lanes],
+        "is_green": road_dir in engine.green_approaches()
+    }
+
+
+def road_action(engine: TrafficSimulationEngine, direction: int, action: str) -> Dict:
+    """Control a specific road: priority, clear, or add vehicles"""
+    road_dir, road = _get_road(engine, direction)
+    action = action.lower()
+
+    if action == "priority":
+        # Force this road to get green signal, with whatever is compatible
+        engine.give_priority(road_dir)
+        return {
+            "success": True,
+            "action": "priority",
+            "direction": direction,
+            "message": f"Priority given to {road.name} road"
+        }
+
+    elif action == "clear":
+        # Clear vehicles from this road
+        cleared_count = len(road.vehicles)
+        engine.vehicle_pool.release_all(road.clear())
+        road.update_density()
+        return {
+            "success": True,
+            "action": "clear",
+            "direction": direction,
+            "cleared": cleared_count,
+            "message": f"Cleared {cleared_count} vehicles from {road.name} road"
+        }
+
+    elif action == "add":
+        # Add a few vehicles to this road
+        added = 0
+        for _ in range(3):  # Add 3 vehicles
+            if len(road.vehicles) < road.max_capacity:
+                vehicle = engine.generate_vehicle()
+                road.add_vehicle(vehicle)
+                engine.metrics["total_vehicles_generated"] += 1
+                added += 1
+        road.update_density()
+        return {
+            "success": True,
+            "action": "add",
+            "direction": direction,
+            "added": added,
+            "message": f"Added {added} vehicles to {road.name} road"
+        }
+
+    else:
+        raise CommandError(400, f"Unknown action: {action}. Use 'priority', 'clear', or 'add'")
+
+
+# Operations that can be invoked by name, locally or forwarded to the
+# engine owner process in multi-worker deployments
+COMMANDS: Dict[str, Callable[..., Dict]] = {
+    "get_state": get_state,
+    "add_emergency_vehicle": add_emergency_vehicle,
+    "update_config": update_config,
+    "control": control,
+    "set_speed": set_speed,
+    "get_history": get_history,
+    "load_trace": load_trace,
+    "load_demand": load_demand,
+    "get_trace": get_trace,
+    "clear_trace": clear_trace,
+    "start_recording": start_recording,
+    "stop_recording": stop_recording,
+    "get_recording": get_recording,
+    "get_alerts": get_alerts,
+    "set_alert_rules": set_alert_rules,
+    "get_scheduler": get_scheduler,
+    "set_tick_policy": set_tick_policy,
+    "get_road": get_road,
+    "road_action": road_action,
+}
+
+
+def execute(engine: TrafficSimulationEngine, name: str, *args) -> Dict:
+    """Run a named command against an engine"""
+    command = COMMANDS.get(name)
+    if command is None:
+        raise CommandError(400, f"Unknown command: {name}")
+    return command(engine, *args)
+
+
+# Commands a batch may contain: in-memory engine changes (which a failed
+# atomic batch can roll back, see _snapshot) and reads that see the
+# preceding commands
+BATCH_COMMANDS = {
+    "add_emergency_vehicle", "update_config", "control", "set_speed", "road_action",
+    "set_alert_rules", "clear_trace", "get_state", "get_road", "get_alerts",
+}
+MAX_BATCH_SIZE = 1000
+
+
+def _irreversible(name: str, args: list) -> bool:
+    """Commands with effects outside the engine state a rollback restores:
+    a reset finishes the run being recorded and drops the history"""
+    return name == "control" and bool(args) and str(args[0]).lower() == "reset"
+
+
+def parse_batch(commands, atomic: bool = True) -> List[Tuple[str, list]]:
+    """Validate a batch of {"command": name, "args": [...]} entries"""
+    if not isinstance(commands, list) or not commands:
+        raise CommandError(400, "commands must be a non-empty list")
+    if len(commands) > MAX_BATCH_SIZE:
+        raise CommandError(413, f"At most {MAX_BATCH_SIZE} commands per batch")
+
+    batch = []
+    for index, entry in enumerate(commands):
+        if not isinstance(entry, dict) or not isinstance(entry.get("args", []), list):
+            raise CommandError(400, f"Command {index}: expected {{\"command\": name, \"args\": [...]}}")
+        name, args = entry.get("command"), entry.get("args", [])
+        if name not in BATCH_COMMANDS:
+            raise CommandError(400, f"Command {index}: {name} cannot be batched")
+        try:
+            inspect.signature(COMMANDS[name]).bind(None, *args)
+        except TypeError as e:
+            raise CommandError(400, f"Command {index} ({name}): {e}")
+        if atomic and _irreversible(name, args):
+            raise CommandError(400, f"Command {index} ({name} {args[0]}) cannot be rolled back; "
+                                    "send it in a non-atomic batch")
+        batch.append((name, args))
+    return batch
+
+
+def execute_batch(engine: TrafficSimulationEngine, commands: List[Dict], atomic: bool = True) -> Dict:
+    """Run a batch of commands in order with per-command results. An atomic
+    batch stops at the first failure and restores the engine to its state
+    before the batch."""
+    batch = parse_batch(commands, atomic)
+    snapshot = _snapshot(engine) if atomic else None
+
+    results = []
+    for index, (name, args) in enumerate(batch):
+        try:
+            results.append({"index": index, "command": name, "ok": True,
+                            "result": execute(engine, name, *args)})
+            continue
+        except CommandError as e:
+            results.append({"index": index, "command": name, "ok": False,
+                            "status": e.status_code, "error": e.detail})
+        except Exception as e:
+            results.append({"index": index, "command": name, "ok": False,
+                            "status": 500, "error": str(e)})
+        if atomic:
+            _restore(engine, snapshot)
+            return {
+                "success": False,
+                "applied": 0,
+                "rolled_back": index,
+                "tick": engine.simulation_time,
+                "results": results
+            }
+
+    applied = sum(1 for result in results if result["ok"])
+    return {
+        "success": applied == len(results),
+        "applied": applied,
+        "rolled_back": 0,
+        "tick": engine.simulation_time,
+        "results": results
+    }
+
+
+COMMANDS["execute_batch"] = execute_batch
+
+
+# Engine attributes batchable commands assign (but never mutate in place)
+_SNAPSHOT_ATTRIBUTES = (
+    "is_running", "simulation_speed", "green_signal_duration", "vehicle_generation_rate",
+    "emergency_probability", "vehicle_type_probs", "arrival_source", "current_phase",
+)
+# AlertEngine attributes set_alert_rules replaces (the engine itself stays, as
+# the tick loop holds on to it)
+_ALERT_ATTRIBUTES = ("rules", "states", "recent", "last_events", "suppressed")
+
+
+def _snapshot(engine: TrafficSimulationEngine) -> Dict:
+    """The engine state batchable commands can change: configuration,
+    metrics, the random generator, alert rules, the signal and the roads'
+    queues. Queued vehicles are copied, since a rollback may hand vehicles
+    that were released to the pool back to their roads."""
+    intersection = engine.intersection
+    queue = engine.priority_queue
+    roads = {}
+    for direction, road in intersection.roads.items():
+        memo = {}
+        roads[direction] = (copy.deepcopy(road.vehicles, memo), copy.deepcopy(road.lanes, memo),
+                            list(road.discharge_credit), road.traffic_density)
+    return {
+        "attributes": {name: getattr(engine, name) for name in _SNAPSHOT_ATTRIBUTES},
+        "metrics": dict(engine.metrics),
+        "rng": engine.rng.getstate(),
+        "alerts": {name: getattr(engine.alerts, name) for name in _ALERT_ATTRIBUTES},
+        "signal": (intersection.current_green, list(intersection.green_movements),
+                   intersection.last_switch),
+        "roads": roads,
+        "priority_queue": (list(queue.heap), dict(queue.entry_finder), queue.counter,
+                           dict(queue.last_served)),
+    }
+
+
+def _restore(engine: TrafficSimulationEngine, snapshot: Dict):
+    for name, value in snapshot["attributes"].items():
+        setattr(engine, name, value)
+    engine.metrics = snapshot["metrics"]
+    engine.rng.setstate(snapshot["rng"])
+    for name, value in snapshot["alerts"].items():
+        setattr(engine.alerts, name, value)
+
+    intersection = engine.intersection
+    intersection.current_green, intersection.green_movements, intersection.last_switch = snapshot["signal"]
+    # Roads are restored in place: graphs and queues hold references to them
+    for direction, (vehicles, lanes, credit, density) in snapshot["roads"].items():
+        road = intersection.roads[direction]
+        road.vehicles, road.lanes, road.discharge_credit = vehicles, lanes, credit
+        if road.traffic_density != density:
+            road.traffic_density = density
+            for listener in road.density_listeners:
+                listener(road)
+
+    queue = engine.priority_queue
+    queue.heap, queue.entry_finder, queue.counter, queue.last_served = snapshot["priority_queue"]
+
+
+class CommandQueue:
+    """Batches waiting for the next tick boundary.
+
+    The tick loop calls apply() right before each step, so a batch never
+    interleaves with a step and sees (and leaves) a consistent engine.
+    """
+
+    def __init__(self):
+        self.pending: List[Tuple[List[Dict], bool, asyncio.Future]] = []
+
+    def submit(self, commands: List[Dict], atomic: bool = True) -> asyncio.Future:
+        """Queue a batch; the future resolves to its execute_batch result"""
+        parse_batch(commands, atomic)  # Reject malformed batches straight away
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((commands, atomic, future))
+        return future
+
+    def apply(self, engine: TrafficSimulationEngine):
+        """Run every queued batch in submission order"""
+        pending, self.pending = self.pending, []
+        for commands, atomic, future in pending:
+            if future.done():  # The submitter gave up waiting
+                continue
+            try:
+                future.set_result(execute_batch(engine, commands, atomic))
+            except CommandError as e:
+                future.set_exception(e)
@@ -0,0 +1,205 @@
+"""Incrementally maintained congestion aggregates for a TrafficGraph.
+
+Densities are indexed per (intersection, approach) slot, the same unit the
+graph's congestion level has always averaged over, and rolled up in three
+levels:
+
+    intersection   sum of its approach densities (max over its few approaches)
+    region         sum and count, max-heap of slot densities, max-heap of
+                   intersection mean densities (the hotspot)
+    network        sum and count, max-heaps of the regions' maxima
+
+Every level only aggregates the level below it, so a density change costs
+O(1) for the sums plus pushes into the heaps of one region and of the
+network's (per-region, hence small) heaps: O(log n) overall. The heaps are
+lazy: a change pushes the new value and stale entries are discarded when
+they reach the top, and a heap is rebuilt when stale entries outnumber
+live ones.
+"""
+import heapq
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from .models import Road, RoadDirection
+
+DEFAULT_REGION = "default"
+
+# (intersection id, approach angle); plain ints hash much faster than enums
+Slot = Tuple[str, int]
+
+
+class LazyMaxHeap:
+    """Max-heap of key -> value with O(log n) updates by key. Ties go to
+    the key that was first added."""
+
+    def __init__(self):
+        self.values: Dict[Hashable, float] = {}
+        self._order: Dict[Hashable, int] = {}
+        self._heap: List[Tuple[float, int, Hashable]] = []
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def set(self, key: Hashable, value: float):
+        values = self.values
+        if values.get(key) == value:
+            return
+        order = self._order.get(key)
+        if order is None:
+            order = self._order[key] = len(self._order)
+        values[key] = value
+        heapq.heappush(self._heap, (-value, order, key))
+        if len(self._heap) > 2 * len(values) + 32:
+            self._rebuild()
+
+    def remove(self, key: Hashable):
+        self.values.pop(key, None)
+
+    def peek(self) -> Optional[Tuple[Hashable, float]]:
+        heap = self._heap
+        while heap and self.values.get(heap[0][2]) != -heap[0][0]:
+            heapq.heappop(heap)
+        return (heap[0][2], -heap[0][0]) if heap else None
+
+    def _rebuild(self):
+        self._heap = [(-value, self._order[key], key) for key, value in self.values.items()]
+        heapq.heapify(self._heap)
+
+
+class _Intersection:
+    __slots__ = ("region", "densities", "total")
+
+    def __init__(self, region: str):
+        self.region = region
+        self.densities: Dict[int, float] = {}  # approach angle -> density
+        self.total = 0.0
+
+
+class _Area:
+    """A region (heaps keyed by slot / intersection) or the network (heaps
+    keyed by region)"""
+    __slots__ = ("total", "count", "slots", "intersections")
+
+    def __init__(self):
+        self.total = 0.0
+        self.count = 0
+        self.slots = LazyMaxHeap()
+        self.intersections = LazyMaxHeap()
+
+
+def _stats(total: float, count: int, top: Optional[Tuple[Slot, float]]) -> Dict:
+    return {
+        "total": total,
+        "count": count,
+        "mean": total / count if count else 0.0,
+        "max": top[1] if top else 0.0,
+        "max_at": {"intersection": top[0][0], "direction": top[0][1]} if top else None,
+    }
+
+
+class CongestionIndex:
+    """Hierarchical density aggregates (see module docstring)"""
+
+    def __init__(self):
+        self.network = _Area()
+        self.regions: Dict[str, _Area] = {}
+        self.intersections: Dict[str, _Intersection] = {}
+        # Keyed by id(road): road ids are only unique per intersection (every
+        # engine names its approaches road_{angle}). slot_road keeps the
+        # indexed roads alive, so their ids cannot be reused.
+        self.road_slots: Dict[int, List[Slot]] = {}
+        self.slot_road: Dict[Slot, Road] = {}
+
+    def add_intersection(self, intersection_id: str, region: str = DEFAULT_REGION):
+        if intersection_id in self.intersections:
+            return
+        self.intersections[intersection_id] = _Intersection(region)
+        if region not in self.regions:
+            self.regions[region] = _Area()
+
+    def attach(self, intersection_id: str, direction: RoadDirection, road: Road):
+        """Index `road` as the intersection's approach from `direction`"""
+        slot = (intersection_id, direction.value)
+        if slot in self.slot_road:
+            self.detach(intersection_id, direction)
+        self.road_slots.setdefault(id(road), []).append(slot)
+        self.slot_road[slot] = road
+        self._apply(slot, road.traffic_density)
+
+    def detach(self, intersection_id: str, direction: RoadDirection):
+        slot = (intersection_id, direction.value)
+        road_key = id(self.slot_road.pop(slot))
+        self.road_slots[road_key].remove(slot)
+        if not self.road_slots[road_key]:
+            del self.road_slots[road_key]
+        self._apply(slot, None)
+
+    def update(self, road: Road):
+        """Propagate a road's current density to every slot it occupies"""
+        for slot in self.road_slots.get(id(road), ()):
+            self._apply(slot, road.traffic_density)
+
+    def _apply(self, slot: Slot, density: Optional[float]):
+        """Set (or with None remove) a slot's density and roll it up"""
+        intersection_id, angle = slot
+        intersection = self.intersections[intersection_id]
+        old = intersection.densities.get(angle)
+        if density == old and angle in intersection.densities:
+            return
+        if density is None:
+            del intersection.densities[angle]
+        else:
+            intersection.densities[angle] = density
+        delta = (density or 0.0) - (old or 0.0)
+        count_delta = (density is not None) - (old is not None)
+
+        region = self.regions[intersection.region]
+        intersection.total += delta
+        for area in (region, self.network):
+            area.total += delta
+            area.count += count_delta
+
+        if density is None:
+            region.slots.remove(slot)
+        else:
+            region.slots.set(slot, density)
+        if intersection.densities:
+            region.intersections.set(intersection_id, intersection.total / len(intersection.densities))
+        else:
+            region.intersections.remove(intersection_id)
+
+        # The network only tracks each region's current maxima
+        for level in ("slots", "intersections"):
+            top = getattr(region, level).peek()
+            if top:
+                getattr(self.network, level).set(intersection.region, top[1])
+            else:
+                getattr(self.network, level).remove(intersection.region)
+
+    def _top(self, region: Optional[str], level: str):
+        """Top (key, value) of a region's heap, or of the network's via its
+        top region"""
+        if region is None:
+            top = getattr(self.network, level).peek()
+            if top is None:
+                return None
+            region = top[0]
+        area = self.regions.get(region)
+        return getattr(area, level).peek() if area else None
+
+    def global_stats(self) -> Dict:
+        return _stats(self.network.total, self.network.count, self._top(None, "slots"))
+
+    def region_stats(self, region: str) -> Dict:
+        area = self.regions[region]
+        return _stats(area.total, area.count, self._top(region, "slots"))
+
+    def intersection_stats(self, intersection_id: str) -> Dict:
+        intersection = self.intersections[intersection_id]
+        top = max(intersection.densities.items(), key=lambda item: item[1], default=None)
+        return _stats(intersection.total, len(intersection.densities),
+                      ((intersection_id, top[0]), top[1]) if top else None)
+
+    def hotspot(self, region: Optional[str] = None) -> Optional[Tuple[str, float]]:
+        """(intersection id, mean density) of the most congested
+        intersection, within a region or (None) network-wide"""
+        return self._top(region, "intersections")
@@ -0,0 +1,142 @@
+import struct
+from typing import Dict, List
+
+from .models import VEHICLE_TYPE_ORDER
+
+# Subprotocol / query value a client uses to opt in to binary frames on /ws
+BINARY_SUBPROTOCOL = "traffic.binary.v1"
+BINARY_FORMAT = "binary"
+JSON_FORMAT = "json"
+
+FRAME_MAGIC = b"TF"
+FRAME_VERSION = 2
+
+# magic, version, flags, simulation_time, current_green, green_duration,
+# road count, simulation_speed
+_HEADER = struct.Struct("<2sBBIhHHf")
+
+FLAG_RUNNING = 0x01
+ROAD_FLAG_GREEN = 0x01
+EMERGENCY_BIT = 0x80
+
+# State and road keys the fixed layout carries (or the decoder derives);
+# every other key travels in the trailing MessagePack map, so fields added
+# to get_state() reach binary clients without a layout change
+LAYOUT_KEYS = frozenset((
+    "simulation_time", "current_green", "green_duration", "roads",
+    "is_running", "simulation_speed", "server_time",
+))
+ROAD_LAYOUT_KEYS = frozenset((
+    "name", "vehicle_count", "density", "max_capacity", "vehicles",
+    "lane_queues", "is_green", "capacity_used",
+))
+
+# Stable wire codes for vehicle types (must match frontend frameDecoder.js)
+VEHICLE_TYPE_CODES: Dict[str, int] = {
+    vtype.value: code for code, vtype in enumerate(VEHICLE_TYPE_ORDER)
+}
+
+
+def negotiate_format(query_format: str, subprotocols: List[str]) -> str:
+    """Pick the frame format for a /ws client (JSON unless it opts in)"""
+    if BINARY_SUBPROTOCOL in subprotocols:
+        return BINARY_FORMAT
+    if query_format and query_format.lower() == BINARY_FORMAT:
+        return BINARY_FORMAT
+    return JSON_FORMAT
+
+
+def encode_state(state: Dict) -> bytes:
+    """Pack a get_state() dict into a compact binary frame.
+
+    Layout (little-endian):
+        header                      see _HEADER
+        direction       uint16[n]
+        vehicle_count   uint16[n]
+        max_capacity    uint16[n]
+        density         float32[n]
+        preview_count   uint8[n]
+        road_flags      uint8[n]    ROAD_FLAG_GREEN if any movement is green
+        lane_count      uint8[n]
+        lane_queue      uint16[l]
+        vehicle_code    uint8[m]    type code, EMERGENCY_BIT if emergency
+        waiting_time    float32[m]
+        priority        float32[m]
+        extra_length    uint32
+        extra           MessagePack map of the state keys not in LAYOUT_KEYS
+                        (metrics, green_movements, effective_speed, ...),
+                        plus "road_extra" {direction: {key: value}} for road
+                        keys not in ROAD_LAYOUT_KEYS, if any
+        server_time     float64     wall clock (s) when the state was produced
+    where n is the number of roads, l the total number of lanes and m the
+    total number of previewed vehicles.
+    """
+    roads = state["roads"]
+    directions = sorted(roads)
+    n = len(directions)
+
+    counts = []
+    capacities = []
+    densities = []
+    preview_counts = []
+    road_flags = []
+    lane_counts = []
+    lane_queues = []
+    codes = []
+    waits = []
+    priorities = []
+    road_extra = {}
+
+    for direction in directions:
+        road = roads[direction]
+        vehicles = road["vehicles"]
+        queues = road.get("lane_queues", [])
+        counts.append(road["vehicle_count"])
+        capacities.append(road["max_capacity"])
+        densities.append(road["density"])
+        preview_counts.append(len(vehicles))
+        road_flags.append(ROAD_FLAG_GREEN if road.get("is_green") else 0)
+        lane_counts.append(len(queues))
+        lane_queues.extend(queues)
+        for v in vehicles:
+            code = VEHICLE_TYPE_CODES.get(v["type"], 0)
+            if v["emergency"]:
+                code |= EMERGENCY_BIT
+            codes.append(code)
+            waits.append(v["waiting_time"])
+            priorities.append(v["priority"])
+        unknown = {key: value for key, value in road.items() if key not in ROAD_LAYOUT_KEYS}
+        if unknown:
+            road_extra[direction] = unknown
+
+    m = len(codes)
+    lanes = len(lane_queues)
+    current_green = state["current_green"]
+    flags = FLAG_RUNNING if state["is_running"] else 0
+
+    header = _HEADER.pack(
+        FRAME_MAGIC,
+        FRAME_VERSION,
+        flags,
+        state["simulation_time"],
+        -1 if current_green is None else current_green,
+        int(state["green_duration"]),
+        n,
+        state["simulation_speed"],
+    )
+    arrays = struct.pack(
+        f"<{n}H{n}H{n}H{n}f{n}B{n}B{n}B{lanes}H{m}B{m}f{m}f",
+        *directions, *counts, *capacities, *densities, *preview_counts,
+        *road_flags, *lane_counts, *lane_queues, *codes, *waits, *priorities
+    )
+    import msgpack  # Only needed once a binary client connects
+
+    extra = {key: value for key, value in state.items() if key not in LAYOUT_KEYS}
+    if road_extra:
+        extra["road_extra"] = road_extra
+    extra = msgpack.packb(extra, use_single_float=True)
+
+    return b"".join((
+        header, arrays, struct.pack("<I", len(extra)), extra,
+        struct.pack("<d", state.get("server_time", 0.0))
+    ))
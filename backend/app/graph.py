@@ -1,5 +1,6 @@
-from typing import Dict, List, Optional
-from .models import IntersectionNode, Road
+from typing import Dict, List, Optional, Tuple
+from .models import IntersectionNode, Road, RoadDirection
+from .congestion_index import DEFAULT_REGION, CongestionIndex
 
 class TrafficGraph:
     """Graph representation of the traffic network"""
@@ -8,15 +9,32 @@ class TrafficGraph:
         self.intersections: Dict[str, IntersectionNode] = {}
         self.adjacency_list: Dict[str, List[str]] = {}
         self.road_map: Dict[str, Road] = {}
+        self.road_endpoints: Dict[str, Tuple[str, str]] = {}
+        # (from, to) -> approach of `from` facing `to`, for intersections
+        # linked without sharing a road object (see link_intersections)
+        self.approach_links: Dict[Tuple[str, str], RoadDirection] = {}
+        # Density aggregates kept current through the roads' density
+        # listeners; roads must be added through the graph to be indexed
+        self.congestion = CongestionIndex()
     
-    def add_intersection(self, intersection: IntersectionNode):
-        """Add an intersection to the graph"""
+    def add_intersection(self, intersection: IntersectionNode, region: str = DEFAULT_REGION):
+        """Add an intersection to the graph (region groups intersections
+        for congestion queries, e.g. a district)"""
         self.intersections[intersection.id] = intersection
         self.adjacency_list[intersection.id] = []
+        self.congestion.add_intersection(intersection.id, region)
+        for direction, road in intersection.roads.items():
+            self._index_road(intersection.id, direction, road)
+    
+    def _index_road(self, intersection_id: str, direction, road: Road):
+        self.congestion.attach(intersection_id, direction, road)
+        if self.congestion.update not in road.density_listeners:
+            road.density_listeners.append(self.congestion.update)
     
     def add_road(self, road: Road, from_intersection: str, to_intersection: str):
         """Add a road connecting two intersections"""
         self.road_map[road.id] = road
+        self.road_endpoints[road.id] = (from_intersection, to_intersection)
         
         # Add to adjacency list
         if from_intersection in self.intersections and to_intersection in self.intersections:
@@ -27,9 +45,21 @@ class TrafficGraph:
             
             # Add road to intersections
             self.intersections[from_intersection].roads[road.direction] = road
+            self._index_road(from_intersection, road.direction, road)
             # For the opposite direction at the other intersection
             opposite_direction = self._get_opposite_direction(road.direction)
             self.intersections[to_intersection].roads[opposite_direction] = road
+            self._index_road(to_intersection, opposite_direction, road)
+    
+    def link_intersections(self, from_id: str, to_id: str, direction: RoadDirection):
+        """Record that from_id's `direction` approach faces to_id (and
+        to_id's opposite approach faces back) without moving roads between
+        intersections, e.g. for intersections owned by separate engines"""
+        for a, b in ((from_id, to_id), (to_id, from_id)):
+            if b not in self.adjacency_list[a]:
+                self.adjacency_list[a].append(b)
+        self.approach_links[(from_id, to_id)] = direction
+        self.approach_links[(to_id, from_id)] = self._get_opposite_direction(direction)
     
     def _get_opposite_direction(self, direction):
         """Get opposite direction for a road"""
@@ -43,7 +73,6 @@ class TrafficGraph:
             270: 90,   # West -> East
             315: 135   # Northwest -> Southeast
         }
-        from .models import RoadDirection
         return RoadDirection(opposite_angles.get(direction.value, direction.value))
     
     def get_neighbors(self, intersection_id: str) -> List[str]:
@@ -51,12 +80,14 @@ class TrafficGraph:
         return self.adjacency_list.get(intersection_id, [])
     
     def get_connecting_road(self, from_id: str, to_id: str) -> Optional[Road]:
-        """Get the road connecting two intersections"""
-        if from_id in self.intersections and to_id in self.intersections:
-            for road in self.intersections[from_id].roads.values():
-                # Check if this road connects to the target intersection
-                # This is a simplified check - in real implementation you'd need road metadata
-                pass
+        """Get the road connecting two intersections (for linked
+        intersections, from_id's approach facing to_id)"""
+        direction = self.approach_links.get((from_id, to_id))
+        if direction is not None:
+            return self.intersections[from_id].roads.get(direction)
+        for road_id, endpoints in self.road_endpoints.items():
+            if endpoints == (from_id, to_id) or endpoints == (to_id, from_id):
+                return self.road_map[road_id]
         return None
     
     def find_shortest_path(self, start_id: str, end_id: str) -> List[str]:
@@ -81,36 +112,21 @@ class TrafficGraph:
         return []  # No path found
     
     def get_congestion_level(self) -> float:
-        """Calculate overall congestion level of the network"""
-        if not self.intersections:
-            return 0.0
-        
-        total_density = 0.0
-        road_count = 0
-        
-        for intersection in self.intersections.values():
-            for road in intersection.roads.values():
-                total_density += road.traffic_density
-                road_count += 1
-        
-        return total_density / road_count if road_count > 0 else 0.0
+        """Calculate overall congestion level of the network (mean density
+        over every intersection approach)"""
+        return self.congestion.global_stats()["mean"]
     
-    def get_intersection_with_highest_congestion(self) -> Optional[str]:
-        """Find intersection with highest average road congestion"""
-        if not self.intersections:
-            return None
-        
-        max_congestion = -1.0
-        max_intersection = None
-        
-        for intersection_id, intersection in self.intersections.items():
-            if not intersection.roads:
-                continue
-            
-            avg_congestion = sum(road.traffic_density for road in intersection.roads.values()) / len(intersection.roads)
-            
-            if avg_congestion > max_congestion:
-                max_congestion = avg_congestion
-                max_intersection = intersection_id
-        
-        return max_intersection
\ No newline at end of file
+    def get_region_congestion(self, region: str = DEFAULT_REGION) -> Dict:
+        """Density sum, count, mean and maximum (with its location) of a region"""
+        return self.congestion.region_stats(region)
+    
+    def get_intersection_with_highest_congestion(self, region: Optional[str] = None) -> Optional[str]:
+        """Find intersection with highest average road congestion, network-wide
+        or within a region"""
+        hotspot = self.congestion.hotspot(region)
+        return hotspot[0] if hotspot else None
+    
+    def road_density_changed(self, road: Road):
+        """Re-index a road whose traffic_density was assigned directly rather
+        than through Road.update_density"""
+        self.congestion.update(road)
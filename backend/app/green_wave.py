@@ -0,0 +1,237 @@
+"""Green-wave coordination for corridors of signalized intersections.
+
+Computes a common cycle length, per-intersection arterial green splits and
+offsets so that platoons travelling along a TrafficGraph path meet
+consecutive greens in both directions. For each candidate cycle the offsets
+are chosen by a sequential search over the whole offset grid followed by
+coordinate-descent refinement; every candidate offset is scored at once with
+NumPy, so a corridor re-optimizes in milliseconds.
+
+Plans take effect through TrafficSimulationEngine.update_signal, which
+holds the arterial through movement green during each intersection's
+window; coordinate_engines() chains engines into a corridor whose
+coordinator runs on their ticks.
+"""
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from .graph import TrafficGraph
+from .models import IntersectionNode, RoadDirection
+
+
+@dataclass
+class CorridorPlan:
+    intersection_ids: List[str]
+    cycle_length: float  # seconds
+    offsets: List[float]  # seconds, start of arterial green relative to the first intersection
+    green_splits: List[float]  # seconds of arterial green per cycle
+    outbound_bandwidth: float  # seconds of the cycle a platoon can travel first -> last
+    inbound_bandwidth: float  # seconds of the cycle a platoon can travel last -> first
+    computed_at: datetime = field(default_factory=datetime.now)
+
+    @property
+    def efficiency(self) -> float:
+        """Average two-way bandwidth as a fraction of the cycle"""
+        return (self.outbound_bandwidth + self.inbound_bandwidth) / (2 * self.cycle_length)
+
+
+def arterial_green_ratios(graph: TrafficGraph, path: Sequence[str],
+                          min_ratio: float = 0.3, max_ratio: float = 0.7) -> List[float]:
+    """Share of each cycle given to the arterial, from current road densities"""
+    ratios = []
+    for i, intersection_id in enumerate(path):
+        intersection = graph.intersections[intersection_id]
+        arterial_ids = set()
+        for neighbor in (path[i - 1] if i > 0 else None, path[i + 1] if i + 1 < len(path) else None):
+            road = graph.get_connecting_road(intersection_id, neighbor) if neighbor else None
+            if road:
+                arterial_ids.add(road.id)
+
+        roads = list(intersection.roads.values())
+        arterial = sum(r.traffic_density for r in roads if r.id in arterial_ids)
+        cross = sum(r.traffic_density for r in roads if r.id not in arterial_ids)
+        share = arterial / (arterial + cross) if arterial + cross > 0 else 0.5
+        ratios.append(min(max(share, min_ratio), max_ratio))
+    return ratios
+
+
+def _green_masks(t: np.ndarray, arrival: float, offsets: np.ndarray,
+                 green: float, cycle: float) -> np.ndarray:
+    """(offset candidate x departure time) mask of arriving during green"""
+    return np.mod(t[None, :] + arrival - offsets[:, None], cycle) < green
+
+
+def _optimize_offsets(arrivals_out: np.ndarray, arrivals_in: np.ndarray,
+                      greens: np.ndarray, cycle: float, resolution: float,
+                      refinement_passes: int):
+    n = len(greens)
+    grid = np.arange(0.0, cycle, resolution)
+    offsets = np.zeros(n)
+
+    # Sequential pass: place each intersection to extend the band so far
+    out_band = np.ones(grid.size, dtype=bool)
+    in_band = np.ones(grid.size, dtype=bool)
+    for i in range(n):
+        candidates = grid if i > 0 else np.zeros(1)
+        out_masks = _green_masks(grid, arrivals_out[i], candidates, greens[i], cycle) & out_band
+        in_masks = _green_masks(grid, arrivals_in[i], candidates, greens[i], cycle) & in_band
+        best = int(np.argmax(out_masks.sum(axis=1) + in_masks.sum(axis=1)))
+        offsets[i] = candidates[best]
+        out_band, in_band = out_masks[best], in_masks[best]
+
+    # Coordinate descent: re-place each intersection given all the others
+    for _ in range(refinement_passes):
+        improved = False
+        for i in range(1, n):
+            others = [j for j in range(n) if j != i]
+            out_rest = np.ones(grid.size, dtype=bool)
+            in_rest = np.ones(grid.size, dtype=bool)
+            for j in others:
+                out_rest &= _green_masks(grid, arrivals_out[j], offsets[j:j + 1], greens[j], cycle)[0]
+                in_rest &= _green_masks(grid, arrivals_in[j], offsets[j:j + 1], greens[j], cycle)[0]
+            out_masks = _green_masks(grid, arrivals_out[i], grid, greens[i], cycle) & out_rest
+            in_masks = _green_masks(grid, arrivals_in[i], grid, greens[i], cycle) & in_rest
+            scores = out_masks.sum(axis=1) + in_masks.sum(axis=1)
+            best = int(np.argmax(scores))
+            current = int(round(offsets[i] / resolution)) % grid.size
+            if scores[best] > scores[current]:
+                offsets[i] = grid[best]
+                improved = True
+        if not improved:
+            break
+
+    out_band = np.ones(grid.size, dtype=bool)
+    in_band = np.ones(grid.size, dtype=bool)
+    for i in range(n):
+        out_band &= _green_masks(grid, arrivals_out[i], offsets[i:i + 1], greens[i], cycle)[0]
+        in_band &= _green_masks(grid, arrivals_in[i], offsets[i:i + 1], greens[i], cycle)[0]
+    return offsets, out_band.sum() * resolution, in_band.sum() * resolution
+
+
+def optimize_corridor(graph: TrafficGraph, path: Sequence[str],
+                      link_travel_times: Sequence[float],
+                      cycle_lengths: Iterable[float] = range(60, 125, 5),
+                      resolution: float = 1.0,
+                      refinement_passes: int = 3,
+                      green_ratios: Optional[Sequence[float]] = None) -> CorridorPlan:
+    """Find the cycle length, splits and offsets maximizing two-way bandwidth.
+
+    `link_travel_times[i]` is the travel time in seconds from path[i] to
+    path[i + 1]. Splits follow current densities unless `green_ratios` is
+    given. Cycles are compared by bandwidth as a fraction of the cycle.
+    """
+    path = list(path)
+    if len(link_travel_times) != len(path) - 1:
+        raise ValueError("Need one travel time per link of the path")
+
+    ratios = np.asarray(green_ratios if green_ratios is not None
+                        else arterial_green_ratios(graph, path))
+    arrivals_out = np.concatenate(([0.0], np.cumsum(link_travel_times)))
+    arrivals_in = arrivals_out[-1] - arrivals_out
+
+    best_plan = None
+    for cycle in cycle_lengths:
+        cycle = float(cycle)
+        greens = ratios * cycle
+        offsets, out_bw, in_bw = _optimize_offsets(
+            arrivals_out, arrivals_in, greens, cycle, resolution, refinement_passes)
+        plan = CorridorPlan(
+            intersection_ids=path,
+            cycle_length=cycle,
+            offsets=offsets.tolist(),
+            green_splits=greens.tolist(),
+            outbound_bandwidth=float(out_bw),
+            inbound_bandwidth=float(in_bw),
+        )
+        if best_plan is None or plan.efficiency > best_plan.efficiency:
+            best_plan = plan
+    return best_plan
+
+
+def apply_plan(graph: TrafficGraph, plan: CorridorPlan):
+    """Write the plan's timing and arterial approaches onto the corridor's
+    intersections (TrafficSimulationEngine.update_signal follows them)"""
+    path = plan.intersection_ids
+    for i, (intersection_id, offset, green) in enumerate(zip(path, plan.offsets, plan.green_splits)):
+        intersection = graph.intersections[intersection_id]
+        intersection.cycle_length = plan.cycle_length
+        intersection.offset = offset
+        intersection.arterial_green = green
+        neighbors = [path[j] for j in (i - 1, i + 1) if 0 <= j < len(path)]
+        connecting = [graph.get_connecting_road(intersection_id, neighbor) for neighbor in neighbors]
+        intersection.arterial_directions = [
+            direction for direction, road in intersection.roads.items()
+            if any(road is link for link in connecting)
+        ]
+
+
+def arterial_green_active(intersection: IntersectionNode, t: float) -> bool:
+    """Whether a coordinated intersection shows arterial green at time t (seconds)"""
+    if intersection.cycle_length is None:
+        return False
+    return (t - intersection.offset) % intersection.cycle_length < intersection.arterial_green
+
+
+class CorridorCoordinator:
+    """Re-optimizes a corridor's green wave online as densities change"""
+
+    def __init__(self, graph: TrafficGraph, start_id: str, end_id: str,
+                 link_travel_times: Sequence[float],
+                 reoptimize_interval: float = 300.0, **optimizer_options):
+        self.graph = graph
+        self.path = graph.find_shortest_path(start_id, end_id)
+        if len(self.path) < 2:
+            raise ValueError(f"No corridor between {start_id} and {end_id}")
+        self.link_travel_times = list(link_travel_times)
+        self.reoptimize_interval = reoptimize_interval
+        self.optimizer_options = optimizer_options
+        self.plan: Optional[CorridorPlan] = None
+        self.last_optimized: Optional[float] = None
+        self.last_solve_seconds = 0.0
+
+    def reoptimize(self, now: float = 0.0) -> CorridorPlan:
+        """Solve and apply a new plan; `now` is the signal-plan time in seconds"""
+        start = time.perf_counter()
+        self.plan = optimize_corridor(self.graph, self.path, self.link_travel_times,
+                                      **self.optimizer_options)
+        apply_plan(self.graph, self.plan)
+        self.last_solve_seconds = time.perf_counter() - start
+        self.last_optimized = now
+        return self.plan
+
+    def update(self, now: float) -> Optional[CorridorPlan]:
+        """Re-optimize if the control interval has elapsed at signal-plan time
+        `now` (seconds, as the engines' signal_time); returns a new plan or None"""
+        if self.last_optimized is not None and \
+                0 <= now - self.last_optimized < self.reoptimize_interval:
+            return None
+        return self.reoptimize(now)
+
+
+def coordinate_engines(engines: Sequence, link_travel_times: Sequence[float],
+                       direction: RoadDirection = RoadDirection.EAST,
+                       **coordinator_options) -> CorridorCoordinator:
+    """Coordinate a chain of TrafficSimulationEngines as one corridor.
+
+    engines[i]'s `direction` approach is taken to face engines[i + 1].
+    Their intersections get distinct ids and are linked in a TrafficGraph,
+    and every engine's tick runs the shared coordinator, which
+    re-optimizes on its interval and writes the plan the engines'
+    update_signal follows.
+    """
+    graph = TrafficGraph()
+    for i, engine in enumerate(engines):
+        engine.intersection.id = f"corridor-{i}"
+        graph.add_intersection(engine.intersection)
+    for i in range(len(engines) - 1):
+        graph.link_intersections(f"corridor-{i}", f"corridor-{i + 1}", direction)
+
+    coordinator = CorridorCoordinator(graph, "corridor-0", f"corridor-{len(engines) - 1}",
+                                      link_travel_times, **coordinator_options)
+    for engine in engines:
+        engine.coordinator = coordinator
+    return coordinator
@@ -1,28 +1,40 @@
-from fastapi import FastAPI, WebSocket, HTTPException
+from fastapi import Body, FastAPI, WebSocket, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import asyncio
 import json
-from typing import List, Dict
+import os
+from typing import List, Dict, Optional, Tuple
 import time
 
 from .simulation_engine import TrafficSimulationEngine
-from .models import RoadDirection
+from .commands import CommandError, CommandQueue, execute
+from .cluster import OwnerClient
+from .frame_codec import (
+    BINARY_FORMAT, BINARY_SUBPROTOCOL, JSON_FORMAT, encode_state, negotiate_format
+)
+from .tick_scheduler import TickScheduler
+from .subscriptions import FULL_STATE, Subscription, parse_subscription, project_state
 
 # Global variables
 simulation: TrafficSimulationEngine = None
-connections: List[WebSocket] = []
+connections: Dict[WebSocket, Tuple[str, Subscription]] = {}  # client -> (frame format, topics)
 simulation_task = None
+command_queue = CommandQueue()  # batches applied at the next tick boundary
+
+# Worker mode: with TRAFFIC_OWNER=host:port this process serves a simulation
+# owned by another process (python -m app.cluster) instead of running one
+OWNER_ADDRESS = os.environ.get("TRAFFIC_OWNER")
+owner_client: Optional[OwnerClient] = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup
-    global simulation, simulation_task
-    simulation = TrafficSimulationEngine()
-    simulation.start()
-    
-    # Start background simulation task
-    simulation_task = asyncio.create_task(run_simulation_background())
+    # Startup: nothing is built here so the server (and /health) answer
+    # immediately; the engine is created on first use by get_simulation()
+    global owner_client, simulation, simulation_task
+    if OWNER_ADDRESS:
+        owner_client = OwnerClient(OWNER_ADDRESS, on_frame=broadcast_frame)
+        simulation_task = asyncio.create_task(owner_client.run())
     
     yield
     
@@ -33,11 +45,56 @@ async def lifespan(app: FastAPI):
             await simulation_task
         except asyncio.CancelledError:
             pass
+        simulation_task = None
+    owner_client = None
     
-    simulation.stop()
+    if simulation:
+        simulation.stop()
     simulation = None
     connections.clear()
 
+def get_simulation() -> TrafficSimulationEngine:
+    """Return the simulation, constructing it and starting the background
+    loop on first use.
+    
+    There is one engine per server process, shared by every client, rather
+    than one per session: the app has no sessions, every client watches and
+    controls the same intersection, and the multi-worker mode relies on a
+    single owned engine. Building it on demand still keeps cold start free
+    of engine construction and its NumPy import."""
+    global simulation, simulation_task
+    if simulation is None:
+        simulation = TrafficSimulationEngine()
+        simulation.start()
+        simulation_task = asyncio.create_task(run_simulation_background())
+    return simulation
+
+async def run_command(name: str, *args) -> Dict:
+    """Run a control command on the local engine, or forward it to the
+    engine owner in worker mode"""
+    try:
+        if owner_client:
+            return await owner_client.call(name, *args)
+        return execute(get_simulation(), name, *args)
+    except CommandError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+async def submit_batch(commands: List[Dict], atomic: bool = True) -> Dict:
+    """Queue a command batch for the next tick boundary (on the engine
+    owner in worker mode) and wait for its per-command results"""
+    if owner_client:
+        return await owner_client.call("execute_batch", commands, atomic)
+    get_simulation()  # Make sure the tick loop that applies the queue runs
+    return await command_queue.submit(commands, atomic)
+
+async def current_state() -> Dict:
+    """Latest simulation state (the last published frame in worker mode)"""
+    if owner_client:
+        if owner_client.latest_state is None:
+            raise HTTPException(status_code=503, detail="Engine owner unavailable")
+        return owner_client.latest_state
+    return get_simulation().get_state()
+
 app = FastAPI(title="Smart Traffic Signal System", lifespan=lifespan)
 
 # CORS middleware
@@ -50,45 +107,89 @@ app.add_middleware(
 )
 
 async def run_simulation_background():
-    """Background task to run simulation and broadcast updates"""
-    global simulation, connections
+    """Background task to run simulation and broadcast updates on a fixed
+    schedule (see tick_scheduler.py)"""
+    engine = simulation
+    
+    async def step():
+        # Apply queued command batches between ticks
+        command_queue.apply(engine)
+        await engine.run_step()
+    
+    async def broadcast():
+        # Broadcast to all connected WebSocket clients
+        await broadcast_state(engine.get_state())
+    
+    engine.scheduler = TickScheduler(engine)
+    try:
+        await engine.scheduler.run(step, broadcast)
+    except asyncio.CancelledError:
+        pass
+    finally:
+        engine.scheduler = None
+
+async def broadcast_frame(payload: bytes, state: Dict):
+    """Fan out a frame published by the engine owner (worker mode)"""
+    await broadcast_state(state, json_text=payload.decode())
+
+def encode_frame(state: Dict, frame_format: str):
+    if frame_format == BINARY_FORMAT:
+        return encode_state(state)
+    return json.dumps(state, separators=(",", ":"))
+
+async def send_frame(websocket: WebSocket, frame_format: str, frame):
+    if frame_format == BINARY_FORMAT:
+        await websocket.send_bytes(frame)
+    else:
+        await websocket.send_text(frame)
+
+async def broadcast_state(state: Dict, json_text: Optional[str] = None):
+    """Send a state frame to every client, projecting once per distinct
+    subscription and encoding once per (frame format, subscription)"""
+    projections: Dict[Subscription, Dict] = {}
+    frames: Dict[Tuple[str, Subscription], object] = {}
+    
+    # Alert events travel as their own small message to the clients
+    # subscribed to alerts, in every frame format, instead of inside frames
+    alert_text = None
+    if state.get("alerts"):
+        alert_text = json.dumps({
+            "type": "alerts",
+            "simulation_time": state["simulation_time"],
+            "events": state["alerts"]
+        }, separators=(",", ":"))
+        state = {**state, "alerts": []}
+        json_text = None
+    if json_text is not None:
+        frames[(JSON_FORMAT, FULL_STATE)] = json_text
     
-    while True:
+    for connection, key in list(connections.items()):  # Copy to avoid modification during iteration
+        frame_format, subscription = key
+        if key not in frames:
+            if subscription not in projections:
+                projections[subscription] = project_state(state, subscription)
+            frames[key] = encode_frame(projections[subscription], frame_format)
+        
         try:
-            if simulation:
-                # Run simulation step
-                await simulation.run_step()
-                
-                # Get current state
-                state = simulation.get_state()
-                
-                # Broadcast to all connected WebSocket clients
-                for connection in connections[:]:  # Create a copy to avoid modification during iteration
-                    try:
-                        await connection.send_json(state)
-                    except:
-                        # Remove disconnected clients
-                        try:
-                            connections.remove(connection)
-                        except ValueError:
-                            pass
-            
-            # Sleep based on simulation speed (faster speed = shorter delay)
-            delay = 1.0 / simulation.simulation_speed if simulation else 1.0
-            await asyncio.sleep(delay)
-            
-        except asyncio.CancelledError:
-            break
-        except Exception as e:
-            print(f"Background task error: {e}")
-            await asyncio.sleep(1)
+            await send_frame(connection, frame_format, frames[key])
+            if alert_text and subscription.alerts:
+                await connection.send_text(alert_text)
+        except:
+            # Remove disconnected clients
+            connections.pop(connection, None)
+
+def is_running() -> bool:
+    """Whether the simulation is running, without constructing it"""
+    if owner_client:
+        return bool(owner_client.latest_state and owner_client.latest_state["is_running"])
+    return simulation.is_running if simulation else False
 
 @app.get("/")
 async def root():
     return {
         "message": "Smart Traffic Signal Control System",
         "version": "1.0.0",
-        "status": "running" if simulation and simulation.is_running else "stopped",
+        "status": "running" if is_running() else "stopped",
         "intersection": "8-way complex intersection",
         "endpoints": {
             "state": "/state",
@@ -101,21 +202,12 @@ async def root():
 
 @app.get("/state")
 async def get_state():
-    if simulation:
-        return simulation.get_state()
-    raise HTTPException(status_code=404, detail="Simulation not initialized")
+    return await current_state()
 
 @app.post("/emergency/{direction}")
 async def add_emergency(direction: int):
     """Add emergency vehicle to specific direction (0-315 in 45-degree increments)"""
-    if simulation:
-        success = simulation.add_emergency_vehicle(direction)
-        return {
-            "success": success,
-            "direction": direction,
-            "message": "Emergency vehicle added successfully" if success else "Failed to add emergency vehicle"
-        }
-    raise HTTPException(status_code=404, detail="Simulation not initialized")
+    return await run_command("add_emergency_vehicle", direction)
 
 @app.post("/config")
 async def update_config(
@@ -124,168 +216,157 @@ async def update_config(
     emergency_prob: float = None
 ):
     """Update simulation configuration"""
-    if simulation:
-        simulation.update_config(green_duration, vehicle_rate, emergency_prob)
-        
-        current_config = {
-            "green_duration": simulation.green_signal_duration,
-            "vehicle_rate": simulation.vehicle_generation_rate,
-            "emergency_probability": simulation.emergency_probability * 100
-        }
-        
-        return {
-            "success": True,
-            "message": "Configuration updated",
-            "config": current_config
-        }
-    raise HTTPException(status_code=404, detail="Simulation not initialized")
+    return await run_command("update_config", green_duration, vehicle_rate, emergency_prob)
 
 @app.post("/control/{action}")
 async def control_simulation(action: str):
     """Control simulation actions: start, stop, reset"""
-    if not simulation:
-        raise HTTPException(status_code=404, detail="Simulation not initialized")
-    
-    action = action.lower()
-    
-    if action == "start":
-        simulation.start()
-        return {"success": True, "message": "Simulation started"}
-    
-    elif action == "stop":
-        simulation.stop()
-        return {"success": True, "message": "Simulation stopped"}
-    
-    elif action == "reset":
-        simulation.reset()
-        return {"success": True, "message": "Simulation reset"}
-    
-    elif action == "pause":
-        simulation.stop()
-        return {"success": True, "message": "Simulation paused"}
-    
-    else:
-        raise HTTPException(status_code=400, detail=f"Unknown action: {action}")
+    return await run_command("control", action)
 
 @app.post("/speed/{multiplier}")
 async def set_simulation_speed(multiplier: float):
     """Set simulation speed (0.5 to 5.0)"""
-    if simulation:
-        new_speed = simulation.set_speed(multiplier)
-        return {
-            "success": True,
-            "speed": new_speed,
-            "message": f"Simulation speed set to {new_speed}x"
-        }
-    raise HTTPException(status_code=404, detail="Simulation not initialized")
+    return await run_command("set_speed", multiplier)
 
 @app.get("/history")
 async def get_history(limit: int = 50):
     """Get simulation history data"""
-    if simulation:
-        return {
-            "history": simulation.history[-limit:] if limit > 0 else simulation.history,
-            "count": len(simulation.history)
-        }
-    raise HTTPException(status_code=404, detail="Simulation not initialized")
+    return await run_command("get_history", limit)
+
+@app.post("/trace")
+async def load_trace(path: str, start_time: float = None):
+    """Replay recorded arrivals from a CSV or binary trace file instead of
+    synthetic generation, optionally seeking to start_time (seconds). The
+    path is relative to the trace directory (TRAFFIC_TRACES_DIR)."""
+    return await run_command("load_trace", path, start_time)
+
+@app.get("/trace")
+async def get_trace():
+    """Get the status of the active trace replay or demand profile"""
+    return await run_command("get_trace")
+
+@app.delete("/trace")
+async def clear_trace():
+    """Stop trace replay or demand profile and return to synthetic arrivals"""
+    return await run_command("clear_trace")
+
+@app.post("/demand")
+async def load_demand(profile: Optional[Dict] = Body(None), preset: str = None, seed: int = None):
+    """Drive arrivals from a time-varying demand profile: a JSON body or a
+    preset name (e.g. weekday, stadium_event). Check progress with GET /trace."""
+    if profile is None and preset is None:
+        raise HTTPException(status_code=400, detail="Provide a profile body or a preset name")
+    return await run_command("load_demand", profile if profile is not None else preset, seed)
+
+@app.post("/runs/record")
+async def start_recording(name: str = "run"):
+    """Start recording ticks and departures of the current run to the catalog"""
+    return await run_command("start_recording", name)
+
+@app.delete("/runs/record")
+async def stop_recording():
+    """Finish the current recording"""
+    return await run_command("stop_recording")
+
+@app.get("/runs/record")
+async def get_recording():
+    """Get the status of the current recording"""
+    return await run_command("get_recording")
+
+@app.get("/runs")
+async def list_runs():
+    """List recorded runs in the catalog"""
+    from .run_catalog import RunCatalog
+    return {"runs": await asyncio.to_thread(RunCatalog().list_runs)}
+
+@app.get("/runs/query")
+async def query_runs(
+    runs: str,
+    table: str = "departures",
+    value: str = "wait",
+    agg: str = "p95",
+    group_by: Optional[str] = "road",
+    tick_from: int = None,
+    tick_to: int = None,
+    road: int = None,
+    vehicle_type: str = None,
+    emergency: bool = None
+):
+    """Aggregate a column over recorded runs (comma-separated ids), e.g.
+    p95 wait by road between two ticks; group_by=none for one value per run"""
+    from .run_catalog import RunCatalog, parse_filters
+    
+    try:
+        filters = parse_filters(road, vehicle_type, emergency)
+        return await asyncio.to_thread(
+            RunCatalog().query,
+            [r for r in runs.split(",") if r],
+            table, value, agg,
+            None if group_by in (None, "", "none") else group_by,
+            tick_from, tick_to, filters
+        )
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=f"Run not found: {e}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/alerts")
+async def get_alerts():
+    """Alert rules, active alerts and recent raised/cleared events"""
+    return await run_command("get_alerts")
+
+@app.put("/alerts/rules")
+async def set_alert_rules(rules: Optional[List[Dict]] = Body(None)):
+    """Replace the alert rules (an empty body restores the defaults)"""
+    return await run_command("set_alert_rules", rules)
+
+@app.post("/commands")
+async def run_commands(commands: List[Dict] = Body(..., embed=True), atomic: bool = Body(True, embed=True)):
+    """Apply a batch of commands, e.g. [{"command": "road_action", "args": [0, "priority"]}],
+    together at the next tick boundary; atomic batches roll back on any failure
+    (so they may not contain a "control" "reset")"""
+    try:
+        return await submit_batch(commands, atomic)
+    except CommandError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+@app.get("/scheduler")
+async def get_scheduler():
+    """Tick loop policy, effective speed and overrun statistics"""
+    return await run_command("get_scheduler")
+
+@app.post("/scheduler")
+async def set_tick_policy(policy: str, max_catch_up: int = None):
+    """Set how the tick loop catches up when behind: skip_broadcast, batch
+    or slow_down"""
+    return await run_command("set_tick_policy", policy, max_catch_up)
 
 @app.get("/road/{direction}")
 async def get_road_state(direction: int):
     """Get detailed state of a specific road"""
-    if simulation:
-        try:
-            road_dir = RoadDirection(direction)
-            road = simulation.intersection.roads.get(road_dir)
-            
-            if road:
-                return {
-                    "direction": direction,
-                    "name": road.name,
-                    "vehicle_count": len(road.vehicles),
-                    "density": road.traffic_density,
-                    "capacity": road.max_capacity,
-                    "capacity_used": f"{(len(road.vehicles) / road.max_capacity * 100):.1f}%",
-                    "lanes": road.lane_count,
-                    "is_green": simulation.intersection.current_green == road_dir
-                }
-            else:
-                raise HTTPException(status_code=404, detail=f"Road direction {direction} not found")
-        except ValueError:
-            raise HTTPException(status_code=400, detail=f"Invalid direction: {direction}")
-    raise HTTPException(status_code=404, detail="Simulation not initialized")
+    return await run_command("get_road", direction)
 
 @app.post("/road/{direction}/{action}")
 async def road_control(direction: int, action: str):
     """Control a specific road: priority, clear, or add vehicles"""
-    if not simulation:
-        raise HTTPException(status_code=404, detail="Simulation not initialized")
-    
-    try:
-        road_dir = RoadDirection(direction)
-        road = simulation.intersection.roads.get(road_dir)
-        
-        if not road:
-            raise HTTPException(status_code=404, detail=f"Road direction {direction} not found")
-        
-        action = action.lower()
-        
-        if action == "priority":
-            # Force this road to get green signal
-            simulation.intersection.current_green = road_dir
-            simulation.metrics["signal_changes"] += 1
-            return {
-                "success": True,
-                "action": "priority",
-                "direction": direction,
-                "message": f"Priority given to {road.name} road"
-            }
-        
-        elif action == "clear":
-            # Clear vehicles from this road
-            cleared_count = len(road.vehicles)
-            road.vehicles.clear()
-            road.update_density()
-            return {
-                "success": True,
-                "action": "clear",
-                "direction": direction,
-                "cleared": cleared_count,
-                "message": f"Cleared {cleared_count} vehicles from {road.name} road"
-            }
-        
-        elif action == "add":
-            # Add a few vehicles to this road
-            added = 0
-            for _ in range(3):  # Add 3 vehicles
-                if len(road.vehicles) < road.max_capacity:
-                    vehicle = simulation.generate_vehicle()
-                    road.vehicles.append(vehicle)
-                    simulation.metrics["total_vehicles_generated"] += 1
-                    added += 1
-            road.update_density()
-            return {
-                "success": True,
-                "action": "add",
-                "direction": direction,
-                "added": added,
-                "message": f"Added {added} vehicles to {road.name} road"
-            }
-        
-        else:
-            raise HTTPException(status_code=400, detail=f"Unknown action: {action}. Use 'priority', 'clear', or 'add'")
-            
-    except ValueError:
-        raise HTTPException(status_code=400, detail=f"Invalid direction: {direction}")
+    return await run_command("road_action", direction, action)
 
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    await websocket.accept()
-    connections.append(websocket)
+async def websocket_endpoint(websocket: WebSocket, format: str = JSON_FORMAT):
+    """Live state stream; clients opt in to binary frames with ?format=binary
+    or the traffic.binary.v1 subprotocol"""
+    subprotocols = websocket.scope.get("subprotocols", [])
+    frame_format = negotiate_format(format, subprotocols)
+    await websocket.accept(
+        subprotocol=BINARY_SUBPROTOCOL if BINARY_SUBPROTOCOL in subprotocols else None
+    )
+    connections[websocket] = (frame_format, FULL_STATE)
     
     try:
         # Send initial state
-        if simulation:
-            await websocket.send_json(simulation.get_state())
+        state = owner_client.latest_state if owner_client else get_simulation().get_state()
+        if state:
+            await send_frame(websocket, frame_format, encode_frame(state, frame_format))
         
         # Keep connection alive
         while True:
@@ -293,17 +374,41 @@ async def websocket_endpoint(websocket: WebSocket):
             # Handle client messages if needed
             try:
                 message = json.loads(data)
-                if message.get("type") == "ping":
-                    await websocket.send_json({"type": "pong", "timestamp": time.time()})
-            except:
-                pass
+            except ValueError:
+                continue
+            if not isinstance(message, dict):
+                continue
+            
+            if message.get("type") == "ping":
+                await websocket.send_json({"type": "pong", "timestamp": time.time()})
+            
+            elif message.get("type") == "commands":
+                # Same as POST /commands; the reply carries the client's id
+                try:
+                    result = await submit_batch(message.get("commands"), message.get("atomic", True) is not False)
+                    await websocket.send_json({"type": "command_results", "id": message.get("id"), **result})
+                except CommandError as e:
+                    await websocket.send_json({"type": "error", "id": message.get("id"), "detail": e.detail})
+            
+            elif message.get("type") == "subscribe":
+                # Narrow this client's stream to the topics it views
+                try:
+                    subscription = parse_subscription(message)
+                except ValueError as e:
+                    await websocket.send_json({"type": "error", "detail": str(e)})
+                    continue
+                connections[websocket] = (frame_format, subscription)
+                await websocket.send_json({"type": "subscribed", "topics": subscription.describe()})
+                state = owner_client.latest_state if owner_client else get_simulation().get_state()
+                if state:
+                    await send_frame(websocket, frame_format,
+                                     encode_frame(project_state(state, subscription), frame_format))
                 
     except Exception as e:
         print(f"WebSocket error: {e}")
     finally:
         # Clean up connection
-        if websocket in connections:
-            connections.remove(websocket)
+        connections.pop(websocket, None)
 
 @app.get("/health")
 async def health_check():
@@ -311,8 +416,13 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": time.time(),
-        "simulation_running": simulation.is_running if simulation else False,
-        "active_connections": len(connections)
+        "simulation_running": is_running(),
+        "active_connections": len(connections),
+        "subscriptions": len({subscription for _, subscription in connections.values()}),
+        "role": "worker" if OWNER_ADDRESS else "standalone",
+        "owner_connected": owner_client.connected if owner_client else None,
+        "pid": os.getpid(),
+        "cpu_seconds": time.process_time()
     }
 
 if __name__ == "__main__":
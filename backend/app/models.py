@@ -1,8 +1,6 @@
 from enum import Enum
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Tuple
 from dataclasses import dataclass, field
-from datetime import datetime
-import random
 
 class VehicleType(Enum):
     CAR = "car"
@@ -12,6 +10,45 @@ class VehicleType(Enum):
     EMERGENCY = "emergency"
     BICYCLE = "bicycle"
 
+# Stable integer codes for vehicle types in binary formats (index = code)
+VEHICLE_TYPE_ORDER = [
+    VehicleType.CAR,
+    VehicleType.MOTORCYCLE,
+    VehicleType.TRUCK,
+    VehicleType.BUS,
+    VehicleType.EMERGENCY,
+    VehicleType.BICYCLE,
+]
+
+# Per-type contribution to road density (max weight per vehicle is 5)
+DENSITY_WEIGHTS = {
+    VehicleType.EMERGENCY: 5.0,
+    VehicleType.TRUCK: 1.5,
+    VehicleType.BUS: 1.5,
+    VehicleType.CAR: 1.0,
+    VehicleType.MOTORCYCLE: 0.7,
+    VehicleType.BICYCLE: 0.5
+}
+
+# Passenger-car equivalents: how much of a lane's discharge capacity a
+# vehicle of each type uses
+PCE_FACTORS = {
+    VehicleType.EMERGENCY: 1.0,
+    VehicleType.TRUCK: 2.0,
+    VehicleType.BUS: 2.0,
+    VehicleType.CAR: 1.0,
+    VehicleType.MOTORCYCLE: 0.5,
+    VehicleType.BICYCLE: 0.5
+}
+
+# Vehicles that keep to the rightmost lane they are allowed to use
+KEEP_RIGHT_TYPES = {VehicleType.TRUCK, VehicleType.BUS, VehicleType.BICYCLE}
+
+class Turn(Enum):
+    LEFT = "left"
+    STRAIGHT = "straight"
+    RIGHT = "right"
+
 class RoadDirection(Enum):
     NORTH = 0
     NORTHEAST = 45
@@ -22,13 +59,25 @@ class RoadDirection(Enum):
     WEST = 270
     NORTHWEST = 315
 
-@dataclass(order=True)
+# Base signal priority per vehicle type (higher = served first)
+BASE_PRIORITY = {
+    VehicleType.EMERGENCY: 100.0,
+    VehicleType.TRUCK: 3.0,
+    VehicleType.BUS: 3.0,
+    VehicleType.CAR: 2.0,
+    VehicleType.MOTORCYCLE: 1.0,
+    VehicleType.BICYCLE: 1.0
+}
+
+@dataclass(slots=True, eq=False)
 class Vehicle:
-    id: str
+    id: int
     vehicle_type: VehicleType
     waiting_time: float = 0.0  # in simulation minutes
-    entered_at: datetime = field(default_factory=datetime.now)
+    entered_at: float = 0.0  # simulation minute of arrival
     emergency: bool = False
+    turn: Turn = Turn.STRAIGHT
+    lane: int = 0  # 0 = leftmost lane, assigned on arrival
     priority: float = field(default=0.0, init=False)
     
     def __post_init__(self):
@@ -36,16 +85,7 @@ class Vehicle:
     
     def calculate_priority(self):
         # Higher number = higher priority
-        base_priority = {
-            VehicleType.EMERGENCY: 100.0,
-            VehicleType.TRUCK: 3.0,
-            VehicleType.BUS: 3.0,
-            VehicleType.CAR: 2.0,
-            VehicleType.MOTORCYCLE: 1.0,
-            VehicleType.BICYCLE: 1.0
-        }
-        
-        priority = base_priority.get(self.vehicle_type, 2.0)
+        priority = BASE_PRIORITY.get(self.vehicle_type, 2.0)
         
         # Increase priority with waiting time (every 2 minutes)
         priority += self.waiting_time * 0.5
@@ -54,6 +94,61 @@ class Vehicle:
             priority += 50.0
         
         return min(priority, 100.0)
+    
+    def __deepcopy__(self, memo):
+        # Every field is immutable, so a field-by-field copy is a deep copy
+        # (and far cheaper than the generic slots protocol), e.g. for
+        # engine snapshots taken by atomic command batches
+        vehicle = Vehicle(self.id, self.vehicle_type, self.waiting_time, self.entered_at,
+                          self.emergency, self.turn, self.lane)
+        vehicle.priority = self.priority
+        memo[id(self)] = vehicle
+        return vehicle
+
+class VehiclePool:
+    """Free list of Vehicle instances recycled across arrivals and departures.
+    
+    acquire() reinitializes a released vehicle (or builds one when the list
+    is empty) and hands out increasing integer ids; release() returns a
+    departed vehicle, which must no longer be referenced.
+    """
+    
+    def __init__(self, max_free: int = 4096):
+        self.max_free = max_free
+        self.free: List[Vehicle] = []
+        self.next_id = 0
+        self.created = 0
+        self.reused = 0
+    
+    def acquire(self, vehicle_type: VehicleType, emergency: bool = False,
+                turn: Turn = Turn.STRAIGHT, entered_at: float = 0.0) -> Vehicle:
+        vehicle_id = self.next_id
+        self.next_id += 1
+        if not self.free:
+            self.created += 1
+            return Vehicle(vehicle_id, vehicle_type, entered_at=entered_at,
+                           emergency=emergency, turn=turn)
+        
+        self.reused += 1
+        vehicle = self.free.pop()
+        vehicle.id = vehicle_id
+        vehicle.vehicle_type = vehicle_type
+        vehicle.waiting_time = 0.0
+        vehicle.entered_at = entered_at
+        vehicle.emergency = emergency
+        vehicle.turn = turn
+        vehicle.lane = 0
+        vehicle.priority = vehicle.calculate_priority()
+        return vehicle
+    
+    def release(self, vehicle: Vehicle):
+        if len(self.free) < self.max_free:
+            self.free.append(vehicle)
+    
+    def release_all(self, vehicles: List[Vehicle]):
+        room = self.max_free - len(self.free)
+        if room > 0:
+            self.free.extend(vehicles[:room])
 
 @dataclass
 class Road:
@@ -62,35 +157,89 @@ class Road:
     direction: RoadDirection
     lane_count: int = 2
     max_capacity: int = 50
-    vehicles: List[Vehicle] = field(default_factory=list)
+    vehicles: List[Vehicle] = field(default_factory=list)  # all lanes, in arrival order
     traffic_density: float = 0.0
+    lanes: List[List[Vehicle]] = field(default_factory=list, repr=False)  # per-lane FIFO queues
+    discharge_credit: List[float] = field(default_factory=list, repr=False)  # PCE each lane may still release
+    # Called with the road whenever update_density changes traffic_density
+    # (e.g. by TrafficGraph's congestion index)
+    density_listeners: List[Callable[["Road"], None]] = field(default_factory=list, repr=False, compare=False)
+    
+    def __post_init__(self):
+        if not self.lanes:
+            self.lanes = [[] for _ in range(self.lane_count)]
+            self.discharge_credit = [0.0] * self.lane_count
+    
+    def allowed_lanes(self, turn: Turn) -> range:
+        """Lanes a movement may use: left turns from the leftmost lane, right
+        turns from the rightmost, straight from every lane except a dedicated
+        left-turn lane on roads with three or more lanes"""
+        if turn == Turn.LEFT:
+            return range(0, 1)
+        if turn == Turn.RIGHT:
+            return range(self.lane_count - 1, self.lane_count)
+        return range(1 if self.lane_count >= 3 else 0, self.lane_count)
+    
+    def lane_load(self, lane: int) -> float:
+        return sum(PCE_FACTORS.get(v.vehicle_type, 1.0) for v in self.lanes[lane])
+    
+    def add_vehicle(self, vehicle: Vehicle, front: bool = False):
+        """Queue a vehicle in the least loaded lane it may use (front=True
+        puts it at the head of that lane, e.g. for emergency preemption)"""
+        allowed = self.allowed_lanes(vehicle.turn)
+        if vehicle.vehicle_type in KEEP_RIGHT_TYPES:
+            vehicle.lane = allowed[-1]
+        else:
+            vehicle.lane = min(allowed, key=self.lane_load)
+        
+        if front:
+            self.lanes[vehicle.lane].insert(0, vehicle)
+            self.vehicles.insert(0, vehicle)
+        else:
+            self.lanes[vehicle.lane].append(vehicle)
+            self.vehicles.append(vehicle)
+    
+    def remove_lane_heads(self, served: List[int]) -> List[Vehicle]:
+        """Pop the first served[i] vehicles of every lane i"""
+        departed = []
+        for lane, count in zip(self.lanes, served):
+            departed.extend(lane[:count])
+            del lane[:count]
+        if departed:
+            gone = {id(v) for v in departed}
+            self.vehicles = [v for v in self.vehicles if id(v) not in gone]
+        return departed
+    
+    def clear(self) -> List[Vehicle]:
+        """Remove every vehicle and return them (e.g. for a VehiclePool)"""
+        removed = self.vehicles
+        self.vehicles = []
+        for lane in self.lanes:
+            lane.clear()
+        self.discharge_credit = [0.0] * self.lane_count
+        return removed
     
     def update_density(self):
         if not self.vehicles:
-            self.traffic_density = 0.0
-            return
-        
-        # Base density from vehicle count
-        base_density = len(self.vehicles) / self.max_capacity
-        
-        # Weighted density based on vehicle types
-        type_weights = {
-            VehicleType.EMERGENCY: 5.0,
-            VehicleType.TRUCK: 1.5,
-            VehicleType.BUS: 1.5,
-            VehicleType.CAR: 1.0,
-            VehicleType.MOTORCYCLE: 0.7,
-            VehicleType.BICYCLE: 0.5
-        }
-        
-        weighted_sum = sum(type_weights.get(v.vehicle_type, 1.0) for v in self.vehicles)
-        type_density = weighted_sum / (self.max_capacity * 2)  # Max weight per vehicle is 5
-        
-        # Wait time contribution
-        total_wait_time = sum(v.waiting_time for v in self.vehicles)
-        wait_density = min(total_wait_time / 100, 0.3)  # Up to 30% contribution
+            density = 0.0
+        else:
+            # Base density from vehicle count
+            base_density = len(self.vehicles) / self.max_capacity
+            
+            # Weighted density based on vehicle types
+            weighted_sum = sum(DENSITY_WEIGHTS.get(v.vehicle_type, 1.0) for v in self.vehicles)
+            type_density = weighted_sum / (self.max_capacity * 2)  # Max weight per vehicle is 5
+            
+            # Wait time contribution
+            total_wait_time = sum(v.waiting_time for v in self.vehicles)
+            wait_density = min(total_wait_time / 100, 0.3)  # Up to 30% contribution
+            
+            density = (base_density + type_density + wait_density) * 100
         
-        self.traffic_density = (base_density + type_density + wait_density) * 100
+        if density != self.traffic_density:
+            self.traffic_density = density
+            for listener in self.density_listeners:
+                listener(self)
         return self.traffic_density
 
 @dataclass
@@ -100,7 +249,14 @@ class IntersectionNode:
     roads: Dict[RoadDirection, Road] = field(default_factory=dict)
     current_green: Optional[RoadDirection] = None
     green_duration: float = 30.0  # seconds (30 simulation minutes)
-    last_switch: datetime = field(default_factory=datetime.now)
+    last_switch: float = 0.0  # signal-plan seconds (see TrafficSimulationEngine.signal_time)
+    # Movements served by the active phase; current_green is its dominant approach
+    green_movements: List[Tuple[RoadDirection, Turn]] = field(default_factory=list)
+    # Corridor coordination (see green_wave.py); None = uncoordinated
+    cycle_length: Optional[float] = None  # seconds
+    offset: float = 0.0  # seconds, start of arterial green within the cycle
+    arterial_green: float = 0.0  # seconds of arterial green per cycle
+    arterial_directions: List[RoadDirection] = field(default_factory=list)  # approaches on the corridor
 
 class TrafficGraph:
     def __init__(self):
@@ -0,0 +1,113 @@
+"""Turning movements, their conflicts, and compatible signal phases.
+
+Each approach of an intersection has a left, straight and right movement.
+Movements are drawn as chords of a circle around the intersection: a
+vehicle enters just left of its approach angle (driving on the right) and
+leaves just right of its exit approach. Two movements conflict when their
+chords cross or when they merge into the same exit road; movements of the
+same approach share the road and never conflict.
+
+A phase is a maximal set of mutually compatible movements. The phases of a
+geometry are enumerated once (Bron-Kerbosch) and cached, so choosing the
+next phase is a single matrix-vector product over the phase incidence
+matrix.
+"""
+from functools import lru_cache
+from typing import FrozenSet, List, Sequence, Tuple
+
+from .models import Turn
+
+TURNS = [Turn.LEFT, Turn.STRAIGHT, Turn.RIGHT]
+
+# Exit angle relative to the approach angle (compass degrees, clockwise)
+EXIT_ROTATION = {Turn.LEFT: 90, Turn.STRAIGHT: 180, Turn.RIGHT: 270}
+
+# Angular half-width of a road where it meets the intersection
+LANE_OFFSET = 5.0
+
+Geometry = Tuple[int, ...]  # sorted approach angles
+Movement = Tuple[int, Turn]
+
+
+def geometry_of(angles: Sequence[int]) -> Geometry:
+    return tuple(sorted(angles))
+
+
+def movements(geometry: Geometry) -> List[Movement]:
+    """All movements of a geometry; the index is the movement id"""
+    return [(angle, turn) for angle in geometry for turn in TURNS]
+
+
+def exit_angle(geometry: Geometry, angle: int, turn: Turn) -> int:
+    """Approach a movement leaves by: the one closest to its exit rotation"""
+    target = (angle + EXIT_ROTATION[turn]) % 360
+    return min(geometry, key=lambda a: min((a - target) % 360, (target - a) % 360))
+
+
+def _chords_cross(a: Tuple[float, float], b: Tuple[float, float]) -> bool:
+    start, end = a
+    span = (end - start) % 360
+
+    def inside(point):
+        return 0 < (point - start) % 360 < span
+
+    return inside(b[0]) != inside(b[1])
+
+
+@lru_cache(maxsize=None)
+def conflict_matrix(geometry: Geometry) -> Tuple[Tuple[bool, ...], ...]:
+    moves = movements(geometry)
+    exits = [exit_angle(geometry, angle, turn) for angle, turn in moves]
+    chords = [((angle - LANE_OFFSET) % 360, (exit + LANE_OFFSET) % 360)
+              for (angle, _), exit in zip(moves, exits)]
+
+    rows = []
+    for i, (angle_i, _) in enumerate(moves):
+        row = []
+        for j, (angle_j, _) in enumerate(moves):
+            if angle_i == angle_j:
+                row.append(False)
+            else:
+                row.append(exits[i] == exits[j] or _chords_cross(chords[i], chords[j]))
+        rows.append(tuple(row))
+    return tuple(rows)
+
+
+@lru_cache(maxsize=None)
+def maximal_phases(geometry: Geometry) -> Tuple[FrozenSet[int], ...]:
+    """Maximal sets of pairwise compatible movements (maximal cliques of the
+    compatibility graph, found with pivoting Bron-Kerbosch)"""
+    conflicts = conflict_matrix(geometry)
+    count = len(conflicts)
+    compatible = [
+        {j for j in range(count) if j != i and not conflicts[i][j]}
+        for i in range(count)
+    ]
+
+    phases = []
+
+    def expand(clique, candidates, excluded):
+        if not candidates and not excluded:
+            phases.append(frozenset(clique))
+            return
+        pivot = max(candidates | excluded, key=lambda v: len(compatible[v] & candidates))
+        for v in list(candidates - compatible[pivot]):
+            expand(clique | {v}, candidates & compatible[v], excluded & compatible[v])
+            candidates = candidates - {v}
+            excluded = excluded | {v}
+
+    expand(set(), set(range(count)), set())
+    return tuple(sorted(phases, key=sorted))
+
+
+@lru_cache(maxsize=None)
+def phase_incidence(geometry: Geometry):
+    """(phase x movement) 0/1 matrix for scoring all phases at once"""
+    import numpy as np
+
+    phases = maximal_phases(geometry)
+    incidence = np.zeros((len(phases), len(movements(geometry))))
+    for row, phase in enumerate(phases):
+        incidence[row, list(phase)] = 1.0
+    incidence.setflags(write=False)
+    return incidence
@@ -0,0 +1,344 @@
+"""Gym-style reinforcement-learning environments for signal control.
+
+Every step (one simulation minute) the agent picks the next green approach,
+as an index into ROAD_LAYOUT, or ENGINE_ACTION (-1) to leave the signal to
+the engine's built-in switching rules (a baseline). It observes per
+approach, in ROAD_LAYOUT order:
+
+    density      Road.traffic_density
+    queue        vehicles queued
+    head_wait    waiting time (minutes) of the longest-waiting lane head
+
+as a float32 array of shape (3, 8). The reward is minus the number of
+vehicles still queued after the step, i.e. minus the waiting minutes the
+step added. Episodes are truncated after max_steps and never terminate.
+
+    TrafficSignalEnv   one seeded TrafficSimulationEngine; the chosen road
+                       gets the best phase serving it (give_priority)
+    BatchVectorEnv     many intersections stepped in one vectorized pass by
+                       BatchSimulationEngine, with the same lanes, phases
+                       and give_priority rule
+    ProcessVectorEnv   TrafficSignalEnvs spread over worker processes that
+                       write their results into shared-memory arrays
+
+The API follows Gymnasium's (reset -> (obs, info), step -> (obs, reward,
+terminated, truncated, info)) without depending on it. Vector envs take a
+(num_envs,) action array, return stacked arrays and reset an env as soon
+as its episode ends; info["final_observation"] then holds the observations
+from before the reset.
+"""
+import multiprocessing
+import os
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .batch_engine import BatchSimulationEngine
+from .models import RoadDirection
+from .simulation_engine import ROAD_LAYOUT, TrafficSimulationEngine
+
+OBSERVATION_FIELDS = ("density", "queue", "head_wait")
+DIRECTIONS = [RoadDirection(angle) for angle, _, _ in ROAD_LAYOUT]
+NUM_ACTIONS = len(DIRECTIONS)
+ENGINE_ACTION = -1  # let the engine's update_signal pick the phase
+OBSERVATION_SHAPE = (len(OBSERVATION_FIELDS), NUM_ACTIONS)
+
+
+class TrafficSignalEnv:
+    """One intersection driven by an agent (see module docstring)"""
+
+    num_actions = NUM_ACTIONS
+    observation_shape = OBSERVATION_SHAPE
+
+    def __init__(self, seed: Optional[int] = None, max_steps: int = 1000,
+                 vehicle_generation_rate: float = 5, green_signal_duration: float = 30):
+        self.engine = TrafficSimulationEngine(seed=seed)
+        self.engine.vehicle_generation_rate = vehicle_generation_rate
+        self.engine.green_signal_duration = green_signal_duration
+        # Operator alerts are of no use to an agent and cost time every step
+        self.engine.alerts.set_rules([])
+        self.roads = [self.engine.intersection.roads[d] for d in DIRECTIONS]
+        self.max_steps = max_steps
+        self.steps = 0
+
+    def reset(self, seed: Optional[int] = None) -> Tuple[np.ndarray, Dict]:
+        self.engine.reset()
+        if seed is not None:
+            self.engine.rng.seed(seed)
+        self.steps = 0
+        return self.observe(), {}
+
+    def step(self, action: Union[int, RoadDirection]) -> Tuple[np.ndarray, float, bool, bool, Dict]:
+        if isinstance(action, RoadDirection):
+            direction = action
+        elif ENGINE_ACTION <= int(action) < NUM_ACTIONS:
+            direction = None if int(action) == ENGINE_ACTION else DIRECTIONS[int(action)]
+        else:
+            raise ValueError(f"Invalid action {action}; use {ENGINE_ACTION}..{NUM_ACTIONS - 1} "
+                             f"or a RoadDirection")
+
+        # The agent replaces update_signal; keeping the green is not a switch
+        engine = self.engine
+        if direction is None:
+            engine.update_signal()
+        elif direction != engine.intersection.current_green:
+            engine.give_priority(direction)
+        engine.add_vehicles()
+        engine.process_green_signal()
+        # Only the waits and densities the observation needs; update_metrics
+        # would also grow the UI history and evaluate alerts every step
+        engine.age_vehicles()
+        engine.simulation_time += 1
+        self.steps += 1
+
+        queued = sum(len(road.vehicles) for road in self.roads)
+        info = {
+            "vehicles_processed": engine.metrics["vehicles_processed"],
+            "phase": engine.current_phase,
+        }
+        return self.observe(), -float(queued), False, self.steps >= self.max_steps, info
+
+    def observe(self, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """The observation, written into `out` if given"""
+        if out is None:
+            out = np.empty(OBSERVATION_SHAPE, dtype=np.float32)
+        for i, road in enumerate(self.roads):
+            out[0, i] = road.traffic_density
+            out[1, i] = len(road.vehicles)
+            out[2, i] = max((lane[0].waiting_time for lane in road.lanes if lane), default=0.0)
+        return out
+
+
+class BatchVectorEnv:
+    """num_envs intersections in one BatchSimulationEngine.
+
+    All episodes run in lockstep, each on its own generator: an int seed
+    seeds env i with seed + i (as ProcessVectorEnv does) and a sequence
+    gives each env its seed.
+    """
+
+    num_actions = NUM_ACTIONS
+    observation_shape = OBSERVATION_SHAPE
+
+    def __init__(self, num_envs: int, seed: Union[None, int, Sequence[int]] = None,
+                 max_steps: int = 1000, **engine_kwargs):
+        self.num_envs = num_envs
+        self.max_steps = max_steps
+        self.engine = BatchSimulationEngine(num_envs, seed=seed, **engine_kwargs)
+        self.steps = 0
+
+    def reset(self, seed: Union[None, int, Sequence[int]] = None) -> Tuple[np.ndarray, Dict]:
+        if seed is not None:
+            self.engine.reseed(seed)
+        self.engine.reset()
+        self.steps = 0
+        return self.observe(), {}
+
+    def step(self, actions: Sequence[int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, Dict]:
+        actions = np.asarray(actions, dtype=np.int64)
+        if actions.shape != (self.num_envs,) or \
+                ((actions < ENGINE_ACTION) | (actions >= NUM_ACTIONS)).any():
+            raise ValueError(f"Actions must be {self.num_envs} road indices in "
+                             f"{ENGINE_ACTION}..{NUM_ACTIONS - 1}")
+
+        engine = self.engine
+        engine.update_signal(actions)
+        engine.add_vehicles()
+        engine.process_green_signal()
+        engine.update_metrics()
+        engine.simulation_time += 1
+        self.steps += 1
+
+        rewards = -engine.count.sum(axis=1).astype(np.float32)
+        terminated = np.zeros(self.num_envs, dtype=bool)
+        truncated = np.full(self.num_envs, self.steps >= self.max_steps)
+        info = {
+            "vehicles_processed": engine.metrics["vehicles_processed"].copy(),
+            "phase": engine.current_phase.copy(),
+        }
+        observations = self.observe()
+        if self.steps >= self.max_steps:
+            info["final_observation"] = observations
+            observations, _ = self.reset()
+        return observations, rewards, terminated, truncated, info
+
+    def observe(self) -> np.ndarray:
+        engine = self.engine
+        out = np.empty((self.num_envs,) + OBSERVATION_SHAPE, dtype=np.float32)
+        out[:, 0] = engine.densities()
+        out[:, 1] = engine.count
+        out[:, 2] = engine.head_waits()
+        return out
+
+    def close(self):
+        pass
+
+
+class _SharedBuffers:
+    """Per-env step results in shared memory, viewed as NumPy arrays by the
+    parent and every worker"""
+
+    LAYOUT = {
+        "observations": ("f", np.float32, OBSERVATION_SHAPE),
+        "final_observations": ("f", np.float32, OBSERVATION_SHAPE),
+        "actions": ("q", np.int64, ()),
+        "rewards": ("f", np.float32, ()),
+        "terminated": ("b", np.int8, ()),
+        "truncated": ("b", np.int8, ()),
+        "vehicles_processed": ("q", np.int64, ()),
+    }
+
+    def __init__(self, num_envs: int, context=None, raw: Optional[Dict] = None):
+        self.num_envs = num_envs
+        if raw is None:
+            raw = {
+                name: context.RawArray(code, num_envs * int(np.prod(shape)))
+                for name, (code, _, shape) in self.LAYOUT.items()
+            }
+        self.raw = raw
+        for name, (_, dtype, shape) in self.LAYOUT.items():
+            setattr(self, name, np.frombuffer(raw[name], dtype=dtype).reshape((num_envs,) + shape))
+
+    def __getstate__(self):
+        return {"num_envs": self.num_envs, "raw": self.raw}
+
+    def __setstate__(self, state):
+        self.__init__(state["num_envs"], raw=state["raw"])
+
+
+def _worker(conn, buffers: _SharedBuffers, indices: List[int], seeds: List[Optional[int]],
+            env_kwargs: Dict):
+    envs = [TrafficSignalEnv(seed=seed, **env_kwargs) for seed in seeds]
+    try:
+        while True:
+            command, data = conn.recv()
+            if command == "close":
+                break
+            try:
+                if command == "reset":
+                    for i, env in zip(indices, envs):
+                        env.reset(seed=None if data is None else data[i])
+                        env.observe(out=buffers.observations[i])
+                elif command == "step":
+                    for i, env in zip(indices, envs):
+                        _, reward, terminated, truncated, info = env.step(buffers.actions[i])
+                        buffers.rewards[i] = reward
+                        buffers.terminated[i] = terminated
+                        buffers.truncated[i] = truncated
+                        buffers.vehicles_processed[i] = info["vehicles_processed"]
+                        env.observe(out=buffers.final_observations[i])
+                        if terminated or truncated:
+                            env.reset()
+                        env.observe(out=buffers.observations[i])
+                conn.send(None)
+            except Exception as e:
+                conn.send(e)
+    except (KeyboardInterrupt, EOFError):
+        pass
+    finally:
+        conn.close()
+
+
+class ProcessVectorEnv:
+    """num_envs TrafficSignalEnvs stepped in parallel by worker processes.
+
+    Env i is seeded with seed + i, or seed[i] for a sequence. Actions, observations and rewards go
+    through shared memory, so a step only sends one short message to each
+    worker. step_async / step_wait let the caller overlap its own work
+    (e.g. the policy update) with the workers' step.
+    """
+
+    num_actions = NUM_ACTIONS
+    observation_shape = OBSERVATION_SHAPE
+
+    def __init__(self, num_envs: int, seed: Union[None, int, Sequence[int]] = None,
+                 num_workers: Optional[int] = None, start_method: Optional[str] = None, **env_kwargs):
+        self.num_envs = num_envs
+        num_workers = max(1, min(num_envs, num_workers or os.cpu_count() or 1))
+        context = multiprocessing.get_context(start_method)
+        self.buffers = _SharedBuffers(num_envs, context)
+        env_seeds = self._env_seeds(seed)
+
+        self.connections = []
+        self.processes = []
+        for indices in np.array_split(np.arange(num_envs), num_workers):
+            indices = indices.tolist()
+            seeds = [None if env_seeds is None else env_seeds[i] for i in indices]
+            parent, child = context.Pipe()
+            process = context.Process(
+                target=_worker, args=(child, self.buffers, indices, seeds, env_kwargs), daemon=True)
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+        self.closed = False
+
+    def _env_seeds(self, seed: Union[None, int, Sequence[int]]) -> Optional[List[int]]:
+        if seed is None:
+            return None
+        if np.ndim(seed) == 0:
+            return [int(seed) + i for i in range(self.num_envs)]
+        seeds = [int(s) for s in seed]
+        if len(seeds) != self.num_envs:
+            raise ValueError(f"Expected {self.num_envs} seeds, got {len(seeds)}")
+        return seeds
+
+    def _send(self, command: str, data=None):
+        for connection in self.connections:
+            connection.send((command, data))
+
+    def _wait(self):
+        errors = [connection.recv() for connection in self.connections]
+        for error in errors:
+            if error is not None:
+                raise error
+
+    def reset(self, seed: Union[None, int, Sequence[int]] = None) -> Tuple[np.ndarray, Dict]:
+        self._send("reset", self._env_seeds(seed))
+        self._wait()
+        return self.buffers.observations.copy(), {}
+
+    def step_async(self, actions: Sequence[int]):
+        actions = np.asarray(actions, dtype=np.int64)
+        if actions.shape != (self.num_envs,) or \
+                ((actions < ENGINE_ACTION) | (actions >= NUM_ACTIONS)).any():
+            raise ValueError(f"Actions must be {self.num_envs} road indices in "
+                             f"{ENGINE_ACTION}..{NUM_ACTIONS - 1}")
+        self.buffers.actions[:] = actions
+        self._send("step")
+
+    def step_wait(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, Dict]:
+        self._wait()
+        buffers = self.buffers
+        terminated = buffers.terminated.astype(bool)
+        truncated = buffers.truncated.astype(bool)
+        info = {"vehicles_processed": buffers.vehicles_processed.copy()}
+        if (terminated | truncated).any():
+            info["final_observation"] = buffers.final_observations.copy()
+        return buffers.observations.copy(), buffers.rewards.copy(), terminated, truncated, info
+
+    def step(self, actions: Sequence[int]):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        for connection in self.connections:
+            try:
+                connection.send(("close", None))
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        for connection in self.connections:
+            connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
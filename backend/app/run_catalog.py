@@ -0,0 +1,283 @@
+"""Columnar on-disk catalog of simulation runs.
+
+Each run is a directory holding one raw little-endian file per column and
+a manifest (run.json) with column dtypes and row counts:
+
+    runs/<run_id>/run.json
+    runs/<run_id>/ticks.<column>.col        one row per tick
+    runs/<run_id>/departures.<column>.col   one row per departed vehicle
+
+Columns are appended in chunks while a run records and are read back with
+np.memmap, so a query only touches the pages of the columns and tick range
+it needs. Rows of both tables are in tick order, which lets a tick range be
+located with a binary search instead of a scan.
+"""
+import json
+import os
+import re
+import time
+from typing import Dict, List, Optional
+
+from .models import VEHICLE_TYPE_ORDER, RoadDirection, VehicleType
+
+DEFAULT_CATALOG_DIR = os.environ.get("TRAFFIC_RUNS_DIR", "runs")
+MANIFEST = "run.json"
+
+TICK_COLUMNS = {
+    "tick": "<i4",
+    "total_vehicles_generated": "<i8",
+    "vehicles_processed": "<i8",
+    "avg_wait_time": "<f8",
+    "max_wait_time": "<f8",
+    "emergency_vehicles": "<i8",
+    "signal_changes": "<i8",
+    "congestion_level": "<f8",
+    "throughput": "<f8",
+    "queue_size": "<i8",
+    "system_efficiency": "<f8",
+}
+
+DEPARTURE_COLUMNS = {
+    "tick": "<i4",
+    "road": "<u2",          # approach angle
+    "vehicle_type": "u1",   # VEHICLE_TYPE_ORDER index
+    "emergency": "u1",
+    "wait": "<f4",          # simulation minutes
+}
+
+TABLES = {"ticks": TICK_COLUMNS, "departures": DEPARTURE_COLUMNS}
+
+AGGREGATIONS = ("count", "sum", "mean", "min", "max", "p50", "p90", "p95", "p99")
+
+_TYPE_TO_CODE = {vtype: code for code, vtype in enumerate(VEHICLE_TYPE_ORDER)}
+
+
+def _column_path(run_dir: str, table: str, column: str) -> str:
+    return os.path.join(run_dir, f"{table}.{column}.col")
+
+
+class RunRecorder:
+    """Appends a running simulation's ticks and departures to the catalog"""
+
+    def __init__(self, catalog_dir: str = DEFAULT_CATALOG_DIR, name: str = "run",
+                 metadata: Optional[Dict] = None, flush_every: int = 256):
+        self.name = re.sub(r"[^A-Za-z0-9_-]+", "_", name) or "run"
+        self.run_id, self.run_dir = self._create_run_dir(catalog_dir)
+        self.metadata = metadata or {}
+        self.flush_every = flush_every
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.rows = {table: 0 for table in TABLES}
+        self._buffers = {table: {column: [] for column in columns} for table, columns in TABLES.items()}
+        self._pending_ticks = 0
+        self.write_manifest()
+
+    def _create_run_dir(self, catalog_dir: str):
+        """Claim a fresh run directory. Ids sort by start time (to the
+        millisecond); runs started in the same millisecond get a counter."""
+        now = time.time()
+        stamp = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}.{int(now % 1 * 1000):03d}"
+        os.makedirs(catalog_dir, exist_ok=True)
+        attempt = 1
+        while True:
+            suffix = f"-{attempt}" if attempt > 1 else ""
+            run_id = f"{stamp}-{self.name}{suffix}"
+            run_dir = os.path.join(catalog_dir, run_id)
+            try:
+                os.mkdir(run_dir)
+                return run_id, run_dir
+            except FileExistsError:
+                attempt += 1
+
+    def record_tick(self, tick: int, metrics: Dict):
+        buffer = self._buffers["ticks"]
+        buffer["tick"].append(tick)
+        for column in TICK_COLUMNS:
+            if column != "tick":
+                buffer[column].append(metrics.get(column, 0))
+        self._pending_ticks += 1
+        if self._pending_ticks >= self.flush_every:
+            self.flush()
+
+    def record_departures(self, tick: int, direction: RoadDirection, vehicles):
+        if not vehicles:
+            return
+        buffer = self._buffers["departures"]
+        buffer["tick"].extend([tick] * len(vehicles))
+        buffer["road"].extend([direction.value] * len(vehicles))
+        for v in vehicles:
+            buffer["vehicle_type"].append(_TYPE_TO_CODE[v.vehicle_type])
+            buffer["emergency"].append(v.emergency)
+            buffer["wait"].append(v.waiting_time)
+
+    def flush(self):
+        """Append buffered rows to the column files and update the manifest"""
+        import numpy as np
+
+        for table, columns in TABLES.items():
+            buffer = self._buffers[table]
+            count = len(buffer["tick"])
+            if not count:
+                continue
+            for column, dtype in columns.items():
+                with open(_column_path(self.run_dir, table, column), "ab") as f:
+                    f.write(np.asarray(buffer[column], dtype=dtype).tobytes())
+                buffer[column].clear()
+            self.rows[table] += count
+        self._pending_ticks = 0
+        self.write_manifest()
+
+    def finish(self):
+        self.flush()
+        self.finished_at = time.time()
+        self.write_manifest()
+
+    def write_manifest(self):
+        manifest = {
+            "run_id": self.run_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "metadata": self.metadata,
+            "tables": {
+                table: {"rows": self.rows[table], "columns": columns}
+                for table, columns in TABLES.items()
+            },
+        }
+        # Write-then-rename so readers never see a partial manifest
+        path = os.path.join(self.run_dir, MANIFEST)
+        with open(path + ".tmp", "w") as f:
+            json.dump(manifest, f)
+        os.replace(path + ".tmp", path)
+
+    def describe(self) -> Dict:
+        return {"run_id": self.run_id, "rows": dict(self.rows), "finished": self.finished_at is not None}
+
+
+class RunCatalog:
+    """Read side of the catalog: listing runs and aggregating their columns"""
+
+    def __init__(self, catalog_dir: str = DEFAULT_CATALOG_DIR):
+        self.catalog_dir = catalog_dir
+
+    def manifest(self, run_id: str) -> Dict:
+        if os.sep in run_id or run_id.startswith("."):
+            raise ValueError(f"Invalid run id: {run_id}")
+        try:
+            with open(os.path.join(self.catalog_dir, run_id, MANIFEST)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise KeyError(run_id)
+
+    def list_runs(self) -> List[Dict]:
+        if not os.path.isdir(self.catalog_dir):
+            return []
+        runs = []
+        for run_id in sorted(os.listdir(self.catalog_dir)):
+            try:
+                manifest = self.manifest(run_id)
+            except (KeyError, ValueError):
+                continue
+            runs.append({
+                "run_id": run_id,
+                "name": manifest["name"],
+                "started_at": manifest["started_at"],
+                "finished_at": manifest["finished_at"],
+                "rows": {t: info["rows"] for t, info in manifest["tables"].items()},
+                "metadata": manifest["metadata"],
+            })
+        return runs
+
+    def column(self, run_id: str, table: str, column: str, manifest: Optional[Dict] = None):
+        """Memory-mapped column (only rows covered by the manifest)"""
+        import numpy as np
+
+        manifest = manifest or self.manifest(run_id)
+        info = manifest["tables"][table]
+        if column not in info["columns"]:
+            raise ValueError(f"Unknown column {table}.{column}")
+        if info["rows"] == 0:
+            return np.zeros(0, dtype=info["columns"][column])
+        return np.memmap(_column_path(os.path.join(self.catalog_dir, run_id), table, column),
+                         dtype=info["columns"][column], mode="r", shape=(info["rows"],))
+
+    def query(self, run_ids: List[str], table: str = "departures", value: str = "wait",
+              agg: str = "p95", group_by: Optional[str] = "road",
+              tick_from: Optional[int] = None, tick_to: Optional[int] = None,
+              filters: Optional[Dict[str, float]] = None) -> Dict:
+        """Aggregate `value` over rows with tick_from <= tick < tick_to that
+        match `filters` (column -> value), per run and per `group_by` value"""
+        import numpy as np
+
+        if table not in TABLES:
+            raise ValueError(f"Unknown table: {table}")
+        if agg not in AGGREGATIONS:
+            raise ValueError(f"Unknown aggregation {agg}; use one of {', '.join(AGGREGATIONS)}")
+        filters = filters or {}
+        for column in [value, group_by, *filters]:
+            if column is not None and column not in TABLES[table]:
+                raise ValueError(f"Unknown column {table}.{column}")
+
+        results = {}
+        for run_id in run_ids:
+            manifest = self.manifest(run_id)
+            ticks = self.column(run_id, table, "tick", manifest)
+            start = 0 if tick_from is None else int(np.searchsorted(ticks, tick_from, "left"))
+            end = len(ticks) if tick_to is None else int(np.searchsorted(ticks, tick_to, "left"))
+
+            values = np.asarray(self.column(run_id, table, value, manifest)[start:end], dtype=float)
+            mask = np.ones(end - start, dtype=bool)
+            for column, expected in filters.items():
+                mask &= self.column(run_id, table, column, manifest)[start:end] == expected
+
+            if group_by is None:
+                results[run_id] = {"all": _aggregate(values[mask], agg)}
+                continue
+            keys = self.column(run_id, table, group_by, manifest)[start:end][mask]
+            values = values[mask]
+            results[run_id] = {
+                _group_label(group_by, key): _aggregate(values[keys == key], agg)
+                for key in np.unique(keys).tolist()
+            }
+
+        return {
+            "table": table,
+            "value": value,
+            "agg": agg,
+            "group_by": group_by,
+            "tick_from": tick_from,
+            "tick_to": tick_to,
+            "filters": filters,
+            "results": results,
+        }
+
+
+def _group_label(column: str, key) -> str:
+    if column == "vehicle_type":
+        return VEHICLE_TYPE_ORDER[int(key)].value
+    return str(key)
+
+
+def _aggregate(values, agg: str) -> Optional[float]:
+    import numpy as np
+
+    if agg == "count":
+        return int(values.size)
+    if values.size == 0:
+        return None
+    if agg.startswith("p"):
+        return float(np.percentile(values, float(agg[1:])))
+    return float(getattr(np, agg)(values))
+
+
+def parse_filters(road: Optional[int] = None, vehicle_type: Optional[str] = None,
+                  emergency: Optional[bool] = None) -> Dict[str, float]:
+    """Build query filters from API-level values"""
+    filters = {}
+    if road is not None:
+        filters["road"] = RoadDirection(road).value
+    if vehicle_type is not None:
+        filters["vehicle_type"] = _TYPE_TO_CODE[VehicleType(vehicle_type.lower())]
+    if emergency is not None:
+        filters["emergency"] = int(emergency)
+    return filters
@@ -1,22 +1,59 @@
-import asyncio
 import random
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
-import numpy as np
+from datetime import datetime
+from typing import Dict, List, Optional, Set
 from .models import *
 from .priority_queue import SmartPriorityQueue
+from .alerts import AlertEngine
+from . import phases
+
+# (angle, name, lane count) of the 8 approaches; capacity is 20 per lane
+ROAD_LAYOUT = [
+    (0, "NORTH", 3),
+    (45, "NORTHEAST", 2),
+    (90, "EAST", 3),
+    (135, "SOUTHEAST", 2),
+    (180, "SOUTH", 3),
+    (225, "SOUTHWEST", 2),
+    (270, "WEST", 3),
+    (315, "NORTHWEST", 2)
+]
+
+# Lane discharge: saturation flow in passenger-car equivalents per lane per
+# minute of green, and the start-up lost time (seconds) at the beginning of
+# every green while the queue gets moving
+SATURATION_FLOW = 2.0
+STARTUP_LOST_TIME = 3.0
+
+# Seconds of signal-plan time per tick (one tick per second at 1x, as
+# BatchSimulationEngine.tick_seconds); coordinated offsets run on this clock
+SIGNAL_SECONDS_PER_TICK = 1.0
+
+# PCE_FACTORS by vehicle type value (see phase_structure)
+PCE_BY_TYPE = {vtype.value: PCE_FACTORS.get(vtype, 1.0) for vtype in VehicleType}
+
+_numpy = None
+
+def _np():
+    """NumPy, imported on first use so importing the engine stays cheap"""
+    global _numpy
+    if _numpy is None:
+        import numpy
+        _numpy = numpy
+    return _numpy
 
 class TrafficSimulationEngine:
-    def __init__(self):
+    def __init__(self, seed: Optional[int] = None):
         self.intersection = IntersectionNode(
             id="center",
             name="8-Way Central Intersection"
         )
         self.priority_queue = SmartPriorityQueue()
+        self.vehicle_pool = VehiclePool()
         self.simulation_time = 0  # in simulation minutes
         self.is_running = False
         self.real_time_factor = 60  # 1 real second = 60 simulation minutes
         self.simulation_speed = 1.0  # Speed multiplier (0.5x, 1x, 2x)
+        self.rng = random.Random(seed)  # per-engine, so seeded engines are reproducible
         
         self.metrics = {
             "total_vehicles_generated": 0,
@@ -49,27 +86,47 @@ class TrafficSimulationEngine:
             (VehicleType.EMERGENCY, 0.02)
         ]
         
+        # Turning movement probabilities (decide lane choice on arrival)
+        self.turn_probs = [
+            (Turn.LEFT, 0.2),
+            (Turn.STRAIGHT, 0.6),
+            (Turn.RIGHT, 0.2)
+        ]
+        
         # Initialize the 8-way intersection
         self.initialize_roads()
         
         # Historical data
         self.history: List[Dict] = []
         self.max_history = 100
+        
+        # Optional run catalog recorder (see run_catalog.py)
+        self.recorder = None
+        
+        # Alert rules evaluated every tick (see alerts.py)
+        self.alerts = AlertEngine()
+        
+        # Tick loop driving this engine, if any (see tick_scheduler.py)
+        self.scheduler = None
+        
+        # Green-wave coordinator of the corridor this intersection is on,
+        # if any (see green_wave.py); run every tick
+        self.coordinator = None
+        
+        # Optional external arrival source (e.g. a recorded trace replay);
+        # when set it replaces synthetic vehicle generation
+        self.arrival_source = None
+        
+        # Roads currently discharging; a road joining the set starts a new
+        # green and pays the start-up lost time
+        self.discharging: Set[RoadDirection] = set()
+        self.current_phase: Optional[int] = None
+        self.discharging_phase: Optional[int] = None  # phase of the last discharge
+        self._phase_structure = None  # see phase_structure()
     
     def initialize_roads(self):
         """Create 8 roads for the intersection"""
-        directions = [
-            (0, "NORTH", 3),
-            (45, "NORTHEAST", 2),
-            (90, "EAST", 3),
-            (135, "SOUTHEAST", 2),
-            (180, "SOUTH", 3),
-            (225, "SOUTHWEST", 2),
-            (270, "WEST", 3),
-            (315, "NORTHWEST", 2)
-        ]
-        
-        for angle, name, lanes in directions:
+        for angle, name, lanes in ROAD_LAYOUT:
             road = Road(
                 id=f"road_{angle}",
                 name=name,
@@ -79,11 +136,17 @@ class TrafficSimulationEngine:
             )
             self.intersection.roads[road.direction] = road
             self.priority_queue.push(road)
+        
+        self.geometry = phases.geometry_of(d.value for d in self.intersection.roads)
+        self.movements = phases.movements(self.geometry)
+        self.movement_index = {
+            (RoadDirection(angle), turn): i for i, (angle, turn) in enumerate(self.movements)
+        }
     
     def generate_vehicle(self) -> Vehicle:
         """Generate random vehicle with realistic probabilities"""
         # Weighted random selection
-        rand = random.random()
+        rand = self.rng.random()
         cumulative = 0
         vehicle_type = VehicleType.CAR
         
@@ -95,29 +158,60 @@ class TrafficSimulationEngine:
         
         # Check for emergency vehicle
         is_emergency = (vehicle_type == VehicleType.EMERGENCY)
+        return self.create_vehicle(vehicle_type, is_emergency)
+    
+    def generate_turn(self) -> Turn:
+        rand = self.rng.random()
+        cumulative = 0
+        for turn, prob in self.turn_probs:
+            cumulative += prob
+            if rand <= cumulative:
+                return turn
+        return Turn.STRAIGHT
+    
+    def create_vehicle(self, vehicle_type: VehicleType, is_emergency: bool,
+                       turn: Optional[Turn] = None) -> Vehicle:
+        """Create a vehicle of a known type (drawing its turn if not given)"""
         if is_emergency:
             self.metrics["emergency_vehicles"] += 1
         
-        return Vehicle(
-            id=f"v_{self.metrics['total_vehicles_generated']}_{datetime.now().timestamp()}",
-            vehicle_type=vehicle_type,
-            emergency=is_emergency
+        return self.vehicle_pool.acquire(
+            vehicle_type,
+            emergency=is_emergency,
+            turn=turn or self.generate_turn(),
+            entered_at=self.simulation_time
         )
     
+    def set_arrival_source(self, source):
+        """Replace synthetic arrivals with an external source (None restores them).
+        
+        A source provides arrivals_for_tick() returning records with
+        direction, vehicle_type, emergency and (optional) turn attributes
+        for the next tick.
+        """
+        self.arrival_source = source
+    
     def add_vehicles(self):
         """Add vehicles to random roads based on rate"""
         roads = list(self.intersection.roads.values())
         
+        if self.arrival_source is not None:
+            self.add_source_vehicles()
+            for road in roads:
+                road.update_density()
+                self.priority_queue.update_road(road)
+            return
+        
         # Calculate vehicles to add based on rate
         vehicles_to_add = int(self.vehicle_generation_rate * (self.real_time_factor / 60))
-        vehicles_to_add = max(0, vehicles_to_add + random.randint(-2, 2))  # Add some randomness
+        vehicles_to_add = max(0, vehicles_to_add + self.rng.randint(-2, 2))  # Add some randomness
         
         for _ in range(vehicles_to_add):
-            if random.random() < 0.7:  # 70% chance to add to a road
-                road = random.choice(roads)
+            if self.rng.random() < 0.7:  # 70% chance to add to a road
+                road = self.rng.choice(roads)
                 if len(road.vehicles) < road.max_capacity:
                     vehicle = self.generate_vehicle()
-                    road.vehicles.append(vehicle)
+                    road.add_vehicle(vehicle)
                     self.metrics["total_vehicles_generated"] += 1
         
         # Update all road densities and priority queue
@@ -125,59 +219,273 @@ class TrafficSimulationEngine:
             road.update_density()
             self.priority_queue.update_road(road)
     
+    def add_source_vehicles(self):
+        """Add this tick's arrivals from the external arrival source"""
+        for record in self.arrival_source.arrivals_for_tick():
+            road = self.intersection.roads.get(record.direction)
+            if road and len(road.vehicles) < road.max_capacity:
+                vehicle = self.create_vehicle(record.vehicle_type, record.emergency, record.turn)
+                road.add_vehicle(vehicle)
+                self.metrics["total_vehicles_generated"] += 1
+    
+    def green_approaches(self) -> List[RoadDirection]:
+        """Approaches with at least one movement in the active phase"""
+        return sorted({d for d, _ in self.intersection.green_movements}, key=lambda d: d.value)
+    
     def process_green_signal(self) -> List[Vehicle]:
-        """Process vehicles through current green signal"""
-        if not self.intersection.current_green:
+        """Process vehicles through the movements of the current phase.
+        
+        Every lane of every green approach discharges at the same time: each
+        tick adds SATURATION_FLOW * green/60 PCE of credit per lane (less the
+        start-up lost time on a road's first green tick) and a lane releases
+        its head vehicles while their cumulative PCE fits in the credit. A
+        vehicle whose movement is not in the phase blocks its lane.
+        
+        Unused credit carries over to the next tick, at most one tick's
+        allowance (more only if the lane's next vehicle could otherwise
+        never pass); it is lost when the lane empties or is blocked, and
+        restarts from zero when the phase changes while the approach stays
+        green.
+        
+        Departed vehicles go back to the vehicle pool, so the returned list
+        is only valid until the next arrival.
+        """
+        served = set(self.intersection.green_movements)
+        green = set(self.green_approaches())
+        if self.current_phase != self.discharging_phase:
+            for direction in self.discharging & green:
+                road = self.intersection.roads[direction]
+                road.discharge_credit = [min(c, 0.0) for c in road.discharge_credit]
+            self.discharging_phase = self.current_phase
+        for direction in self.discharging - green:
+            road = self.intersection.roads[direction]
+            road.discharge_credit = [0.0] * road.lane_count
+        for direction in green - self.discharging:
+            road = self.intersection.roads[direction]
+            lost = SATURATION_FLOW * STARTUP_LOST_TIME / 60
+            road.discharge_credit = [-lost] * road.lane_count
+        self.discharging = green
+        
+        roads = [self.intersection.roads[d] for d in green if self.intersection.roads[d].vehicles]
+        if not roads:
             return []
         
-        road = self.intersection.roads[self.intersection.current_green]
-        if not road.vehicles:
-            return []
-        
-        # Calculate vehicles that can pass (based on lanes and time)
-        vehicles_per_minute = road.lane_count * 2  # Approximate capacity
-        max_vehicles = int(vehicles_per_minute * (self.green_signal_duration / 60))
-        vehicles_to_process = min(max_vehicles, len(road.vehicles))
+        np = _np()
+        
+        # (lane x queue position) PCE matrix over all green lanes, inf past
+        # the tail and from the first vehicle that may not move
+        lanes = [(road, lane) for road in roads for lane in road.lanes]
+        lengths = np.array([len(lane) for _, lane in lanes])
+        pce = np.full((len(lanes), max(lengths.max(), 1)), np.inf)
+        for i, (road, lane) in enumerate(lanes):
+            pce[i, :len(lane)] = [
+                PCE_FACTORS.get(v.vehicle_type, 1.0) if (road.direction, v.turn) in served else np.inf
+                for v in lane
+            ]
+        
+        allowance = SATURATION_FLOW * self.green_signal_duration / 60
+        credit = np.concatenate([road.discharge_credit for road in roads]) + allowance
+        cumulative = np.cumsum(pce, axis=1)
+        released = (cumulative <= credit[:, None]).sum(axis=1)
+        lane_index = np.arange(len(lanes))
+        used = np.where(released > 0, cumulative[lane_index, np.maximum(released - 1, 0)], 0.0)
+        remaining = credit - used
+        # Unused green is lost once a lane's queue is exhausted or its next
+        # vehicle may not move; otherwise it carries over, capped at one
+        # tick's allowance unless the next vehicle needs more to ever pass
+        next_pce = np.full(len(lanes), np.inf)
+        waiting = released < lengths
+        next_pce[waiting] = pce[lane_index[waiting], released[waiting]]
+        lost = ~waiting | np.isinf(next_pce)
+        remaining[lost] = np.minimum(remaining[lost], 0.0)
+        remaining = np.minimum(remaining, np.maximum(allowance, np.where(lost, 0.0, next_pce - allowance)))
         
         processed_vehicles = []
-        for _ in range(vehicles_to_process):
+        row = 0
+        for road in roads:
+            rows = slice(row, row + road.lane_count)
+            road.discharge_credit = remaining[rows].tolist()
+            departed = road.remove_lane_heads(released[rows].tolist())
+            if self.recorder:
+                self.recorder.record_departures(self.simulation_time, road.direction, departed)
+            processed_vehicles.extend(departed)
+            row += road.lane_count
+        
+        for vehicle in processed_vehicles:
+            # Update metrics
+            self.metrics["vehicles_processed"] += 1
+            self.metrics["total_wait_time"] += vehicle.waiting_time
+            self.metrics["max_wait_time"] = max(
+                self.metrics["max_wait_time"],
+                vehicle.waiting_time
+            )
+            
+            # Calculate environmental benefits
+            if vehicle.waiting_time > 1:  # Only count if waited more than 1 minute
+                self.metrics["co2_saved"] += vehicle.waiting_time * 0.025  # kg CO2
+                self.metrics["fuel_saved"] += vehicle.waiting_time * 0.01   # liters
+        
+        # Update road densities after processing
+        for road in roads:
+            road.update_density()
             if road.vehicles:
-                vehicle = road.vehicles.pop(0)
-                processed_vehicles.append(vehicle)
-                
-                # Update metrics
-                self.metrics["vehicles_processed"] += 1
-                self.metrics["total_wait_time"] += vehicle.waiting_time
-                self.metrics["max_wait_time"] = max(
-                    self.metrics["max_wait_time"],
-                    vehicle.waiting_time
-                )
-                
-                # Calculate environmental benefits
-                if vehicle.waiting_time > 1:  # Only count if waited more than 1 minute
-                    self.metrics["co2_saved"] += vehicle.waiting_time * 0.025  # kg CO2
-                    self.metrics["fuel_saved"] += vehicle.waiting_time * 0.01   # liters
-        
-        # Update road density after processing
-        road.update_density()
-        if road.vehicles:
-            self.priority_queue.push(road)
+                self.priority_queue.push(road)
         
+        self.vehicle_pool.release_all(processed_vehicles)
         return processed_vehicles
     
+    def phase_structure(self):
+        """Static arrays for phase scoring, built once on first use: the
+        phase incidence matrix padded with a column no phase serves, each
+        approach's mask of phases serving its through movement, and the
+        lanes in scoring order with their turn -> movement id maps.
+        
+        The per-vehicle lookups key on enum values: enum members hash in
+        Python, their plain values in C, and this runs for every queued
+        vehicle on every tick."""
+        if self._phase_structure is None:
+            np = _np()
+            incidence = phases.phase_incidence(self.geometry)
+            padded = np.hstack([incidence > 0, np.zeros((len(incidence), 1), dtype=bool)])
+            serves_straight = {
+                direction: incidence[:, self.movement_index[(direction, Turn.STRAIGHT)]] > 0
+                for direction in self.intersection.roads
+            }
+            lanes = [
+                (lane, {turn.value: self.movement_index[(road.direction, turn)] for turn in Turn})
+                for road in self.intersection.roads.values() for lane in road.lanes
+            ]
+            self._phase_structure = (padded, serves_straight, lanes)
+        return self._phase_structure
+    
+    def phase_scores(self):
+        """Demand each maximal phase could release right now.
+        
+        A lane only discharges its prefix of vehicles whose movements the
+        phase serves, so each phase scores the weight (PCE plus emergency
+        and waiting boosts) of that prefix in every lane. All phases are
+        scored at once on a (phase x lane x position) tensor; only the
+        queue terms are rebuilt per call (see phase_structure).
+        """
+        np = _np()
+        padded, _, lanes = self.phase_structure()
+        
+        ids = []
+        weights = []
+        lengths = []
+        for lane, turn_ids in lanes:
+            ids.extend([turn_ids[v.turn._value_] for v in lane])
+            weights.extend([
+                PCE_BY_TYPE[v.vehicle_type._value_] + (100 if v.emergency else 0) + v.waiting_time * 0.5
+                for v in lane
+            ])
+            lengths.append(len(lane))
+        
+        # Scatter the flat queues into (lane x position) matrices; padding
+        # positions use the column that no phase serves
+        lengths = np.array(lengths)
+        rows = np.repeat(np.arange(len(lanes)), lengths)
+        cols = np.arange(len(ids)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        depth = max(1, int(lengths.max()))
+        id_matrix = np.full((len(lanes), depth), padded.shape[1] - 1)
+        weight_matrix = np.zeros((len(lanes), depth))
+        id_matrix[rows, cols] = ids
+        weight_matrix[rows, cols] = weights
+        
+        # Each (phase, lane) releases the prefix before its first vehicle
+        # the phase does not serve (padding is never served)
+        served = padded[:, id_matrix]
+        prefix = np.argmin(served, axis=2)
+        prefix[served.all(axis=2)] = depth
+        cumulative = np.zeros((len(lanes), depth + 1))
+        np.cumsum(weight_matrix, axis=1, out=cumulative[:, 1:])
+        return cumulative[np.arange(len(lanes)), prefix].sum(axis=1)
+    
+    def select_phase(self, required: Optional[RoadDirection] = None, scores=None) -> int:
+        """Index of the maximal compatible phase with the most releasable
+        demand, optionally among phases serving `required`'s through
+        movement. Pass `scores` when phase_scores() is already known."""
+        np = _np()
+        
+        if scores is None:
+            scores = self.phase_scores()
+        if required is not None:
+            scores = np.where(self.phase_structure()[1][required], scores, -np.inf)
+        return int(np.argmax(scores))
+    
+    def set_phase(self, phase: int, dominant: Optional[RoadDirection] = None):
+        """Activate a phase; current_green becomes its busiest approach unless given"""
+        self.current_phase = phase
+        served = [self.movements[i] for i in sorted(phases.maximal_phases(self.geometry)[phase])]
+        self.intersection.green_movements = [(RoadDirection(angle), turn) for angle, turn in served]
+        if dominant is None:
+            dominant = max(
+                self.green_approaches(),
+                key=lambda d: self.intersection.roads[d].traffic_density
+            )
+        self.intersection.current_green = dominant
+    
+    def give_priority(self, direction: RoadDirection):
+        """Switch straight to the best phase serving `direction` (an operator
+        override); the green then runs its normal minimum and maximum times"""
+        self.set_phase(self.select_phase(required=direction), dominant=direction)
+        self.intersection.last_switch = self.signal_time()
+        self.metrics["signal_changes"] += 1
+    
+    def signal_time(self) -> float:
+        """Seconds on the signal-plan clock (ticks x SIGNAL_SECONDS_PER_TICK),
+        which green times and corridor windows are measured on"""
+        return self.simulation_time * SIGNAL_SECONDS_PER_TICK
+    
+    def coordinated_arterial(self) -> Optional[RoadDirection]:
+        """The corridor approach to hold green now, if the intersection is
+        coordinated (see green_wave.apply_plan) and inside its arterial
+        green window"""
+        node = self.intersection
+        if node.cycle_length is None or not node.arterial_directions:
+            return None
+        from .green_wave import arterial_green_active
+        
+        if not arterial_green_active(node, self.signal_time()):
+            return None
+        return max(node.arterial_directions, key=lambda d: node.roads[d].traffic_density)
+    
     def update_signal(self):
         """Update traffic signal based on priority queue and traffic conditions"""
-        current_time = datetime.now()
+        current_time = self.signal_time()
+        
+        # Coordinated corridor: the arterial through movement is green for
+        # the plan's window, unless an emergency vehicle waits elsewhere
+        arterial = self.coordinated_arterial()
+        if arterial is not None and not any(
+            v.emergency for d, road in self.intersection.roads.items()
+            if d not in self.intersection.arterial_directions for v in road.vehicles
+        ):
+            if (arterial, Turn.STRAIGHT) not in self.intersection.green_movements:
+                if self.intersection.current_green:
+                    self.metrics["signal_changes"] += 1
+                self.set_phase(self.select_phase(required=arterial), dominant=arterial)
+                self.intersection.last_switch = current_time
+                self.metrics["signal_changes"] += 1
+            return
         
         # Get current road info
         current_road = None
         if self.intersection.current_green:
             current_road = self.intersection.roads[self.intersection.current_green]
+        served = set(self.intersection.green_movements)
+        current_vehicles = [
+            v for d in self.green_approaches()
+            for v in self.intersection.roads[d].vehicles if (d, v.turn) in served
+        ]
+        # Nothing left to release when every served lane is blocked or empty
+        scores = self.phase_scores()
+        phase_exhausted = self.current_phase is None or scores[self.current_phase] == 0
         
         # Calculate elapsed time since last switch
         elapsed = 0
         if self.intersection.current_green:
-            elapsed = (current_time - self.intersection.last_switch).seconds
+            elapsed = int(current_time - self.intersection.last_switch)
         
         # Find the road with highest priority (most traffic)
         highest_priority_road = None
@@ -200,8 +508,8 @@ class TrafficSimulationEngine:
         min_green_time = 5  # Minimum time a light stays green (seconds)
         
         if self.intersection.current_green:
-            # Condition 1: Current road is empty - switch immediately
-            if not current_road.vehicles and elapsed >= min_green_time:
+            # Condition 1: Current phase has nothing to serve - switch immediately
+            if phase_exhausted and elapsed >= min_green_time:
                 should_switch = True
             
             # Condition 2: Max time reached
@@ -218,7 +526,7 @@ class TrafficSimulationEngine:
             # Condition 4: Emergency vehicle preemption
             if highest_priority_road and elapsed >= min_green_time:
                 has_emergency = any(v.emergency for v in highest_priority_road.vehicles)
-                current_has_emergency = current_road and any(v.emergency for v in current_road.vehicles)
+                current_has_emergency = any(v.emergency for v in current_vehicles)
                 if has_emergency and not current_has_emergency:
                     should_switch = True
         else:
@@ -229,24 +537,31 @@ class TrafficSimulationEngine:
         if should_switch:
             if self.intersection.current_green:
                 self.intersection.current_green = None
+                self.intersection.green_movements = []
+                self.current_phase = None
                 self.metrics["signal_changes"] += 1
             
-            # Assign to highest priority road
+            # Serve the heaviest compatible set of movements
             if highest_priority_road:
-                self.intersection.current_green = highest_priority_road.direction
+                self.set_phase(self.select_phase(scores=scores))
                 self.intersection.last_switch = current_time
                 self.metrics["signal_changes"] += 1
                 # Update priority queue
                 self.priority_queue.update_road(highest_priority_road)
     
-    def update_metrics(self):
-        """Update all simulation metrics"""
-        # Update all vehicle wait times
+    def age_vehicles(self):
+        """Add a minute of waiting to every queued vehicle and refresh the
+        priorities and densities that depend on it"""
         for road in self.intersection.roads.values():
             for vehicle in road.vehicles:
                 vehicle.waiting_time += 1  # 1 simulation minute
                 vehicle.priority = vehicle.calculate_priority()
             road.update_density()
+    
+    def update_metrics(self):
+        """Update all simulation metrics"""
+        # Update all vehicle wait times
+        self.age_vehicles()
         
         # Calculate overall congestion
         total_vehicles = sum(len(r.vehicles) for r in self.intersection.roads.values())
@@ -286,6 +601,11 @@ class TrafficSimulationEngine:
         })
         if len(self.history) > self.max_history:
             self.history.pop(0)
+        
+        if self.recorder:
+            self.recorder.record_tick(self.simulation_time, self.metrics)
+        
+        self.alerts.evaluate(self.simulation_time, self.metrics, self.intersection.roads)
     
     async def run_step(self):
         """Run one simulation step"""
@@ -299,7 +619,9 @@ class TrafficSimulationEngine:
             # Process current green signal
             self.process_green_signal()
             
-            # Update traffic signal if needed
+            # Re-optimize the corridor plan when due, then update the signal
+            if self.coordinator:
+                self.coordinator.update(self.signal_time())
             self.update_signal()
             
             # Update metrics
@@ -313,11 +635,13 @@ class TrafficSimulationEngine:
     def get_state(self) -> Dict:
         """Get current simulation state for frontend"""
         roads_state = {}
+        green = set(self.green_approaches())
         for direction, road in self.intersection.roads.items():
             roads_state[direction.value] = {
                 "name": road.name,
                 "vehicle_count": len(road.vehicles),
                 "density": road.traffic_density,
+                "max_capacity": road.max_capacity,
                 "vehicles": [
                     {
                         "type": v.vehicle_type.value,
@@ -326,18 +650,26 @@ class TrafficSimulationEngine:
                         "priority": v.priority
                     } for v in road.vehicles[:15]  # Limit for performance
                 ],
+                "lane_queues": [len(lane) for lane in road.lanes],
+                "is_green": direction in green,
                 "capacity_used": f"{(len(road.vehicles) / road.max_capacity * 100):.1f}%"
             }
         
         return {
             "simulation_time": self.simulation_time,
             "current_green": self.intersection.current_green.value if self.intersection.current_green else None,
+            "green_movements": [
+                {"direction": d.value, "turn": t.value} for d, t in self.intersection.green_movements
+            ],
             "green_duration": self.green_signal_duration,
             "roads": roads_state,
             "metrics": self.metrics.copy(),
             "queue_size": self.metrics["queue_size"],
             "is_running": self.is_running,
-            "simulation_speed": self.simulation_speed
+            "simulation_speed": self.simulation_speed,
+            "effective_speed": self.scheduler.effective_speed if self.scheduler else None,
+            "alerts": self.alerts.last_events,  # raised/cleared this tick
+            "server_time": datetime.now().timestamp()  # for end-to-end latency measurement
         }
     
     def add_emergency_vehicle(self, direction_angle: int) -> bool:
@@ -347,12 +679,13 @@ class TrafficSimulationEngine:
             road = self.intersection.roads.get(direction)
             
             if road and len(road.vehicles) < road.max_capacity:
-                emergency_vehicle = Vehicle(
-                    id=f"emergency_{datetime.now().timestamp()}",
-                    vehicle_type=VehicleType.EMERGENCY,
-                    emergency=True
+                emergency_vehicle = self.vehicle_pool.acquire(
+                    VehicleType.EMERGENCY,
+                    emergency=True,
+                    turn=self.generate_turn(),
+                    entered_at=self.simulation_time
                 )
-                road.vehicles.insert(0, emergency_vehicle)  # Add to front
+                road.add_vehicle(emergency_vehicle, front=True)  # Add to front
                 road.update_density()
                 self.priority_queue.update_road(road)
                 return True
@@ -383,6 +716,31 @@ class TrafficSimulationEngine:
             (VehicleType.EMERGENCY, self.emergency_probability)
         ]
     
+    def start_recording(self, name: str = "run", catalog_dir: Optional[str] = None):
+        """Persist ticks and departures to the run catalog until stopped"""
+        from .run_catalog import DEFAULT_CATALOG_DIR, RunRecorder
+        
+        self.stop_recording()
+        self.recorder = RunRecorder(
+            catalog_dir or DEFAULT_CATALOG_DIR,
+            name,
+            metadata={
+                "green_duration": self.green_signal_duration,
+                "vehicle_rate": self.vehicle_generation_rate,
+                "emergency_probability": self.emergency_probability,
+                "arrival_source": self.arrival_source.describe() if self.arrival_source else None,
+                "start_tick": self.simulation_time
+            }
+        )
+        return self.recorder
+    
+    def stop_recording(self):
+        """Finish the current recording, if any, and return it"""
+        recorder, self.recorder = self.recorder, None
+        if recorder:
+            recorder.finish()
+        return recorder
+    
     def set_speed(self, speed: float):
         """Set simulation speed multiplier (0.5 to 5.0)"""
         self.simulation_speed = max(0.5, min(5.0, speed))
@@ -399,6 +757,7 @@ class TrafficSimulationEngine:
     def reset(self):
         """Reset simulation to initial state"""
         self.stop()
+        self.stop_recording()
         self.simulation_time = 0
         self.metrics = {
             "total_vehicles_generated": 0,
@@ -416,11 +775,17 @@ class TrafficSimulationEngine:
             "system_efficiency": 0.0
         }
         self.history = []
+        self.alerts.reset()
         
         # Clear all roads
         for road in self.intersection.roads.values():
-            road.vehicles.clear()
+            self.vehicle_pool.release_all(road.clear())
             road.traffic_density = 0.0
             self.priority_queue.update_road(road)
         
-        self.intersection.current_green = None
\ No newline at end of file
+        self.intersection.current_green = None
+        self.intersection.green_movements = []
+        self.intersection.last_switch = 0.0
+        self.current_phase = None
+        self.discharging = set()
+        self.discharging_phase = None
\ No newline at end of file
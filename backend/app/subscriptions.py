@@ -0,0 +1,96 @@
+"""Topic subscriptions for the /ws state stream.
+
+A client narrows what it receives by sending
+
+    {"type": "subscribe", "roads": [0, 90], "vehicles": false,
+     "metrics": false, "alerts": true}
+
+where roads is a list of directions or "all", and vehicles, metrics and
+alerts switch the per-road vehicle previews, the metrics map and the
+alert-related metrics and alert event messages (see alerts.py) on or off.
+Omitted fields keep the full-state default.
+
+Projections keep the full state's shape, so every frame format can encode
+them; the tick header (simulation time, signal, speed) is always
+included.
+
+Subscriptions are hashable, so a broadcast builds each distinct
+projection once per tick and shares it between all clients with the same
+topics.
+"""
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Optional
+
+from .models import RoadDirection
+
+# Metrics the alert views need
+ALERT_METRICS = ("congestion_level", "avg_wait_time", "emergency_vehicles", "throughput")
+
+
+@dataclass(frozen=True)
+class Subscription:
+    roads: Optional[FrozenSet[int]] = None  # None = every road
+    vehicles: bool = True
+    metrics: bool = True
+    alerts: bool = True
+
+    @property
+    def is_full(self) -> bool:
+        return self == FULL_STATE
+
+    def describe(self) -> Dict:
+        return {
+            "roads": "all" if self.roads is None else sorted(self.roads),
+            "vehicles": self.vehicles,
+            "metrics": self.metrics,
+            "alerts": self.alerts,
+        }
+
+
+FULL_STATE = Subscription()
+
+
+def parse_subscription(message: Dict) -> Subscription:
+    """Build a subscription from a subscribe message (ValueError if invalid)"""
+    roads = message.get("roads", "all")
+    if roads == "all" or roads is None:
+        directions = None
+    elif isinstance(roads, list):
+        try:
+            directions = frozenset(RoadDirection(int(r)).value for r in roads)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid road directions: {roads}")
+    else:
+        raise ValueError("roads must be a list of directions or \"all\"")
+
+    flags = {}
+    for topic in ("vehicles", "metrics", "alerts"):
+        value = message.get(topic, True)
+        if not isinstance(value, bool):
+            raise ValueError(f"{topic} must be true or false")
+        flags[topic] = value
+    return Subscription(roads=directions, **flags)
+
+
+def project_state(state: Dict, subscription: Subscription) -> Dict:
+    """The part of a get_state() dict a subscription asks for"""
+    if subscription.is_full:
+        return state
+
+    roads = {}
+    for direction, road in state["roads"].items():
+        if subscription.roads is not None and int(direction) not in subscription.roads:
+            continue
+        roads[direction] = road if subscription.vehicles else {**road, "vehicles": []}
+
+    if subscription.metrics:
+        metrics = state["metrics"]
+    elif subscription.alerts:
+        metrics = {name: state["metrics"][name] for name in ALERT_METRICS if name in state["metrics"]}
+    else:
+        metrics = {}
+
+    projected = {**state, "roads": roads, "metrics": metrics}
+    if "alerts" in state and not subscription.alerts:
+        projected["alerts"] = []
+    return projected
@@ -0,0 +1,203 @@
+"""Fixed-rate tick loop with absolute deadlines and a catch-up policy.
+
+Tick k is due at start + k * period (period = 1 / simulation_speed), so the
+time spent stepping, encoding and sending no longer adds to the period.
+When a tick starts late by one or more whole periods the engine is behind
+and the policy decides how to catch up:
+
+    skip_broadcast   run the overdue ticks back to back, broadcasting only
+                     once the loop is on time again
+    batch            run all overdue ticks in one go, then broadcast once
+    slow_down        lower the speed multiplier to what the loop sustains,
+                     so the displayed speed stays true, and raise it back
+                     towards the requested speed once the loop keeps up
+
+If the loop falls more than max_catch_up ticks behind (e.g. after the
+process was suspended) the debt is dropped and the schedule restarts from
+now; the dropped ticks are counted. Alert events of ticks that are not
+broadcast are carried into the next broadcast.
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict
+
+POLICIES = ("skip_broadcast", "batch", "slow_down")
+MAX_PENDING_ALERTS = 200  # alert events kept for the next broadcast
+
+
+def _policy_from_env() -> str:
+    policy = os.environ.get("TRAFFIC_TICK_POLICY", POLICIES[0])
+    if policy not in POLICIES:
+        print(f"Unknown TRAFFIC_TICK_POLICY {policy!r} (use one of {', '.join(POLICIES)}); "
+              f"using {POLICIES[0]}")
+        return POLICIES[0]
+    return policy
+
+
+DEFAULT_POLICY = _policy_from_env()
+
+
+class TickScheduler:
+    """Drives `step` and `broadcast` at the engine's speed (see module docstring)"""
+
+    def __init__(self, engine, policy: str = DEFAULT_POLICY, max_catch_up: int = 10,
+                 clock: Callable[[], float] = time.monotonic):
+        self.engine = engine
+        self.configure(policy, max_catch_up)
+        self.clock = clock
+
+        self.ticks = 0
+        self.broadcasts = 0
+        self.overruns = 0             # ticks whose step + broadcast took longer than the period
+        self.late_ticks = 0           # ticks started a whole period or more late
+        self.skipped_broadcasts = 0
+        self.batched_ticks = 0        # extra ticks run inside a batch
+        self.dropped_ticks = 0
+        self.speed_reductions = 0
+        self.speed_restores = 0
+        self.requested_speed = None   # speed before slow_down lowered it
+        self._lowered_speed = None    # the speed slow_down set last
+        self.max_lag = 0.0
+        self.lag = 0.0
+        self.work_times = deque(maxlen=100)
+        self._tick_times = deque(maxlen=50)
+        self._pending_alerts = deque(maxlen=MAX_PENDING_ALERTS)
+
+    def configure(self, policy: str, max_catch_up: int):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown tick policy {policy}; use one of {', '.join(POLICIES)}")
+        if max_catch_up < 1:
+            raise ValueError("max_catch_up must be at least 1")
+        self.policy = policy
+        self.max_catch_up = max_catch_up
+
+    @property
+    def period(self) -> float:
+        return 1.0 / self.engine.simulation_speed
+
+    @property
+    def effective_speed(self) -> float:
+        """Ticks per wall-clock second over the recent window (1 tick per
+        second is speed 1x)"""
+        if len(self._tick_times) < 2:
+            return self.engine.simulation_speed
+        span = self._tick_times[-1] - self._tick_times[0]
+        return (len(self._tick_times) - 1) / span if span > 0 else self.engine.simulation_speed
+
+    async def run(self, step: Callable[[], Awaitable[None]], broadcast: Callable[[], Awaitable[None]]):
+        next_tick = self.clock()
+        while True:
+            try:
+                next_tick = await self._iteration(next_tick, step, broadcast)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Background task error: {e}")
+                await asyncio.sleep(1)
+                next_tick = self.clock()
+
+    async def _iteration(self, next_tick: float, step, broadcast) -> float:
+        period = self.period
+        started = self.clock()
+        self.lag = max(0.0, started - next_tick)
+        self.max_lag = max(self.max_lag, self.lag)
+        behind = int(self.lag / period)
+
+        if behind > self.max_catch_up:
+            # Too far behind to catch up: drop the debt and restart from now
+            self.dropped_ticks += behind
+            next_tick, behind = started, 0
+        if behind:
+            self.late_ticks += 1
+
+        ticks = 1 + behind if self.policy == "batch" else 1
+        alerts = self.engine.alerts
+        for _ in range(ticks):
+            await step()
+            self._tick_times.append(self.clock())
+            # Each tick replaces last_events; keep them until a broadcast
+            self._pending_alerts.extend(alerts.last_events)
+        self.ticks += ticks
+        self.batched_ticks += ticks - 1
+        next_tick += ticks * period
+
+        if behind and self.policy == "skip_broadcast":
+            self.skipped_broadcasts += 1
+        else:
+            alerts.last_events = list(self._pending_alerts)
+            self._pending_alerts.clear()
+            await broadcast()
+            self.broadcasts += 1
+
+        work = self.clock() - started
+        self.work_times.append(work / ticks)
+        if work > ticks * period:
+            self.overruns += 1
+
+        if self.policy == "slow_down":
+            next_tick = self._adjust_speed(behind, next_tick)
+
+        await asyncio.sleep(max(0.0, next_tick - self.clock()))
+        return next_tick
+
+    def _adjust_speed(self, behind: int, next_tick: float) -> float:
+        """slow_down: run at the speed the recent per-tick work time
+        sustains, with some headroom, while behind; once on time, go back up
+        to the requested speed as far as the work time allows"""
+        engine = self.engine
+        if self._lowered_speed is not None and engine.simulation_speed != self._lowered_speed:
+            # Someone set a new speed since: that is the speed to keep
+            self.requested_speed = self._lowered_speed = None
+        if not behind and self.requested_speed is None:
+            return next_tick
+
+        average = sum(self.work_times) / len(self.work_times)
+        sustainable = 0.8 / average if average > 0 else float("inf")
+        previous = engine.simulation_speed
+        if behind:
+            if self.requested_speed is None:
+                self.requested_speed = previous
+            speed = engine.set_speed(min(sustainable, previous))
+            if speed < previous:
+                self.speed_reductions += 1
+        else:
+            target = min(sustainable, self.requested_speed)
+            if target < self.requested_speed and target < 1.05 * previous:
+                # Not enough headroom yet to be worth a new schedule
+                return next_tick
+            speed = engine.set_speed(target)
+            if speed > previous:
+                self.speed_restores += 1
+            if speed >= self.requested_speed:
+                self.requested_speed = None
+        self._lowered_speed = speed if self.requested_speed is not None else None
+        if speed == previous:
+            return next_tick
+        # Restart the schedule at the new period
+        return self.clock() + self.period
+
+    def describe(self) -> Dict:
+        work = sorted(self.work_times)
+        return {
+            "policy": self.policy,
+            "max_catch_up": self.max_catch_up,
+            "target_speed": self.engine.simulation_speed,
+            "effective_speed": self.effective_speed,
+            "period": self.period,
+            "ticks": self.ticks,
+            "broadcasts": self.broadcasts,
+            "overruns": self.overruns,
+            "late_ticks": self.late_ticks,
+            "skipped_broadcasts": self.skipped_broadcasts,
+            "batched_ticks": self.batched_ticks,
+            "dropped_ticks": self.dropped_ticks,
+            "speed_reductions": self.speed_reductions,
+            "speed_restores": self.speed_restores,
+            "requested_speed": self.requested_speed,
+            "lag": self.lag,
+            "max_lag": self.max_lag,
+            "work_p50": work[len(work) // 2] if work else None,
+            "work_max": work[-1] if work else None,
+        }
@@ -0,0 +1,307 @@
+import asyncio
+import bisect
+import os
+import struct
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+from .models import VEHICLE_TYPE_ORDER, RoadDirection, Turn, VehicleType
+
+# Binary trace layout: 8-byte header followed by fixed-size records of
+# (timestamp seconds, direction angle, vehicle type code, emergency flag)
+BINARY_MAGIC = b"TRCE0001"
+_RECORD = struct.Struct("<dHBB")
+
+# Sparse index sidecar: (timestamp, byte offset) pairs
+_INDEX_ENTRY = struct.Struct("<dQ")
+INDEX_SUFFIX = ".idx"
+
+_TYPE_TO_CODE = {vtype: code for code, vtype in enumerate(VEHICLE_TYPE_ORDER)}
+
+# Directory the server replays traces from (paths are resolved inside it)
+DEFAULT_TRACE_DIR = os.environ.get("TRAFFIC_TRACES_DIR", "traces")
+
+
+class ArrivalRecord(NamedTuple):
+    timestamp: float  # seconds
+    direction: RoadDirection
+    vehicle_type: VehicleType
+    emergency: bool
+    turn: Optional[Turn] = None  # None = let the engine draw one
+
+
+def _parse_direction(value: str) -> RoadDirection:
+    value = value.strip()
+    if value.lstrip("-").isdigit():
+        return RoadDirection(int(value))
+    return RoadDirection[value.upper()]
+
+
+def resolve_trace_path(path: str, trace_dir: str = DEFAULT_TRACE_DIR) -> str:
+    """Resolve a client-supplied trace path inside trace_dir (ValueError if
+    it points elsewhere), so clients cannot read or index arbitrary files"""
+    root = os.path.realpath(trace_dir)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"Trace {path} is outside the trace directory {trace_dir}")
+    return resolved
+
+
+def _parse_csv_line(line: bytes) -> Optional[ArrivalRecord]:
+    """Parse `timestamp,direction,vehicle_type,emergency` (header/blank ->
+    None, ValueError if malformed)"""
+    fields = line.decode("utf-8").strip().split(",")
+    if len(fields) < 3:
+        return None
+    try:
+        timestamp = float(fields[0])
+    except ValueError:
+        return None  # Header row
+    try:
+        vehicle_type = VehicleType(fields[2].strip().lower())
+        direction = _parse_direction(fields[1])
+    except KeyError as e:
+        raise ValueError(f"Unknown direction {e}")
+    emergency = (
+        fields[3].strip().lower() in ("1", "true", "yes")
+        if len(fields) > 3 and fields[3].strip()
+        else vehicle_type == VehicleType.EMERGENCY
+    )
+    return ArrivalRecord(timestamp, direction, vehicle_type, emergency)
+
+
+def _unpack_record(timestamp: float, angle: int, code: int, emergency: int) -> ArrivalRecord:
+    if code >= len(VEHICLE_TYPE_ORDER):
+        raise ValueError(f"Unknown vehicle type code {code}")
+    return ArrivalRecord(
+        timestamp, RoadDirection(angle), VEHICLE_TYPE_ORDER[code], bool(emergency)
+    )
+
+
+class TraceReader:
+    """Streams arrival records from a recorded detector file.
+
+    CSV (`timestamp,direction,vehicle_type,emergency`) and the fixed-record
+    binary format are both read in chunks, so files of any size are replayed
+    without being loaded into memory. Records must be sorted by timestamp;
+    malformed records are skipped and counted in malformed_records.
+    """
+
+    def __init__(self, path: str, chunk_size: int = 4096, index_stride: int = 1024):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.index_stride = index_stride
+        self.is_binary = self._detect_binary(path)
+        self._index: Optional[List[Tuple[float, int]]] = None
+        self.malformed_records = 0
+
+    @staticmethod
+    def _detect_binary(path: str) -> bool:
+        with open(path, "rb") as f:
+            return f.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
+    def _data_start(self) -> int:
+        return len(BINARY_MAGIC) if self.is_binary else 0
+
+    def _iter_with_offsets(self, offset: int) -> Iterator[Tuple[int, Optional[ArrivalRecord]]]:
+        """Yield (byte offset, record) pairs starting at a byte offset; the
+        record is None for a malformed one"""
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            if self.is_binary:
+                chunk_bytes = self.chunk_size * _RECORD.size
+                while True:
+                    chunk = f.read(chunk_bytes)
+                    usable = len(chunk) - len(chunk) % _RECORD.size
+                    for fields in _RECORD.iter_unpack(chunk[:usable]):
+                        try:
+                            record = _unpack_record(*fields)
+                        except ValueError:
+                            record = None
+                        yield offset, record
+                        offset += _RECORD.size
+                    if len(chunk) < chunk_bytes:
+                        break
+            else:
+                while True:
+                    lines = f.readlines(self.chunk_size * 64)
+                    if not lines:
+                        break
+                    for line in lines:
+                        try:
+                            record = _parse_csv_line(line)
+                            if record is not None:
+                                yield offset, record
+                        except ValueError:  # Includes undecodable bytes
+                            yield offset, None
+                        offset += len(line)
+
+    def build_index(self) -> List[Tuple[float, int]]:
+        """Scan the file once and keep every Nth (timestamp, offset) pair.
+
+        The index is written next to the trace (when the directory is
+        writable) and reused while the trace file is unchanged. It reads the
+        whole file, so servers run it in an executor (see
+        TraceArrivalSource).
+        """
+        index_path = self.path + INDEX_SUFFIX
+        if (
+            os.path.exists(index_path)
+            and os.path.getmtime(index_path) >= os.path.getmtime(self.path)
+        ):
+            with open(index_path, "rb") as f:
+                self._index = list(_INDEX_ENTRY.iter_unpack(f.read()))
+            return self._index
+
+        index = []
+        position = 0
+        for offset, record in self._iter_with_offsets(self._data_start()):
+            if record is None:
+                continue
+            if position % self.index_stride == 0:
+                index.append((record.timestamp, offset))
+            position += 1
+
+        try:
+            with open(index_path, "wb") as f:
+                for entry in index:
+                    f.write(_INDEX_ENTRY.pack(*entry))
+        except OSError:
+            pass  # Keep the index in memory only
+
+        self._index = index
+        return index
+
+    def seek_offset(self, start_time: float) -> int:
+        """Byte offset of the last indexed record at or before start_time"""
+        if self._index is None:
+            self.build_index()
+        position = bisect.bisect_right([ts for ts, _ in self._index], start_time) - 1
+        if position < 0:
+            return self._data_start()
+        return self._index[position][1]
+
+    def records(self, start_time: Optional[float] = None) -> Iterator[ArrivalRecord]:
+        """Yield records in file order, skipping those before start_time"""
+        offset = self._data_start() if start_time is None else self.seek_offset(start_time)
+        for _, record in self._iter_with_offsets(offset):
+            if record is None:
+                self.malformed_records += 1
+                continue
+            if start_time is not None and record.timestamp < start_time:
+                continue
+            yield record
+
+    def iter_ticks(self, start_time: Optional[float] = None,
+                   tick_seconds: float = 60.0) -> Iterator[List[ArrivalRecord]]:
+        """Group records into consecutive simulation ticks (empty ticks included)"""
+        records = self.records(start_time)
+        tick_start = start_time
+        batch: List[ArrivalRecord] = []
+
+        for record in records:
+            if tick_start is None:
+                tick_start = record.timestamp
+            while record.timestamp >= tick_start + tick_seconds:
+                yield batch
+                batch = []
+                tick_start += tick_seconds
+            batch.append(record)
+
+        if batch:
+            yield batch
+
+
+class TraceArrivalSource:
+    """Arrival source that feeds recorded arrivals to the engine tick by tick.
+
+    Seeking to a start time needs the reader's index; when created inside
+    an event loop the index is built in the default executor and the
+    replay starts once it is ready (no arrivals until then).
+    """
+
+    def __init__(self, reader: TraceReader, start_time: Optional[float] = None,
+                 tick_seconds: float = 60.0):
+        self.reader = reader
+        self.start_time = start_time
+        self.ticks_replayed = 0
+        self.exhausted = False
+        self.error: Optional[str] = None
+        self._ticks = reader.iter_ticks(start_time, tick_seconds)
+        self._indexing = None
+        if start_time is not None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
+            if loop is not None:
+                self._indexing = loop.run_in_executor(None, reader.build_index)
+
+    def arrivals_for_tick(self) -> List[ArrivalRecord]:
+        """Arrivals for the next tick (empty while indexing and once the
+        trace is exhausted)"""
+        if self.exhausted:
+            return []
+        if self._indexing is not None:
+            if not self._indexing.done():
+                return []
+            error = self._indexing.exception()
+            self._indexing = None
+            if error is not None:
+                return self._fail(error)
+        try:
+            batch = next(self._ticks)
+        except StopIteration:
+            self.exhausted = True
+            return []
+        except OSError as e:
+            return self._fail(e)
+        self.ticks_replayed += 1
+        return batch
+
+    def _fail(self, error: Exception) -> List[ArrivalRecord]:
+        self.error = str(error)
+        self.exhausted = True
+        return []
+
+    def describe(self) -> dict:
+        return {
+            "source": "trace",
+            "path": self.reader.path,
+            "format": "binary" if self.reader.is_binary else "csv",
+            "start_time": self.start_time,
+            "indexing": self._indexing is not None,
+            "ticks_replayed": self.ticks_replayed,
+            "malformed_records": self.reader.malformed_records,
+            "exhausted": self.exhausted,
+            "error": self.error,
+        }
+
+
+def write_binary_trace(path: str, records) -> int:
+    """Write records to the binary trace format, returning the record count"""
+    count = 0
+    with open(path, "wb") as f:
+        f.write(BINARY_MAGIC)
+        for record in records:
+            f.write(_RECORD.pack(
+                record.timestamp,
+                record.direction.value,
+                _TYPE_TO_CODE[record.vehicle_type],
+                1 if record.emergency else 0,
+            ))
+            count += 1
+    return count
+
+
+if __name__ == "__main__":
+    import sys
+
+    # python -m app.trace_replay <trace.csv> [<out.bin>]
+    # Builds the seek index, optionally converting CSV to the binary format
+    source = TraceReader(sys.argv[1])
+    if len(sys.argv) > 2:
+        written = write_binary_trace(sys.argv[2], source.records())
+        print(f"Wrote {written} records to {sys.argv[2]}")
+        source = TraceReader(sys.argv[2])
+    entries = source.build_index()
+    print(f"Indexed {source.path} ({len(entries)} index entries)")
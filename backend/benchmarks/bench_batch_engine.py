@@ -0,0 +1,100 @@
+"""Compare one scalar engine step with one batched step over many intersections.
+
+    python benchmarks/bench_batch_engine.py [num_intersections]
+
+First checks that both engines produce the same traffic: seeded scalar
+engines and a batch run side by side at a few arrival rates, comparing the
+distributions of per-tick departures and queued vehicles and the signal
+change rate.
+
+Expect about 17 us per intersection per step (170 ms for 10,000) against
+1.5-2 ms for one scalar step.
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.batch_engine import BatchSimulationEngine
+from app.simulation_engine import TrafficSimulationEngine
+
+QUANTILES = (0.1, 0.5, 0.9)
+
+
+def time_per_step(step, warmup: int = 50, steps: int = 200) -> float:
+    for _ in range(warmup):
+        step()
+    start = time.perf_counter()
+    for _ in range(steps):
+        step()
+    return (time.perf_counter() - start) / steps
+
+
+def scalar_step(engine: TrafficSimulationEngine):
+    engine.add_vehicles()
+    engine.process_green_signal()
+    engine.update_signal()
+    engine.update_metrics()
+    engine.simulation_time += 1
+
+
+def scalar_traffic(rate: float, engines: int, ticks: int):
+    """(departures, queued) per tick across seeded scalar engines, and
+    signal changes per tick"""
+    departures, queued, changes = [], [], 0
+    for seed in range(engines):
+        engine = TrafficSimulationEngine(seed=seed)
+        engine.alerts.set_rules([])
+        engine.vehicle_generation_rate = rate
+        processed = 0
+        for _ in range(ticks):
+            scalar_step(engine)
+            departures.append(engine.metrics["vehicles_processed"] - processed)
+            processed = engine.metrics["vehicles_processed"]
+            queued.append(sum(len(road.vehicles) for road in engine.intersection.roads.values()))
+        changes += engine.metrics["signal_changes"]
+    return np.array(departures), np.array(queued), changes / (engines * ticks)
+
+
+def batch_traffic(rate: float, intersections: int, ticks: int):
+    batch = BatchSimulationEngine(intersections, vehicle_generation_rate=rate, seed=0)
+    departures, queued = [], []
+    for _ in range(ticks):
+        processed = batch.metrics["vehicles_processed"].copy()
+        batch.step()
+        departures.append(batch.metrics["vehicles_processed"] - processed)
+        queued.append(batch.count.sum(axis=1))
+    changes = batch.metrics["signal_changes"].mean() / ticks
+    return np.array(departures).T.ravel(), np.array(queued).T.ravel(), changes
+
+
+def check_matches_scalar(rates=(2, 5, 8), engines: int = 8, ticks: int = 300):
+    for rate in rates:
+        scalar = scalar_traffic(rate, engines, ticks)
+        batch = batch_traffic(rate, 200, ticks)
+        print(f"rate {rate}: departures/tick {scalar[0].mean():.2f} scalar vs {batch[0].mean():.2f} batch, "
+              f"queued p10/p50/p90 {np.quantile(scalar[1], QUANTILES)} vs {np.quantile(batch[1], QUANTILES)}, "
+              f"signal changes/tick {scalar[2]:.3f} vs {batch[2]:.3f}")
+        assert abs(scalar[0].mean() - batch[0].mean()) <= 0.05 * scalar[0].mean() + 0.05
+        assert np.allclose(np.quantile(scalar[1], QUANTILES), np.quantile(batch[1], QUANTILES),
+                           rtol=0.15, atol=3)
+        assert abs(scalar[2] - batch[2]) <= 0.15 * scalar[2] + 0.01
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+    check_matches_scalar()
+
+    engine = TrafficSimulationEngine()
+    scalar = time_per_step(lambda: scalar_step(engine))
+
+    batch = BatchSimulationEngine(count, seed=0)
+    batched = time_per_step(batch.step, steps=50)
+
+    print(f"scalar engine:       {scalar * 1e3:8.3f} ms/step (1 intersection)")
+    print(f"batch engine:        {batched * 1e3:8.3f} ms/step ({count} intersections)")
+    print(f"per intersection:    {batched / count * 1e6:8.3f} us vs {scalar * 1e6:.1f} us")
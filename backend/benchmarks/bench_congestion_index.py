@@ -0,0 +1,118 @@
+"""Network congestion queries on a city-scale grid: full rescans versus the
+incrementally maintained congestion index.
+
+    python benchmarks/bench_congestion_index.py [grid_side] [changes_per_tick]
+
+Builds a grid_side x grid_side grid (regions are 10 x 10 blocks), then per
+tick changes the density of some roads and asks for the network congestion
+level and the hotspot intersection. The rescan baseline is the previous
+TrafficGraph implementation; both answers are checked against each other.
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.graph import TrafficGraph
+from app.models import IntersectionNode, Road, RoadDirection
+
+
+def build_grid(side: int) -> TrafficGraph:
+    graph = TrafficGraph()
+    for row in range(side):
+        for col in range(side):
+            graph.add_intersection(IntersectionNode(id=f"{row}-{col}", name=f"{row}-{col}"),
+                                   region=f"{row // 10}-{col // 10}")
+    for row in range(side):
+        for col in range(side):
+            if col + 1 < side:
+                graph.add_road(Road(id=f"{row}-{col}>E", name="", direction=RoadDirection.EAST),
+                               f"{row}-{col}", f"{row}-{col + 1}")
+            if row + 1 < side:
+                graph.add_road(Road(id=f"{row}-{col}>S", name="", direction=RoadDirection.SOUTH),
+                               f"{row}-{col}", f"{row + 1}-{col}")
+    return graph
+
+
+def rescan_congestion_level(graph: TrafficGraph) -> float:
+    total_density = 0.0
+    road_count = 0
+    for intersection in graph.intersections.values():
+        for road in intersection.roads.values():
+            total_density += road.traffic_density
+            road_count += 1
+    return total_density / road_count if road_count > 0 else 0.0
+
+
+def rescan_hotspot(graph: TrafficGraph):
+    max_congestion = -1.0
+    max_intersection = None
+    for intersection_id, intersection in graph.intersections.items():
+        if not intersection.roads:
+            continue
+        avg_congestion = sum(road.traffic_density for road in intersection.roads.values()) / len(intersection.roads)
+        if avg_congestion > max_congestion:
+            max_congestion = avg_congestion
+            max_intersection = intersection_id
+    return max_intersection
+
+
+def set_density(road: Road, density: float):
+    # What Road.update_density does once it has computed a new value
+    road.traffic_density = density
+    for listener in road.density_listeners:
+        listener(road)
+
+
+def check_shared_road_ids():
+    """Engines name their approaches road_{angle}, so road ids repeat across
+    intersections; each road must still only feed its own slot"""
+    graph = TrafficGraph()
+    for intersection_id in ("A", "B"):
+        intersection = IntersectionNode(id=intersection_id, name=intersection_id)
+        for direction in (RoadDirection.NORTH, RoadDirection.SOUTH):
+            intersection.roads[direction] = Road(id=f"road_{direction.value}", name="", direction=direction)
+        graph.add_intersection(intersection)
+    set_density(graph.intersections["A"].roads[RoadDirection.NORTH], 90.0)
+    set_density(graph.intersections["B"].roads[RoadDirection.NORTH], 0.0)
+    assert graph.get_congestion_level() == 90.0 / 4, graph.get_congestion_level()
+    assert graph.congestion.intersection_stats("B")["total"] == 0.0
+    assert graph.get_intersection_with_highest_congestion() == "A"
+
+
+if __name__ == "__main__":
+    check_shared_road_ids()
+
+    side = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    changes = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    ticks = 50
+
+    random.seed(0)
+    graph = build_grid(side)
+    roads = list(graph.road_map.values())
+    print(f"{len(graph.intersections)} intersections, {len(roads)} roads, "
+          f"{len(graph.congestion.regions)} regions, {changes} density changes per tick")
+
+    update_time = rescan_time = index_time = 0.0
+    for _ in range(ticks):
+        start = time.perf_counter()
+        for road in random.sample(roads, changes):
+            set_density(road, random.uniform(0, 150))
+        update_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        expected = (rescan_congestion_level(graph), rescan_hotspot(graph))
+        rescan_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        actual = (graph.get_congestion_level(), graph.get_intersection_with_highest_congestion())
+        index_time += time.perf_counter() - start
+
+        assert abs(expected[0] - actual[0]) < 1e-6 and expected[1] == actual[1], (expected, actual)
+
+    print(f"index upkeep:      {update_time / ticks * 1e3:8.3f} ms per tick")
+    print(f"rescan queries:    {rescan_time / ticks * 1e3:8.3f} ms per tick")
+    print(f"indexed queries:   {index_time / ticks * 1e3:8.3f} ms per tick")
+    print(f"region 0-0:        {graph.get_region_congestion('0-0')}")
@@ -0,0 +1,55 @@
+"""Environment steps per second for the RL wrappers in app/rl_env.py.
+
+    python benchmarks/bench_rl_env.py [batch_envs] [process_envs] [workers]
+
+Random actions; the single env is the baseline a training loop would get
+from one engine.
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.rl_env import NUM_ACTIONS, BatchVectorEnv, ProcessVectorEnv, TrafficSignalEnv
+
+
+def steps_per_second(env, num_envs: int, steps: int) -> float:
+    rng = np.random.default_rng(0)
+    env.reset(seed=0)
+    start = time.perf_counter()
+    for _ in range(steps):
+        env.step(rng.integers(0, NUM_ACTIONS, size=num_envs))
+    return num_envs * steps / (time.perf_counter() - start)
+
+
+class _Single:
+    """TrafficSignalEnv behind the vector interface"""
+
+    def __init__(self):
+        self.env = TrafficSignalEnv(max_steps=200)
+
+    def reset(self, seed=None):
+        return self.env.reset(seed)
+
+    def step(self, actions):
+        if self.env.step(int(actions[0]))[3]:
+            self.env.reset()
+
+
+if __name__ == "__main__":
+    batch_envs = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+    process_envs = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else os.cpu_count() or 1
+
+    single = steps_per_second(_Single(), 1, 500)
+    print(f"single env:          {single:12.0f} env steps/s")
+
+    batched = steps_per_second(BatchVectorEnv(batch_envs, max_steps=200), batch_envs, 200)
+    print(f"batch vector env:    {batched:12.0f} env steps/s ({batch_envs} envs)")
+
+    with ProcessVectorEnv(process_envs, num_workers=workers, max_steps=200) as env:
+        parallel = steps_per_second(env, process_envs, 200)
+    print(f"process vector env:  {parallel:12.0f} env steps/s ({process_envs} envs, {workers} workers)")
@@ -0,0 +1,103 @@
+"""Cold-start budget check for the backend.
+
+Measures, in fresh interpreters:
+  * import time of app.main once FastAPI itself is loaded
+  * that heavy optional dependencies are not imported at startup
+  * time from launching the production server to the first /health answer
+
+    python benchmarks/bench_startup.py
+
+Exits non-zero when a budget is exceeded. Budgets can be overridden with
+TRAFFIC_IMPORT_BUDGET_MS and TRAFFIC_HEALTH_BUDGET_MS.
+"""
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_BUDGET_MS = float(os.environ.get("TRAFFIC_IMPORT_BUDGET_MS", 150))
+HEALTH_BUDGET_MS = float(os.environ.get("TRAFFIC_HEALTH_BUDGET_MS", 3000))
+
+# Must not be imported until a feature that needs them is used
+LAZY_MODULES = ["numpy", "msgpack"]
+
+IMPORT_PROBE = """
+import json, sys, time
+{preload}
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+
+def probe_import(module: str, preload: str = "") -> dict:
+    code = IMPORT_PROBE.format(module=module, preload=preload)
+    output = subprocess.check_output([sys.executable, "-c", code], cwd=BACKEND_DIR)
+    return json.loads(output)
+
+
+def median_import_seconds(module: str, preload: str = "", runs: int = 5) -> float:
+    return statistics.median(probe_import(module, preload)["seconds"] for _ in range(runs))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_health(timeout: float = 30.0) -> float:
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "run.py", "--production", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError("server did not answer /health")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    failures = []
+
+    framework = median_import_seconds("fastapi")
+    overhead_ms = median_import_seconds("app.main", preload="import fastapi") * 1000
+    print(f"import fastapi:        {framework * 1000:8.1f} ms")
+    print(f"app import overhead:   {overhead_ms:8.1f} ms (budget {IMPORT_BUDGET_MS:.0f} ms)")
+    if overhead_ms > IMPORT_BUDGET_MS:
+        failures.append("import overhead")
+
+    loaded = probe_import("app.main")["modules"]
+    eager = [name for name in LAZY_MODULES if name in loaded]
+    print(f"eager heavy modules:   {', '.join(eager) or 'none'}")
+    if eager:
+        failures.append("eager imports")
+
+    health = time_to_first_health() * 1000
+    print(f"launch to /health:     {health:8.1f} ms (budget {HEALTH_BUDGET_MS:.0f} ms)")
+    if health > HEALTH_BUDGET_MS:
+        failures.append("health latency")
+
+    if failures:
+        print(f"FAILED: {', '.join(failures)}")
+        sys.exit(1)
+    print("OK")
@@ -0,0 +1,152 @@
+"""Vehicle allocation churn: per-instance memory, create/discard cost, and
+engine tick jitter with and without the vehicle pool.
+
+    python benchmarks/bench_vehicle_alloc.py [ticks]
+
+The "legacy" column is the previous representation (ordered dataclass with
+a __dict__, datetime default, string id and a priority table rebuilt per
+call), kept here only as the baseline.
+"""
+import asyncio
+import gc
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import Turn, Vehicle, VehiclePool, VehicleType
+from app.simulation_engine import TrafficSimulationEngine
+
+
+@dataclass(order=True)
+class LegacyVehicle:
+    id: str
+    vehicle_type: VehicleType
+    waiting_time: float = 0.0
+    entered_at: datetime = field(default_factory=datetime.now)
+    emergency: bool = False
+    turn: Turn = Turn.STRAIGHT
+    lane: int = 0
+    priority: float = field(default=0.0, init=False)
+
+    def __post_init__(self):
+        self.priority = self.calculate_priority()
+
+    def calculate_priority(self):
+        base_priority = {
+            VehicleType.EMERGENCY: 100.0,
+            VehicleType.TRUCK: 3.0,
+            VehicleType.BUS: 3.0,
+            VehicleType.CAR: 2.0,
+            VehicleType.MOTORCYCLE: 1.0,
+            VehicleType.BICYCLE: 1.0
+        }
+        priority = base_priority.get(self.vehicle_type, 2.0) + self.waiting_time * 0.5
+        if self.emergency:
+            priority += 50.0
+        return min(priority, 100.0)
+
+
+def legacy_factory():
+    count = 0
+
+    def make():
+        nonlocal count
+        count += 1
+        return LegacyVehicle(f"v_{count}_{datetime.now().timestamp()}", VehicleType.CAR)
+    return make
+
+
+def slotted_factory():
+    count = 0
+
+    def make():
+        nonlocal count
+        count += 1
+        return Vehicle(count, VehicleType.CAR)
+    return make
+
+
+def bytes_per_instance(make, count: int = 20000) -> float:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    live = [make() for _ in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del live
+    return allocated / count
+
+
+def churn_seconds(make, release=None, rounds: int = 200, batch: int = 500) -> float:
+    """Create a batch of vehicles, then discard (or release) them, repeatedly"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        vehicles = [make() for _ in range(batch)]
+        if release:
+            release(vehicles)
+    return (time.perf_counter() - start) / (rounds * batch)
+
+
+def tick_profile(pooled: bool, ticks: int, warmup: int = 50):
+    """Step the engine at a high arrival rate; returns step times and GC runs"""
+    engine = TrafficSimulationEngine(seed=0)
+    if not pooled:
+        engine.vehicle_pool = VehiclePool(max_free=0)
+    engine.vehicle_generation_rate = 20
+    engine.start()
+    loop = asyncio.new_event_loop()
+    for _ in range(warmup):
+        loop.run_until_complete(engine.run_step())
+
+    collections = [0]
+
+    def count_collections(phase, info):
+        if phase == "start":
+            collections[0] += 1
+
+    gc.callbacks.append(count_collections)
+    durations = []
+    try:
+        for _ in range(ticks):
+            start = time.perf_counter()
+            loop.run_until_complete(engine.run_step())
+            durations.append(time.perf_counter() - start)
+    finally:
+        gc.callbacks.remove(count_collections)
+        loop.close()
+    return durations, collections[0], engine.vehicle_pool
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+if __name__ == "__main__":
+    ticks = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    legacy_bytes = bytes_per_instance(legacy_factory())
+    slotted_bytes = bytes_per_instance(slotted_factory())
+    print(f"bytes per vehicle:     legacy {legacy_bytes:7.0f}   slotted {slotted_bytes:7.0f}")
+
+    pool = VehiclePool()
+    legacy = churn_seconds(legacy_factory())
+    slotted = churn_seconds(slotted_factory())
+    pooled = churn_seconds(lambda: pool.acquire(VehicleType.CAR), pool.release_all)
+    print(f"create+discard:        legacy {legacy * 1e9:7.0f} ns   slotted {slotted * 1e9:7.0f} ns"
+          f"   pooled {pooled * 1e9:7.0f} ns")
+
+    for label, use_pool in (("no pool", False), ("pool", True)):
+        durations, collections, vehicle_pool = tick_profile(use_pool, ticks)
+        print(f"engine ticks ({label:7s}): p50 {statistics.median(durations) * 1e3:6.3f} ms"
+              f"   p99 {percentile(durations, 0.99) * 1e3:6.3f} ms"
+              f"   max {max(durations) * 1e3:6.3f} ms"
+              f"   gc runs {collections:5d}"
+              f"   vehicles built {vehicle_pool.created} reused {vehicle_pool.reused}")
@@ -0,0 +1,240 @@
+"""WebSocket load generator and end-to-end latency report for /ws.
+
+Opens N simulated clients against a server, some of them deliberately slow
+readers, and measures for every combination of client count and
+simulation speed:
+  * frame inter-arrival time at the clients
+  * end-to-end latency, from the server_time embedded in each state frame
+    to its arrival at the client (same host clock)
+  * dropped frames, from gaps in the simulation_time tick sequence
+  * server CPU, from the cpu_seconds reported by /health
+
+    python benchmarks/ws_load.py --clients 10,100,500 --speeds 1,5 --duration 15
+    python benchmarks/ws_load.py --url http://127.0.0.1:8000 --format binary
+
+Without --url a production server is launched on a free local port (with
+--workers N for a multi-worker deployment; CPU is then that of the worker
+answering /health only).
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import struct
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class ClientStats:
+    def __init__(self, slow: bool):
+        self.slow = slow
+        self.frames = 0
+        self.dropped = 0
+        self.inter_arrival: List[float] = []
+        self.latency: List[float] = []
+        self.error: Optional[str] = None
+
+
+def parse_frame(message, binary: bool):
+    """(tick, server_time) of a state frame, or None for other messages"""
+    if binary and isinstance(message, bytes):
+        return struct.unpack_from("<I", message, 4)[0], struct.unpack_from("<d", message, len(message) - 8)[0]
+    state = json.loads(message)
+    # Alert pushes and command replies carry a "type"; state frames do not
+    if "type" in state or "simulation_time" not in state:
+        return None
+    return state["simulation_time"], state.get("server_time")
+
+
+async def run_client(ws_url: str, stats: ClientStats, deadline: float,
+                     binary: bool, slow_delay: float):
+    import websockets
+
+    try:
+        async with websockets.connect(ws_url, open_timeout=30, max_size=None) as ws:
+            await ws.recv()  # Initial state, produced before we connected
+            last_tick = None
+            last_arrival = None
+            while True:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    message = await asyncio.wait_for(ws.recv(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                arrival = time.time()
+                frame = parse_frame(message, binary)
+                if frame is None:
+                    continue
+                tick, server_time = frame
+
+                stats.frames += 1
+                if last_tick is not None and tick > last_tick + 1:
+                    stats.dropped += tick - last_tick - 1
+                if last_arrival is not None:
+                    stats.inter_arrival.append(arrival - last_arrival)
+                if server_time:
+                    stats.latency.append(arrival - server_time)
+                last_tick, last_arrival = tick, arrival
+
+                if stats.slow:
+                    await asyncio.sleep(slow_delay)
+    except Exception as e:
+        stats.error = f"{type(e).__name__}: {e}"
+
+
+def http(base_url: str, method: str, path: str) -> Dict:
+    request = urllib.request.Request(base_url + path, method=method)
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.loads(response.read())
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize(clients: List[ClientStats]) -> Dict:
+    inter_arrival = [x for c in clients for x in c.inter_arrival]
+    latency = [x for c in clients for x in c.latency]
+    return {
+        "clients": len(clients),
+        "errors": sum(1 for c in clients if c.error),
+        "frames": sum(c.frames for c in clients),
+        "dropped": sum(c.dropped for c in clients),
+        "inter_arrival_p50": percentile(inter_arrival, 0.5),
+        "inter_arrival_p99": percentile(inter_arrival, 0.99),
+        "latency_p50": percentile(latency, 0.5),
+        "latency_p99": percentile(latency, 0.99),
+        "latency_max": max(latency) if latency else None,
+    }
+
+
+async def run_scenario(base_url: str, clients: int, speed: float, duration: float,
+                       slow_fraction: float, slow_delay: float, binary: bool) -> Dict:
+    await asyncio.to_thread(http, base_url, "POST", f"/speed/{speed}")
+    ws_url = base_url.replace("http", "ws", 1) + "/ws" + ("?format=binary" if binary else "")
+
+    slow_count = int(round(clients * slow_fraction))
+    stats = [ClientStats(slow=i < slow_count) for i in range(clients)]
+    deadline = time.time() + duration
+
+    before = await asyncio.to_thread(http, base_url, "GET", "/health")
+    started = time.time()
+    await asyncio.gather(*(run_client(ws_url, s, deadline, binary, slow_delay) for s in stats))
+    after = await asyncio.to_thread(http, base_url, "GET", "/health")
+    elapsed = time.time() - started
+
+    same_process = before.get("pid") == after.get("pid")
+    return {
+        "speed": speed,
+        "server_cpu_percent": (
+            100 * (after["cpu_seconds"] - before["cpu_seconds"]) / elapsed
+            if same_process and "cpu_seconds" in after else None
+        ),
+        "all": summarize(stats),
+        "normal": summarize([s for s in stats if not s.slow]),
+        "slow": summarize([s for s in stats if s.slow]),
+        "first_error": next((s.error for s in stats if s.error), None),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def launch_server(workers: int, timeout: float = 30.0):
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "run.py", "--production", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers)],
+        cwd=BACKEND_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    start = time.time()
+    while time.time() - start < timeout:
+        try:
+            http(base_url, "GET", "/health")
+            return server, base_url
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise TimeoutError("server did not answer /health")
+
+
+def fmt_ms(value: Optional[float]) -> str:
+    return f"{value * 1000:8.1f}" if value is not None else "       -"
+
+
+def print_report(results: List[Dict]):
+    print(f"{'clients':>7} {'speed':>5} {'group':>6} {'frames':>7} {'dropped':>7} "
+          f"{'gap p50':>8} {'gap p99':>8} {'lat p50':>8} {'lat p99':>8} {'lat max':>8} {'cpu %':>6}")
+    for result in results:
+        cpu = result["server_cpu_percent"]
+        for group in ("normal", "slow"):
+            row = result[group]
+            if not row["clients"]:
+                continue
+            print(f"{result['all']['clients']:7d} {result['speed']:5.1f} {group:>6} "
+                  f"{row['frames']:7d} {row['dropped']:7d} "
+                  f"{fmt_ms(row['inter_arrival_p50'])} {fmt_ms(row['inter_arrival_p99'])} "
+                  f"{fmt_ms(row['latency_p50'])} {fmt_ms(row['latency_p99'])} {fmt_ms(row['latency_max'])} "
+                  f"{cpu if cpu is not None else float('nan'):6.1f}")
+        if result["first_error"]:
+            print(f"        {result['all']['errors']} client errors, e.g. {result['first_error']}")
+    print("(times in ms; gap = frame inter-arrival, lat = server_time to client)")
+
+
+async def main(args):
+    server = None
+    base_url = args.url
+    if base_url is None:
+        server, base_url = launch_server(args.workers)
+    try:
+        await asyncio.to_thread(http, base_url, "POST", "/control/start")
+        results = []
+        for speed in args.speeds:
+            for clients in args.clients:
+                result = await run_scenario(base_url, clients, speed, args.duration,
+                                            args.slow_fraction, args.slow_delay,
+                                            args.format == "binary")
+                results.append(result)
+                print(f"done: {clients} clients at {speed}x", file=sys.stderr)
+        print_report(results)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    def number_list(value):
+        return [float(v) if "." in v else int(v) for v in value.split(",")]
+
+    parser = argparse.ArgumentParser(description="Load test the /ws state stream")
+    parser.add_argument("--url", help="Existing server, e.g. http://127.0.0.1:8000 (default: launch one)")
+    parser.add_argument("--workers", type=int, default=1, help="Workers for the launched server")
+    parser.add_argument("--clients", type=number_list, default=[10, 50, 100])
+    parser.add_argument("--speeds", type=number_list, default=[1, 5])
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per scenario")
+    parser.add_argument("--slow-fraction", type=float, default=0.1, help="Share of slow readers")
+    parser.add_argument("--slow-delay", type=float, default=2.0, help="Seconds a slow reader spends per frame")
+    parser.add_argument("--format", choices=["json", "binary"], default="json")
+    parser.add_argument("--output", help="Also write the results as JSON")
+    asyncio.run(main(parser.parse_args()))
@@ -1,3 +1,5 @@
+import argparse
+import subprocess
 import uvicorn
 import sys
 import os
@@ -6,10 +8,60 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 if __name__ == "__main__":
-    uvicorn.run(
-        "app.main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        log_level="info"
-    )
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Smart Traffic Signal System backend")
+    parser.add_argument(
+        "--production",
+        action="store_true",
+        default=os.environ.get("TRAFFIC_ENV") == "production",
+        help="Production launch: no auto-reload (also TRAFFIC_ENV=production)"
+    )
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8000)))
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.environ.get("WEB_CONCURRENCY", 1)),
+        help="HTTP/WebSocket worker processes; more than one runs the engine "
+             "in a separate owner process that all workers share"
+    )
+    parser.add_argument(
+        "--owner-address",
+        default=os.environ.get("TRAFFIC_OWNER_ADDRESS", "127.0.0.1:8765"),
+        help="Local socket the engine owner publishes on in multi-worker mode"
+    )
+    parser.add_argument(
+        "--tick-policy",
+        choices=["skip_broadcast", "batch", "slow_down"],
+        default=os.environ.get("TRAFFIC_TICK_POLICY", "skip_broadcast"),
+        help="How the tick loop catches up when it falls behind (also TRAFFIC_TICK_POLICY)"
+    )
+    args = parser.parse_args()
+    os.environ["TRAFFIC_TICK_POLICY"] = args.tick_policy
+    
+    if args.workers <= 1:
+        uvicorn.run(
+            "app.main:app",
+            host=args.host,
+            port=args.port,
+            reload=not args.production,
+            log_level="info"
+        )
+        sys.exit(0)
+    
+    # Multi-worker: one engine owner process, stateless workers subscribe to it
+    owner = subprocess.Popen(
+        [sys.executable, "-m", "app.cluster", "--address", args.owner_address],
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    os.environ["TRAFFIC_OWNER"] = args.owner_address
+    try:
+        uvicorn.run(
+            "app.main:app",
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            log_level="info"
+        )
+    finally:
+        owner.terminate()
+        owner.wait()
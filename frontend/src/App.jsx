@@ -1,4 +1,4 @@
-import React, { useState } from "react";
+import React, { useEffect, useState } from "react";
 import { Canvas } from "@react-three/fiber";
 import { OrbitControls } from "@react-three/drei";
 import { useSimulation } from "./hooks/useSimulation";
@@ -17,6 +17,12 @@ function App() {
   const [sidebarCollapsed, setSidebarCollapsed] = useState(false);
   const [activeView, setActiveView] = useState("dashboard");
 
+  // Views without the 3D scene don't need the per-road vehicle previews
+  useEffect(() => {
+    const showsVehicles = !["analytics", "reports"].includes(activeView);
+    simulationService.setTopics(showsVehicles ? null : { vehicles: false });
+  }, [activeView]);
+
   // Handle quick actions from sidebar
   const handleQuickAction = async (action) => {
     switch (action) {
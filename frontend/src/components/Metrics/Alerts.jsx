@@ -1,78 +1,80 @@
-import React, { useState } from "react";
+import React, { useEffect, useState } from "react";
+import simulationService from "../../services/simulationService";
 import "./Alerts.css";
 
-const Alerts = ({ metrics = {} }) => {
-  const [alerts, setAlerts] = useState([
-    {
-      id: 1,
-      type: "warning",
-      title: "High Congestion Detected",
-      message: "Traffic density exceeded 80% on NORTH road",
-      time: "2 minutes ago",
-      priority: "high",
-      active: true,
-    },
-    {
-      id: 2,
-      type: "info",
-      title: "Emergency Vehicle Prioritized",
-      message: "Emergency vehicle cleared from EAST approach",
-      time: "5 minutes ago",
-      priority: "medium",
-      active: true,
-    },
-    {
-      id: 3,
-      type: "success",
-      title: "Wait Time Improved",
-      message: "Average wait time reduced by 15%",
-      time: "10 minutes ago",
-      priority: "low",
-      active: true,
-    },
-    {
-      id: 4,
-      type: "critical",
-      title: "System Alert",
-      message: "Priority queue experiencing high load",
-      time: "15 minutes ago",
-      priority: "critical",
-      active: true,
-    },
-  ]);
-
-  const systemAlerts = [
-    {
-      id: "congestion",
-      active: (metrics.congestion_level || 0) >= 80,
-      message: `High congestion: ${
-        metrics.congestion_level?.toFixed(1) || "0"
-      }%`,
-      level: "critical",
-    },
-    {
-      id: "waitTime",
-      active: (metrics.avg_wait_time || 0) > 10,
-      message: `High wait time: ${
-        metrics.avg_wait_time?.toFixed(1) || "0"
-      } min`,
-      level: "warning",
-    },
-    {
-      id: "emergency",
-      active: (metrics.emergency_vehicles || 0) > 0,
-      message: `${metrics.emergency_vehicles || 0} emergency vehicle(s) active`,
-      level: "info",
-    },
-    {
-      id: "throughput",
-      active: (metrics.throughput || 0) < 100,
-      message: `Low throughput: ${
-        metrics.throughput?.toFixed(0) || "0"
-      } veh/hr`,
-      level: "warning",
-    },
-  ];
+const MAX_ALERTS = 50;
+
+// Active alerts are keyed like the server's rule states: rule and road
+const alertKey = (alert) => `${alert.rule}:${alert.road ?? "global"}`;
+
+const Alerts = () => {
+  // Raised/cleared events pushed by the server's alert engine
+  const [alerts, setAlerts] = useState([]);
+  // The server's active alert set, seeded from GET /alerts and kept up to
+  // date by the events
+  const [activeSet, setActiveSet] = useState({});
+
+  useEffect(() => {
+    const loadActive = () =>
+      simulationService
+        .getAlerts()
+        .then((data) =>
+          setActiveSet(
+            Object.fromEntries(data.active.map((alert) => [alertKey(alert), alert]))
+          )
+        )
+        .catch(() => {});
+    loadActive();
+
+    // A reconnect or a reset (time going back) may have changed the set
+    let lastTime = -1;
+    return simulationService.subscribe((type, data) => {
+      if (type === "connected" && data) {
+        loadActive();
+        return;
+      }
+      if (type === "state") {
+        if (data.simulation_time < lastTime) {
+          loadActive();
+        }
+        lastTime = data.simulation_time;
+        return;
+      }
+      if (type !== "alerts") {
+        return;
+      }
+      const incoming = data.events.map((event) => ({
+        id: event.id,
+        type: event.status === "cleared" ? "success" : event.level,
+        title:
+          event.status === "cleared" ? `${event.title} resolved` : event.title,
+        message: event.message,
+        time: `tick ${event.tick}`,
+        priority: event.level,
+        active: true,
+      }));
+      setAlerts((prev) => [...incoming.reverse(), ...prev].slice(0, MAX_ALERTS));
+      setActiveSet((prev) => {
+        const next = { ...prev };
+        data.events.forEach((event) => {
+          if (event.status === "raised") {
+            next[alertKey(event)] = { ...event, since: event.tick };
+          } else {
+            delete next[alertKey(event)];
+          }
+        });
+        return next;
+      });
+    });
+  }, []);
+
+  const serverAlerts = Object.entries(activeSet).map(([key, alert]) => ({
+    id: key,
+    level: alert.level,
+    message: `${alert.title}${
+      alert.road != null ? ` (road ${alert.road}°)` : ""
+    }: ${Number(alert.value).toFixed(1)}`,
+  }));
 
   const getAlertIcon = (type) => {
     switch (type) {
@@ -131,12 +133,17 @@ const Alerts = ({ metrics = {} }) => {
       <div className="system-status">
         <h4>Real-time Status</h4>
         <div className="status-grid">
-          {systemAlerts.map((alert) => (
+          {serverAlerts.length === 0 && (
+            <div className="status-indicator inactive">
+              <div className="status-icon">✅</div>
+              <div className="status-message">No alert rule is firing</div>
+              <div className="status-dot"></div>
+            </div>
+          )}
+          {serverAlerts.map((alert) => (
             <div
               key={alert.id}
-              className={`status-indicator ${
-                alert.active ? "active" : "inactive"
-              } ${alert.level}`}
+              className={`status-indicator active ${alert.level}`}
             >
               <div className="status-icon">{getAlertIcon(alert.level)}</div>
               <div className="status-message">{alert.message}</div>
@@ -173,7 +173,7 @@ const MetricsPanel = ({ metrics = {}, historicalData = [], roads = {} }) => {
       </div>
 
       <div className="alerts-section">
-        <Alerts metrics={metrics} />
+        <Alerts />
       </div>
 
       <div className="stakeholder-section">
@@ -2,7 +2,6 @@ import { useState, useEffect, useMemo, useCallback } from "react";
 
 export const useMetrics = (metrics = {}) => {
   const [historicalData, setHistoricalData] = useState([]);
-  const [alerts, setAlerts] = useState([]);
   const [maxHistoryLength] = useState(100);
 
   // Update historical data when metrics change
@@ -70,99 +69,6 @@ export const useMetrics = (metrics = {}) => {
     };
   }, [historicalData]);
 
-  // Generate alerts based on metrics
-  useEffect(() => {
-    const newAlerts = [];
-    const timestamp = Date.now();
-
-    // Check for congestion alerts
-    if (derivedMetrics.congestionLevel >= 80) {
-      newAlerts.push({
-        id: `congestion-${timestamp}`,
-        type: "critical",
-        title: "High Congestion Alert",
-        message: `Traffic congestion at ${derivedMetrics.congestionLevel.toFixed(
-          1
-        )}%`,
-        timestamp,
-        priority: 1,
-      });
-    } else if (derivedMetrics.congestionLevel >= 60) {
-      newAlerts.push({
-        id: `congestion-${timestamp}`,
-        type: "warning",
-        title: "Moderate Congestion",
-        message: `Traffic congestion at ${derivedMetrics.congestionLevel.toFixed(
-          1
-        )}%`,
-        timestamp,
-        priority: 2,
-      });
-    }
-
-    // Check for wait time alerts
-    if (derivedMetrics.avgWaitTime > 10) {
-      newAlerts.push({
-        id: `wait-time-${timestamp}`,
-        type: "critical",
-        title: "High Wait Time",
-        message: `Average wait time: ${derivedMetrics.avgWaitTime.toFixed(
-          1
-        )} minutes`,
-        timestamp,
-        priority: 1,
-      });
-    } else if (derivedMetrics.avgWaitTime > 5) {
-      newAlerts.push({
-        id: `wait-time-${timestamp}`,
-        type: "warning",
-        title: "Elevated Wait Time",
-        message: `Average wait time: ${derivedMetrics.avgWaitTime.toFixed(
-          1
-        )} minutes`,
-        timestamp,
-        priority: 2,
-      });
-    }
-
-    // Check for emergency vehicle activity
-    if (derivedMetrics.emergencyVehicles > 0) {
-      newAlerts.push({
-        id: `emergency-${timestamp}`,
-        type: "info",
-        title: "Emergency Vehicle Active",
-        message: `${derivedMetrics.emergencyVehicles} emergency vehicle(s) in the system`,
-        timestamp,
-        priority: 3,
-      });
-    }
-
-    // Check for positive trends
-    if (derivedMetrics.waitTimeTrend < -10) {
-      newAlerts.push({
-        id: `improvement-${timestamp}`,
-        type: "success",
-        title: "Wait Time Improving",
-        message: `Wait time decreased by ${Math.abs(
-          derivedMetrics.waitTimeTrend
-        ).toFixed(1)}%`,
-        timestamp,
-        priority: 4,
-      });
-    }
-
-    // Update alerts, remove old ones (older than 5 minutes)
-    setAlerts((prev) => {
-      const fiveMinutesAgo = timestamp - 5 * 60 * 1000;
-      const filteredAlerts = prev.filter(
-        (alert) => alert.timestamp > fiveMinutesAgo
-      );
-      return [...filteredAlerts, ...newAlerts].sort(
-        (a, b) => a.priority - b.priority
-      );
-    });
-  }, [derivedMetrics]);
-
   // Get chart data for specific metric
   const getChartData = useCallback(
     (metricKey, dataPoints = 20) => {
@@ -188,7 +94,6 @@ export const useMetrics = (metrics = {}) => {
         congestion: derivedMetrics.congestionTrend,
         efficiency: derivedMetrics.efficiency,
       },
-      alerts: alerts.slice(0, 5), // Latest 5 alerts
       statistics: {
         dataPoints: historicalData.length,
         timeRange:
@@ -198,17 +103,7 @@ export const useMetrics = (metrics = {}) => {
             : 0,
       },
     };
-  }, [derivedMetrics, historicalData, alerts]);
-
-  // Clear specific alert
-  const clearAlert = useCallback((alertId) => {
-    setAlerts((prev) => prev.filter((alert) => alert.id !== alertId));
-  }, []);
-
-  // Clear all alerts
-  const clearAllAlerts = useCallback(() => {
-    setAlerts([]);
-  }, []);
+  }, [derivedMetrics, historicalData]);
 
   return {
     // Current metrics
@@ -217,11 +112,6 @@ export const useMetrics = (metrics = {}) => {
     // Historical data
     historicalData,
 
-    // Alerts
-    alerts,
-    clearAlert,
-    clearAllAlerts,
-
     // Data access methods
     getChartData,
     getMetricsSummary,
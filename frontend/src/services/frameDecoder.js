@@ -0,0 +1,289 @@
+// Decoder for the compact binary state frames sent by the backend when a
+// client connects to /ws?format=binary (see backend/app/frame_codec.py).
+
+export const BINARY_SUBPROTOCOL = "traffic.binary.v1";
+
+const FRAME_MAGIC = "TF";
+const FRAME_VERSION = 2;
+const HEADER_SIZE = 18;
+const FLAG_RUNNING = 0x01;
+const ROAD_FLAG_GREEN = 0x01;
+const EMERGENCY_BIT = 0x80;
+
+// Wire codes -> vehicle type strings (must match VEHICLE_TYPE_CODES)
+const VEHICLE_TYPES = [
+  "car",
+  "motorcycle",
+  "truck",
+  "bus",
+  "emergency",
+  "bicycle",
+];
+
+const ROAD_NAMES = {
+  0: "NORTH",
+  45: "NORTHEAST",
+  90: "EAST",
+  135: "SOUTHEAST",
+  180: "SOUTH",
+  225: "SOUTHWEST",
+  270: "WEST",
+  315: "NORTHWEST",
+};
+
+const textDecoder = new TextDecoder();
+
+// MessagePack reader for the trailing map of state fields outside the
+// fixed layout (every type msgpack-python emits except ext).
+// MessagePack is big-endian, which is the DataView default.
+const readMsgPack = (view, state) => {
+  const byte = view.getUint8(state.offset++);
+
+  if (byte <= 0x7f) return byte;
+  if (byte >= 0xe0) return byte - 0x100;
+  if ((byte & 0xf0) === 0x80) return readMap(view, state, byte & 0x0f);
+  if ((byte & 0xf0) === 0x90) return readArray(view, state, byte & 0x0f);
+  if ((byte & 0xe0) === 0xa0) return readString(view, state, byte & 0x1f);
+
+  let value;
+  switch (byte) {
+    case 0xc0:
+      return null;
+    case 0xc2:
+      return false;
+    case 0xc3:
+      return true;
+    case 0xca:
+      value = view.getFloat32(state.offset);
+      state.offset += 4;
+      return value;
+    case 0xcb:
+      value = view.getFloat64(state.offset);
+      state.offset += 8;
+      return value;
+    case 0xcc:
+      return view.getUint8(state.offset++);
+    case 0xcd:
+      value = view.getUint16(state.offset);
+      state.offset += 2;
+      return value;
+    case 0xce:
+      value = view.getUint32(state.offset);
+      state.offset += 4;
+      return value;
+    case 0xcf:
+      value = Number(view.getBigUint64(state.offset));
+      state.offset += 8;
+      return value;
+    case 0xd0:
+      return view.getInt8(state.offset++);
+    case 0xd1:
+      value = view.getInt16(state.offset);
+      state.offset += 2;
+      return value;
+    case 0xd2:
+      value = view.getInt32(state.offset);
+      state.offset += 4;
+      return value;
+    case 0xd3:
+      value = Number(view.getBigInt64(state.offset));
+      state.offset += 8;
+      return value;
+    case 0xd9:
+      return readString(view, state, view.getUint8(state.offset++));
+    case 0xda:
+      value = view.getUint16(state.offset);
+      state.offset += 2;
+      return readString(view, state, value);
+    case 0xdb:
+      value = view.getUint32(state.offset);
+      state.offset += 4;
+      return readString(view, state, value);
+    case 0xc4:
+      return readBinary(view, state, view.getUint8(state.offset++));
+    case 0xc5:
+      value = view.getUint16(state.offset);
+      state.offset += 2;
+      return readBinary(view, state, value);
+    case 0xc6:
+      value = view.getUint32(state.offset);
+      state.offset += 4;
+      return readBinary(view, state, value);
+    case 0xdc:
+      value = view.getUint16(state.offset);
+      state.offset += 2;
+      return readArray(view, state, value);
+    case 0xdd:
+      value = view.getUint32(state.offset);
+      state.offset += 4;
+      return readArray(view, state, value);
+    case 0xde:
+      value = view.getUint16(state.offset);
+      state.offset += 2;
+      return readMap(view, state, value);
+    case 0xdf:
+      value = view.getUint32(state.offset);
+      state.offset += 4;
+      return readMap(view, state, value);
+    default:
+      throw new Error(`Unsupported MessagePack type 0x${byte.toString(16)}`);
+  }
+};
+
+const readString = (view, state, length) => {
+  const bytes = new Uint8Array(
+    view.buffer,
+    view.byteOffset + state.offset,
+    length
+  );
+  state.offset += length;
+  return textDecoder.decode(bytes);
+};
+
+const readBinary = (view, state, length) => {
+  const bytes = new Uint8Array(
+    view.buffer.slice(
+      view.byteOffset + state.offset,
+      view.byteOffset + state.offset + length
+    )
+  );
+  state.offset += length;
+  return bytes;
+};
+
+const readArray = (view, state, length) => {
+  const result = new Array(length);
+  for (let i = 0; i < length; i++) {
+    result[i] = readMsgPack(view, state);
+  }
+  return result;
+};
+
+const readMap = (view, state, length) => {
+  const result = {};
+  for (let i = 0; i < length; i++) {
+    const key = readMsgPack(view, state);
+    result[key] = readMsgPack(view, state);
+  }
+  return result;
+};
+
+/**
+ * Decode a binary state frame into the same shape as the JSON state.
+ * @param {ArrayBuffer} buffer
+ */
+export const decodeStateFrame = (buffer) => {
+  const view = new DataView(buffer);
+
+  const magic = String.fromCharCode(view.getUint8(0), view.getUint8(1));
+  const version = view.getUint8(2);
+  if (magic !== FRAME_MAGIC || version !== FRAME_VERSION) {
+    throw new Error(`Unsupported frame ${magic} v${version}`);
+  }
+
+  const flags = view.getUint8(3);
+  const simulationTime = view.getUint32(4, true);
+  const currentGreen = view.getInt16(8, true);
+  const greenDuration = view.getUint16(10, true);
+  const roadCount = view.getUint16(12, true);
+  const simulationSpeed = view.getFloat32(14, true);
+
+  let offset = HEADER_SIZE;
+  const readU16s = () => {
+    const values = new Array(roadCount);
+    for (let i = 0; i < roadCount; i++) {
+      values[i] = view.getUint16(offset, true);
+      offset += 2;
+    }
+    return values;
+  };
+
+  const directions = readU16s();
+  const counts = readU16s();
+  const capacities = readU16s();
+  const densities = new Array(roadCount);
+  for (let i = 0; i < roadCount; i++) {
+    densities[i] = view.getFloat32(offset, true);
+    offset += 4;
+  }
+  const previewCounts = new Array(roadCount);
+  let vehicleCount = 0;
+  for (let i = 0; i < roadCount; i++) {
+    previewCounts[i] = view.getUint8(offset++);
+    vehicleCount += previewCounts[i];
+  }
+  const roadFlags = new Array(roadCount);
+  for (let i = 0; i < roadCount; i++) {
+    roadFlags[i] = view.getUint8(offset++);
+  }
+  const laneCounts = new Array(roadCount);
+  for (let i = 0; i < roadCount; i++) {
+    laneCounts[i] = view.getUint8(offset++);
+  }
+  const laneQueues = new Array(roadCount);
+  for (let i = 0; i < roadCount; i++) {
+    laneQueues[i] = new Array(laneCounts[i]);
+    for (let j = 0; j < laneCounts[i]; j++) {
+      laneQueues[i][j] = view.getUint16(offset, true);
+      offset += 2;
+    }
+  }
+
+  const codesOffset = offset;
+  const waitsOffset = codesOffset + vehicleCount;
+  const prioritiesOffset = waitsOffset + vehicleCount * 4;
+  offset = prioritiesOffset + vehicleCount * 4;
+
+  const roads = {};
+  let vehicleIndex = 0;
+  for (let i = 0; i < roadCount; i++) {
+    const vehicles = new Array(previewCounts[i]);
+    for (let j = 0; j < previewCounts[i]; j++, vehicleIndex++) {
+      const code = view.getUint8(codesOffset + vehicleIndex);
+      vehicles[j] = {
+        type: VEHICLE_TYPES[code & ~EMERGENCY_BIT] || "car",
+        waiting_time: view.getFloat32(waitsOffset + vehicleIndex * 4, true),
+        emergency: (code & EMERGENCY_BIT) !== 0,
+        priority: view.getFloat32(prioritiesOffset + vehicleIndex * 4, true),
+      };
+    }
+
+    roads[directions[i]] = {
+      name: ROAD_NAMES[directions[i]] || String(directions[i]),
+      vehicle_count: counts[i],
+      density: densities[i],
+      max_capacity: capacities[i],
+      vehicles,
+      lane_queues: laneQueues[i],
+      is_green: (roadFlags[i] & ROAD_FLAG_GREEN) !== 0,
+      capacity_used: `${((counts[i] / capacities[i]) * 100).toFixed(1)}%`,
+    };
+  }
+
+  const extraLength = view.getUint32(offset, true);
+  offset += 4;
+  const { metrics = {}, road_extra: roadExtra, ...extra } =
+    extraLength > 0 ? readMsgPack(view, { offset }) : {};
+  offset += extraLength;
+  const serverTime =
+    offset + 8 <= view.byteLength ? view.getFloat64(offset, true) : null;
+
+  if (roadExtra) {
+    for (const [direction, fields] of Object.entries(roadExtra)) {
+      if (roads[direction]) Object.assign(roads[direction], fields);
+    }
+  }
+
+  return {
+    queue_size: metrics.queue_size || 0,
+    ...extra,
+    simulation_time: simulationTime,
+    current_green: currentGreen < 0 ? null : currentGreen,
+    green_duration: greenDuration,
+    roads,
+    metrics,
+    is_running: (flags & FLAG_RUNNING) !== 0,
+    simulation_speed: simulationSpeed,
+    server_time: serverTime,
+  };
+};
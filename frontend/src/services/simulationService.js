@@ -1,3 +1,5 @@
+import { decodeStateFrame } from "./frameDecoder";
+
 class SimulationService {
   constructor() {
     this.ws = null;
@@ -7,6 +9,11 @@ class SimulationService {
     this.reconnectAttempts = 0;
     this.maxReconnectAttempts = 10;
     this.reconnectDelay = 2000;
+    // Compact binary frames are opt-in, e.g. on field tablets: ?frames=binary
+    this.binaryFrames =
+      new URLSearchParams(window.location.search).get("frames") === "binary";
+    // Stream topics (see setTopics); null receives the full state
+    this.topics = null;
   }
 
   connect() {
@@ -19,18 +26,34 @@ class SimulationService {
     }
 
     try {
-      this.ws = new WebSocket("ws://localhost:8000/ws");
+      this.ws = new WebSocket(
+        this.binaryFrames
+          ? "ws://localhost:8000/ws?format=binary"
+          : "ws://localhost:8000/ws"
+      );
+      this.ws.binaryType = "arraybuffer";
 
       this.ws.onopen = () => {
         console.log("Connected to simulation server");
         this.connected = true;
         this.reconnectAttempts = 0;
+        if (this.topics) {
+          this.sendTopics();
+        }
         this.notifyListeners("connected", true);
       };
 
       this.ws.onmessage = (event) => {
         try {
-          const data = JSON.parse(event.data);
+          const data =
+            event.data instanceof ArrayBuffer
+              ? decodeStateFrame(event.data)
+              : JSON.parse(event.data);
+          if (data.type) {
+            // Control replies (pong, subscribed, error) are not states
+            this.notifyListeners(data.type, data);
+            return;
+          }
           this.state = data;
           this.notifyListeners("state", data);
         } catch (error) {
@@ -158,6 +181,21 @@ class SimulationService {
     }
   }
 
+  async getAlerts() {
+    try {
+      const response = await fetch("http://localhost:8000/alerts");
+
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+
+      return await response.json();
+    } catch (error) {
+      console.error("Failed to get alerts:", error);
+      throw error;
+    }
+  }
+
   async controlSimulation(action) {
     try {
       const response = await fetch(
@@ -227,6 +265,50 @@ class SimulationService {
     }
   }
 
+  /**
+   * Apply many commands together at the next tick, e.g.
+   * [{ command: "road_action", args: [0, "priority"] }]; an atomic batch
+   * is rolled back entirely if any command fails.
+   */
+  async runCommands(commands, atomic = true) {
+    try {
+      const response = await fetch("http://localhost:8000/commands", {
+        method: "POST",
+        headers: {
+          "Content-Type": "application/json",
+        },
+        body: JSON.stringify({ commands, atomic }),
+      });
+
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+
+      return await response.json();
+    } catch (error) {
+      console.error("Failed to run commands:", error);
+      throw error;
+    }
+  }
+
+  /**
+   * Limit the stream to what the current view shows, e.g.
+   * { roads: [0, 90], vehicles: false, metrics: true, alerts: true }.
+   * Omitted fields default to on; null restores the full state.
+   */
+  setTopics(topics) {
+    this.topics = topics;
+    if (this.ws && this.ws.readyState === WebSocket.OPEN) {
+      this.sendTopics();
+    }
+  }
+
+  sendTopics() {
+    this.ws.send(
+      JSON.stringify({ type: "subscribe", ...(this.topics || { roads: "all" }) })
+    );
+  }
+
   subscribe(listener) {
     this.listeners.add(listener);
     return () => this.listeners.delete(listener);
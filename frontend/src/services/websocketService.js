@@ -1,3 +1,5 @@
+import { BINARY_SUBPROTOCOL, decodeStateFrame } from "./frameDecoder";
+
 class WebSocketService {
   constructor() {
     this.ws = null;
@@ -9,9 +11,10 @@ class WebSocketService {
     this.maxReconnectAttempts = 10;
     this.reconnectAttempts = 0;
     this.connectionUrl = null;
+    this.binary = false;
   }
 
-  connect(url) {
+  connect(url, { binary = false } = {}) {
     if (
       this.ws &&
       (this.ws.readyState === WebSocket.CONNECTING ||
@@ -22,9 +25,14 @@ class WebSocketService {
     }
 
     this.connectionUrl = url;
+    this.binary = binary;
 
     try {
-      this.ws = new WebSocket(url);
+      // Binary frames are opt-in via the traffic.binary.v1 subprotocol
+      this.ws = binary
+        ? new WebSocket(url, BINARY_SUBPROTOCOL)
+        : new WebSocket(url);
+      this.ws.binaryType = "arraybuffer";
       this.setupEventListeners();
     } catch (error) {
       console.error("Failed to create WebSocket:", error);
@@ -47,7 +55,10 @@ class WebSocketService {
 
     this.ws.onmessage = (event) => {
       try {
-        const data = JSON.parse(event.data);
+        const data =
+          event.data instanceof ArrayBuffer
+            ? decodeStateFrame(event.data)
+            : JSON.parse(event.data);
         this.handleMessage(data);
       } catch (error) {
         console.error("Failed to parse WebSocket message:", error);
@@ -94,7 +105,7 @@ class WebSocketService {
 
     this.reconnectInterval = setTimeout(() => {
       if (this.ws?.readyState === WebSocket.CLOSED) {
-        this.connect(this.connectionUrl);
+        this.connect(this.connectionUrl, { binary: this.binary });
       }
     }, delay);
   }